@@ -2,13 +2,17 @@ import sys
 
 import deepmechanics.boundarycondition
 import deepmechanics.cell
+import deepmechanics.distributed
 import deepmechanics.grid
 import deepmechanics.implicitgeometry
 import deepmechanics.kinematics
+import deepmechanics.lineartree
 import deepmechanics.materialmodel
 import deepmechanics.model
 import deepmechanics.neuralnetwork
+import deepmechanics.optimization
 import deepmechanics.refinement
+import deepmechanics.sampling
 import deepmechanics.utilities
 
 sys.path.append("..")
@@ -1,119 +1,91 @@
+import torch
+
+
 class DirichletBoundaryCondition:
-    def __init__(self, grid):
+    def __init__(self, grid, coordinate=None):
         self.grid = grid
         self._constraint_function = None
-        self._integration_point_coords = None
-        self._samples_coords = None
-        self._top_edge_integration_point_coords = None
-        self._bottom_edge_integration_point_coords = None
-        self._right_edge_integration_point_coords = None
-        self._left_edge_integration_point_coords = None
+        # Coordinates are looked up on the grid when the constraint is evaluated,
+        # so they follow refinements done after the condition was created
+        self._coordinate = coordinate
+
+    def _get_coords(self, prefix):
+        return getattr(self.grid, prefix + self._coordinate)
 
     def get_constraint_on_integration_points(self):
         def constraint(ux, uy):
-            return self._constraint_function(self._integration_point_coords, ux, uy)
+            return self._constraint_function(
+                self._get_coords("integration_point_"), ux, uy
+            )
 
         return constraint
 
-    def get_constraint_on_samples(self):
+    def get_constraint_on_coords(self, coords):
+        axis = {"xs": 0, "ys": 1, "zs": 2}[self._coordinate]
+
         def constraint(ux, uy):
-            return self._constraint_function(self._samples_coords, ux, uy)
+            return self._constraint_function(coords[:, axis].view(-1, 1), ux, uy)
 
         return constraint
 
-    def get_constraint_on_top_edge(self):
+    def get_constraint_on_samples(self):
         def constraint(ux, uy):
-            return self._constraint_function(
-                self._top_edge_integration_point_coords, ux, uy
-            )
+            return self._constraint_function(self._get_coords("samples_"), ux, uy)
 
         return constraint
 
-    def get_constraint_on_bottom_edge(self):
+    def _get_constraint_on_edge(self, face):
         def constraint(ux, uy):
             return self._constraint_function(
-                self._bottom_edge_integration_point_coords, ux, uy
+                self._get_coords(face + "_edge_integration_point_"), ux, uy
             )
 
+        # Edge data captured by a condition is constrained on its own coordinates,
+        # which differ from the ones of the grid once the edge is refined
+        constraint.on_coords = self.get_constraint_on_coords
         return constraint
 
-    def get_constraint_on_right_edge(self):
-        def constraint(ux, uy):
-            return self._constraint_function(
-                self._right_edge_integration_point_coords, ux, uy
-            )
+    def get_constraint_on_top_edge(self):
+        return self._get_constraint_on_edge("top")
 
-        return constraint
+    def get_constraint_on_bottom_edge(self):
+        return self._get_constraint_on_edge("bottom")
 
-    def get_constraint_on_left_edge(self):
-        def constraint(ux, uy):
-            return self._constraint_function(
-                self._left_edge_integration_point_coords, ux, uy
-            )
+    def get_constraint_on_right_edge(self):
+        return self._get_constraint_on_edge("right")
 
-        return constraint
+    def get_constraint_on_left_edge(self):
+        return self._get_constraint_on_edge("left")
 
 
 class FixedDisplacementsOnTopEdge(DirichletBoundaryCondition):
     def __init__(self, grid):
-        super().__init__(grid)
+        super().__init__(grid, "ys")
         self._constraint_function = lambda ys, ux, uy: (
             ux * (grid.length_y - ys),
             uy * (grid.length_y - ys),
         )
-        self._integration_point_coords = grid.integration_point_ys
-        self._samples_coords = grid.samples_ys
-        self._top_edge_integration_point_coords = grid.top_edge_integration_point_ys
-        self._bottom_edge_integration_point_coords = (
-            grid.bottom_edge_integration_point_ys
-        )
-        self._right_edge_integration_point_coords = grid.right_edge_integration_point_ys
-        self._left_edge_integration_point_coords = grid.left_edge_integration_point_ys
 
 
 class FixedDisplacementsOnBottomEdge(DirichletBoundaryCondition):
     def __init__(self, grid):
-        super().__init__(grid)
+        super().__init__(grid, "ys")
         self._constraint_function = lambda ys, ux, uy: (ux * ys, uy * ys)
-        self._integration_point_coords = grid.integration_point_ys
-        self._samples_coords = grid.samples_ys
-        self._top_edge_integration_point_coords = grid.top_edge_integration_point_ys
-        self._bottom_edge_integration_point_coords = (
-            grid.bottom_edge_integration_point_ys
-        )
-        self._right_edge_integration_point_coords = grid.right_edge_integration_point_ys
-        self._left_edge_integration_point_coords = grid.left_edge_integration_point_ys
 
 
 class FixedDisplacementsOnRightEdge(DirichletBoundaryCondition):
     def __init__(self, grid):
-        super().__init__(grid)
+        super().__init__(grid, "xs")
         self._constraint_function = lambda xs, ux, uy: (
             ux * (grid.length_x - xs),
             uy * (grid.length_x - xs),
         )
-        self._integration_point_coords = grid.integration_point_xs
-        self._samples_coords = grid.samples_xs
-        self._top_edge_integration_point_coords = grid.top_edge_integration_point_xs
-        self._bottom_edge_integration_point_coords = (
-            grid.bottom_edge_integration_point_xs
-        )
-        self._right_edge_integration_point_coords = grid.right_edge_integration_point_xs
-        self._left_edge_integration_point_coords = grid.left_edge_integration_point_xs
 
 
 class FixedDisplacementsOnLeftEdge(DirichletBoundaryCondition):
     def __init__(self, grid):
-        super().__init__(grid)
+        super().__init__(grid, "xs")
         self._constraint_function = lambda xs, ux, uy: (ux * xs, uy * xs)
-        self._integration_point_coords = grid.integration_point_xs
-        self._samples_coords = grid.samples_xs
-        self._top_edge_integration_point_coords = grid.top_edge_integration_point_xs
-        self._bottom_edge_integration_point_coords = (
-            grid.bottom_edge_integration_point_xs
-        )
-        self._right_edge_integration_point_coords = grid.right_edge_integration_point_xs
-        self._left_edge_integration_point_coords = grid.left_edge_integration_point_xs
 
 
 class AggregatedDirichletBoundaryCondition:
@@ -129,67 +101,131 @@ class AggregatedDirichletBoundaryCondition:
 
         return constraint
 
-    def get_constraint_on_samples(self):
+    def get_constraint_on_coords(self, coords):
         def constraint(ux, uy):
             for bc in self.dirichlet_bcs:
-                constraint = bc.get_constraint_on_samples()
+                constraint = bc.get_constraint_on_coords(coords)
                 ux, uy = constraint(ux, uy)
             return ux, uy
 
         return constraint
 
-    def get_constraint_on_top_edge(self):
+    def get_constraint_on_samples(self):
         def constraint(ux, uy):
             for bc in self.dirichlet_bcs:
-                constraint = bc.get_constraint_on_top_edge()
+                constraint = bc.get_constraint_on_samples()
                 ux, uy = constraint(ux, uy)
             return ux, uy
 
         return constraint
 
-    def get_constraint_on_bottom_edge(self):
+    def _get_constraint_on_edge(self, face):
         def constraint(ux, uy):
             for bc in self.dirichlet_bcs:
-                constraint = bc.get_constraint_on_bottom_edge()
+                constraint = bc._get_constraint_on_edge(face)
                 ux, uy = constraint(ux, uy)
             return ux, uy
 
+        constraint.on_coords = self.get_constraint_on_coords
         return constraint
 
-    def get_constraint_on_right_edge(self):
-        def constraint(ux, uy):
-            for bc in self.dirichlet_bcs:
-                constraint = bc.get_constraint_on_right_edge()
-                ux, uy = constraint(ux, uy)
-            return ux, uy
+    def get_constraint_on_top_edge(self):
+        return self._get_constraint_on_edge("top")
 
-        return constraint
+    def get_constraint_on_bottom_edge(self):
+        return self._get_constraint_on_edge("bottom")
 
-    def get_constraint_on_left_edge(self):
-        def constraint(ux, uy):
-            for bc in self.dirichlet_bcs:
-                constraint = bc.get_constraint_on_left_edge()
-                ux, uy = constraint(ux, uy)
-            return ux, uy
+    def get_constraint_on_right_edge(self):
+        return self._get_constraint_on_edge("right")
 
-        return constraint
+    def get_constraint_on_left_edge(self):
+        return self._get_constraint_on_edge("left")
 
 
 class NeumannBoundaryCondition:
     def __init__(self, load_function, boundary_data, constraint):
         self.load_function = load_function
-        (
-            self.boundary_coords,
-            self.boundary_weights,
-            self.boundary_jacobian_dets,
-        ) = boundary_data
+        self._boundary_data = boundary_data
         self.constraint = constraint
-        self._fx = None
-        self._fy = None
+        self.grid = None
+        self.face = None
+        self.dtype = None  # Precision of given boundary data, if it is converted
+        self._cast_boundary_data = None
+        self._load = None
+        self._load_coords = None
+
+    @classmethod
+    def from_grid(cls, load_function, grid, face, constraint):
+        # The boundary data is read from the grid's boundary index when needed, so
+        # it follows refinements done after the condition was created
+        if face not in grid.tree.faces:
+            raise ValueError(
+                "Unknown face {}, expected one of {}".format(
+                    face, ", ".join(grid.tree.faces)
+                )
+            )
+
+        condition = cls(load_function, None, constraint)
+        condition.grid = grid
+        condition.face = face
+        return condition
 
     @property
-    def load(self):
-        if not self._fx or not self._fy:
-            self._fx, self._fy = self.load_function(self.boundary_coords)
+    def boundary_data(self):
+        if self.grid is not None:
+            # Solid grids integrate over faces, planar ones over edges
+            if hasattr(self.grid, "face_integration_points_data"):
+                return self.grid.face_integration_points_data(self.face)
+
+            return getattr(self.grid, self.face + "_edge_integration_points_data")
+
+        if self.dtype is None or self._boundary_data[0].dtype == self.dtype:
+            return self._boundary_data
+
+        # Converted once from the given data and kept, so the cached load stays
+        # valid and switching back loses no precision
+        if self._cast_boundary_data is None or (
+            self._cast_boundary_data[0].dtype != self.dtype
+        ):
+            self._cast_boundary_data = tuple(
+                tensor.detach().to(self.dtype).requires_grad_(tensor.requires_grad)
+                for tensor in self._boundary_data
+            )
 
-        return self._fx, self._fy
+        return self._cast_boundary_data
+
+    @property
+    def boundary_coords(self):
+        return self.boundary_data[0]
+
+    @property
+    def boundary_constraint(self):
+        # Constraints of Dirichlet conditions are applied on the coordinates this
+        # condition integrates over, other constraints are used as they are
+        on_coords = getattr(self.constraint, "on_coords", None)
+        if on_coords is None:
+            return self.constraint
+
+        return on_coords(self.boundary_coords)
+
+    @property
+    def boundary_weights(self):
+        return self.boundary_data[1]
+
+    @property
+    def boundary_jacobian_dets(self):
+        return self.boundary_data[2]
+
+    @property
+    def load(self):
+        # The grid hands out new coordinates whenever the edge changes, either
+        # through refinement or a change of precision
+        coords = self.boundary_coords
+        if self._load is None or self._load_coords is not coords:
+            # Loads are data, evaluating them without a graph keeps the cached
+            # values valid across backward passes
+            with torch.no_grad():
+                self._load = self.load_function(coords)
+            self._load_coords = coords
+
+        return self._load
@@ -1,19 +1,71 @@
+from deepmechanics.integration import gauss_legendre_rule
+from deepmechanics.lineartree import LinearOctree, LinearQuadtree
+
+
 class Cell:
+    __slots__ = ("spatial_dimensions",)
+
     def __init__(self, spatial_dimensions):
         self.spatial_dimensions = spatial_dimensions
 
 
 class QuadCell(Cell):
-    def __init__(self, x_start, y_start, x_end, y_end):
+    # Cells are handles to tree nodes and hold no data of their own, the rules
+    # are shared through the cache of gauss_legendre_rule
+    __slots__ = ("tree", "index")
+
+    def __init__(self, x_start, y_start, x_end, y_end, integration_order=2):
         super().__init__(spatial_dimensions=2)
-        self.x_start = x_start
-        self.y_start = y_start
-        self.x_end = x_end
-        self.y_end = y_end
-        self.children = []  # [child_sw, child_se, child_nw, child_ne]
-        self._is_active = True
-        self.integration_points = [-0.5773502691896257, 0.5773502691896257]
-        self.integration_weights = [1.0, 1.0]
+        # A standalone cell is the single root of its own quadtree
+        self.tree = LinearQuadtree(capacity=1)
+        self.index = self.tree.add_roots(
+            [x_start, y_start], [x_end, y_end], integration_order
+        )[0]
+
+    @classmethod
+    def from_tree(cls, tree, index):
+        cell = cls.__new__(cls)
+        Cell.__init__(cell, spatial_dimensions=2)
+        cell.tree = tree
+        cell.index = int(index)
+        return cell
+
+    def __eq__(self, other):
+        if not isinstance(other, QuadCell):
+            return NotImplemented
+
+        return self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def _cells(self, indices):
+        return [QuadCell.from_tree(self.tree, i) for i in indices]
+
+    @property
+    def x_start(self):
+        return float(self.tree.lower[self.index, 0])
+
+    @property
+    def y_start(self):
+        return float(self.tree.lower[self.index, 1])
+
+    @property
+    def x_end(self):
+        return float(self.tree.upper[self.index, 0])
+
+    @property
+    def y_end(self):
+        return float(self.tree.upper[self.index, 1])
+
+    @property
+    def level(self):
+        return int(self.tree.level[self.index])
+
+    @property
+    def children(self):
+        # [child_sw, child_se, child_nw, child_ne]
+        return self._cells(self.tree.children(self.index))
 
     @property
     def x_mid(self):
@@ -64,6 +116,25 @@ class QuadCell(Cell):
             ys = [self.y_start, self.y_start, self.y_end, self.y_end]
         return xs, ys
 
+    @property
+    def integration_order(self):
+        return int(self.tree.integration_order[self.index])
+
+    @integration_order.setter
+    def integration_order(self, value):
+        gauss_legendre_rule(value)  # Validates the order
+        self.tree.set_integration_order(self.index, value)
+
+    @property
+    def integration_points(self):
+        points, _ = gauss_legendre_rule(self.integration_order)
+        return points
+
+    @property
+    def integration_weights(self):
+        _, weights = gauss_legendre_rule(self.integration_order)
+        return weights
+
     @property
     def number_of_integration_points_in_xi(self):
         if self.is_active:
@@ -99,7 +170,7 @@ class QuadCell(Cell):
     def integration_point_jacobian_dets(self):
         jacobian_dets = []
         if self.is_active:
-            jacobian_dets += [self.jacobian_det] * 4
+            jacobian_dets += [self.jacobian_det] * len(self.integration_weights) ** 2
         return jacobian_dets
 
     @property
@@ -117,7 +188,7 @@ class QuadCell(Cell):
     def top_edge_integration_point_weights(self):
         weights = []
         for cell in self.top_active_leaves:
-            for w_xi in self.integration_weights:
+            for w_xi in cell.integration_weights:
                 weights.append(w_xi)
         return weights
 
@@ -127,7 +198,7 @@ class QuadCell(Cell):
         for cell in self.top_active_leaves:
             jacobian_dets += [
                 cell.top_edge_jacobian_det
-            ] * self.number_of_integration_points_in_xi
+            ] * cell.number_of_integration_points_in_xi
         return jacobian_dets
 
     @property
@@ -145,7 +216,7 @@ class QuadCell(Cell):
     def bottom_edge_integration_point_weights(self):
         weights = []
         for cell in self.bottom_active_leaves:
-            for w_xi in self.integration_weights:
+            for w_xi in cell.integration_weights:
                 weights.append(w_xi)
         return weights
 
@@ -155,7 +226,7 @@ class QuadCell(Cell):
         for cell in self.bottom_active_leaves:
             jacobian_dets += [
                 cell.bottom_edge_jacobian_det
-            ] * self.number_of_integration_points_in_xi
+            ] * cell.number_of_integration_points_in_xi
         return jacobian_dets
 
     @property
@@ -173,7 +244,7 @@ class QuadCell(Cell):
     def right_edge_integration_point_weights(self):
         weights = []
         for cell in self.right_active_leaves:
-            for w_eta in self.integration_weights:
+            for w_eta in cell.integration_weights:
                 weights.append(w_eta)
         return weights
 
@@ -183,7 +254,7 @@ class QuadCell(Cell):
         for cell in self.right_active_leaves:
             jacobian_dets += [
                 cell.right_edge_jacobian_det
-            ] * self.number_of_integration_points_in_eta
+            ] * cell.number_of_integration_points_in_eta
         return jacobian_dets
 
     @property
@@ -201,7 +272,7 @@ class QuadCell(Cell):
     def left_edge_integration_point_weights(self):
         weights = []
         for cell in self.left_active_leaves:
-            for w_eta in self.integration_weights:
+            for w_eta in cell.integration_weights:
                 weights.append(w_eta)
         return weights
 
@@ -211,7 +282,7 @@ class QuadCell(Cell):
         for cell in self.left_active_leaves:
             jacobian_dets += [
                 cell.left_edge_jacobian_det
-            ] * self.number_of_integration_points_in_eta
+            ] * cell.number_of_integration_points_in_eta
         return jacobian_dets
 
     @property
@@ -244,28 +315,18 @@ class QuadCell(Cell):
         return x, y
 
     def refine(self):
-        child_sw = QuadCell(self.x_start, self.y_start, self.x_mid, self.y_mid)
-        child_se = QuadCell(self.x_mid, self.y_start, self.x_end, self.y_mid)
-        child_nw = QuadCell(self.x_start, self.y_mid, self.x_mid, self.y_end)
-        child_ne = QuadCell(self.x_mid, self.y_mid, self.x_end, self.y_end)
-        self.children = [child_sw, child_se, child_nw, child_ne]
-        self.is_active = False
+        self.tree.refine(self.index)
 
     def delete_all_children(self):
-        self.delete_all_children_recursive(self.children)
+        self.tree.coarsen(self.index)
 
     def delete_all_children_recursive(self, children):
-        if not children:
-            self.is_active = True
-        else:
-            temp = children
-            children.clear()
-            for child in temp:
-                self.delete_all_children_recursive(child.children)
+        # Kept for compatibility, the whole subtree is released at once
+        self.delete_all_children()
 
     @property
     def is_leaf(self):
-        return not self.children
+        return bool(self.tree.is_leaf(self.index))
 
     @property
     def is_refined(self):
@@ -273,171 +334,237 @@ class QuadCell(Cell):
 
     @property
     def is_active(self):
-        return self._is_active
+        return bool(self.tree.active[self.index])
 
     @is_active.setter
     def is_active(self, value):
-        self._is_active = value
+        self.tree.set_active(self.index, value)
 
     @property
     def is_active_leaf(self):
         return self.is_active and self.is_leaf
 
     def _count_inside_seeds(self, filter, seeds_per_side=10):
-        inside_seeds_count = 0
-        dx = self.length_x / (seeds_per_side - 1)
-        dy = self.length_y / (seeds_per_side - 1)
-        for i in range(seeds_per_side):
-            x = self.x_start + i * dx
-            for j in range(seeds_per_side):
-                y = self.y_start + j * dy
-
-                if filter(x, y):
-                    inside_seeds_count += 1
-        return inside_seeds_count
+        return int(self.tree.count_inside_seeds(self.index, filter, seeds_per_side)[0])
 
     def is_cut(self, filter, seeds_per_side=10):
-        inside_seeds_count = self._count_inside_seeds(filter, seeds_per_side)
-        return 0 < inside_seeds_count < seeds_per_side**self.spatial_dimensions
+        return bool(self.tree.is_cut(self.index, filter, seeds_per_side)[0])
 
     def is_inside(self, filter, seeds_per_side=10):
-        inside_seeds_count = self._count_inside_seeds(filter, seeds_per_side)
-        return inside_seeds_count == seeds_per_side**self.spatial_dimensions
+        return bool(self.tree.is_inside(self.index, filter, seeds_per_side)[0])
 
     @property
     def leaves(self):
-        leaves = []
-        self._get_leaves_recursive(leaves)
-        return leaves
-
-    def _get_leaves_recursive(self, leaves):
-        if self.is_leaf:
-            leaves.append(self)
-        else:
-            for child in self.children:
-                child._get_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index))
 
     @property
     def active_leaves(self):
-        leaves = []
-        self._get_active_leaves_recursive(leaves)
-        return leaves
-
-    def _get_active_leaves_recursive(self, leaves):
-        if self.is_active_leaf:
-            leaves.append(self)
-        else:
-            for child in self.children:
-                child._get_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index, active_only=True))
 
     @property
     def top_leaves(self):
-        leaves = []
-        self._get_top_leaves_recursive(leaves)
-        return leaves
-
-    def _get_top_leaves_recursive(self, leaves):
-        if self.is_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[2]._get_top_leaves_recursive(leaves)
-            self.children[3]._get_top_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index, face="top"))
 
     @property
     def top_active_leaves(self):
-        leaves = []
-        self._get_top_active_leaves_recursive(leaves)
-        return leaves
-
-    def _get_top_active_leaves_recursive(self, leaves):
-        if self.is_active_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[2]._get_top_active_leaves_recursive(leaves)
-            self.children[3]._get_top_active_leaves_recursive(leaves)
+        return self._cells(
+            self.tree.subtree_leaves(self.index, active_only=True, face="top")
+        )
 
     @property
     def bottom_leaves(self):
-        leaves = []
-        self._get_bottom_leaves_recursive(leaves)
-        return leaves
-
-    def _get_bottom_leaves_recursive(self, leaves):
-        if self.is_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[0]._get_bottom_leaves_recursive(leaves)
-            self.children[1]._get_bottom_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index, face="bottom"))
 
     @property
     def bottom_active_leaves(self):
-        leaves = []
-        self._get_bottom_active_leaves_recursive(leaves)
-        return leaves
-
-    def _get_bottom_active_leaves_recursive(self, leaves):
-        if self.is_active_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[0]._get_bottom_active_leaves_recursive(leaves)
-            self.children[1]._get_bottom_active_leaves_recursive(leaves)
+        return self._cells(
+            self.tree.subtree_leaves(self.index, active_only=True, face="bottom")
+        )
 
     @property
     def right_leaves(self):
-        leaves = []
-        self._get_right_leaves_recursive(leaves)
-        return leaves
-
-    def _get_right_leaves_recursive(self, leaves):
-        if self.is_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[1]._get_right_leaves_recursive(leaves)
-            self.children[3]._get_right_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index, face="right"))
 
     @property
     def right_active_leaves(self):
-        leaves = []
-        self._get_right_active_leaves_recursive(leaves)
-        return leaves
-
-    def _get_right_active_leaves_recursive(self, leaves):
-        if self.is_active_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[1]._get_right_active_leaves_recursive(leaves)
-            self.children[3]._get_right_active_leaves_recursive(leaves)
+        return self._cells(
+            self.tree.subtree_leaves(self.index, active_only=True, face="right")
+        )
 
     @property
     def left_leaves(self):
-        leaves = []
-        self._get_left_leaves_recursive(leaves)
-        return leaves
-
-    def _get_left_leaves_recursive(self, leaves):
-        if self.is_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[0]._get_left_leaves_recursive(leaves)
-            self.children[2]._get_left_leaves_recursive(leaves)
+        return self._cells(self.tree.subtree_leaves(self.index, face="left"))
 
     @property
     def left_active_leaves(self):
-        leaves = []
-        self._get_left_active_leaves_recursive(leaves)
-        return leaves
-
-    def _get_left_active_leaves_recursive(self, leaves):
-        if self.is_active_leaf:
-            leaves.append(self)
-        else:
-            # [child_sw, child_se, child_nw, child_ne]
-            self.children[0]._get_left_active_leaves_recursive(leaves)
-            self.children[2]._get_left_active_leaves_recursive(leaves)
+        return self._cells(
+            self.tree.subtree_leaves(self.index, active_only=True, face="left")
+        )
+
+
+class HexCell(Cell):
+    # Handle to an octree node. Only the per-cell view lives here, quadrature of
+    # whole grids is generated from the tree arrays
+    __slots__ = ("tree", "index")
+
+    def __init__(
+        self, x_start, y_start, z_start, x_end, y_end, z_end, integration_order=2
+    ):
+        super().__init__(spatial_dimensions=3)
+        # A standalone cell is the single root of its own octree
+        self.tree = LinearOctree(capacity=1)
+        self.index = self.tree.add_roots(
+            [x_start, y_start, z_start], [x_end, y_end, z_end], integration_order
+        )[0]
+
+    @classmethod
+    def from_tree(cls, tree, index):
+        cell = cls.__new__(cls)
+        Cell.__init__(cell, spatial_dimensions=3)
+        cell.tree = tree
+        cell.index = int(index)
+        return cell
+
+    def __eq__(self, other):
+        if not isinstance(other, HexCell):
+            return NotImplemented
+
+        return self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def _cells(self, indices):
+        return [HexCell.from_tree(self.tree, i) for i in indices]
+
+    @property
+    def x_start(self):
+        return float(self.tree.lower[self.index, 0])
+
+    @property
+    def y_start(self):
+        return float(self.tree.lower[self.index, 1])
+
+    @property
+    def z_start(self):
+        return float(self.tree.lower[self.index, 2])
+
+    @property
+    def x_end(self):
+        return float(self.tree.upper[self.index, 0])
+
+    @property
+    def y_end(self):
+        return float(self.tree.upper[self.index, 1])
+
+    @property
+    def z_end(self):
+        return float(self.tree.upper[self.index, 2])
+
+    @property
+    def level(self):
+        return int(self.tree.level[self.index])
+
+    @property
+    def children(self):
+        # Bit k of the position of a child tells if it lies in the upper half of
+        # axis k, e.g. the third child is the one at high y, low x and low z
+        return self._cells(self.tree.children(self.index))
+
+    @property
+    def x_mid(self):
+        return (self.x_start + self.x_end) / 2
+
+    @property
+    def y_mid(self):
+        return (self.y_start + self.y_end) / 2
+
+    @property
+    def z_mid(self):
+        return (self.z_start + self.z_end) / 2
+
+    @property
+    def length_x(self):
+        return self.x_end - self.x_start
+
+    @property
+    def length_y(self):
+        return self.y_end - self.y_start
+
+    @property
+    def length_z(self):
+        return self.z_end - self.z_start
+
+    @property
+    def jacobian_det(self):
+        return self.length_x * self.length_y * self.length_z / 8
+
+    @property
+    def integration_order(self):
+        return int(self.tree.integration_order[self.index])
+
+    @integration_order.setter
+    def integration_order(self, value):
+        gauss_legendre_rule(value)  # Validates the order
+        self.tree.set_integration_order(self.index, value)
+
+    @property
+    def integration_points(self):
+        points, _ = gauss_legendre_rule(self.integration_order)
+        return points
+
+    @property
+    def integration_weights(self):
+        _, weights = gauss_legendre_rule(self.integration_order)
+        return weights
+
+    def map_local_to_global(self, xi, eta, zeta):
+        x = self.x_mid + self.length_x * xi / 2
+        y = self.y_mid + self.length_y * eta / 2
+        z = self.z_mid + self.length_z * zeta / 2
+        return x, y, z
+
+    def refine(self):
+        self.tree.refine(self.index)
+
+    def delete_all_children(self):
+        self.tree.coarsen(self.index)
+
+    @property
+    def is_leaf(self):
+        return bool(self.tree.is_leaf(self.index))
+
+    @property
+    def is_refined(self):
+        return not self.is_leaf
+
+    @property
+    def is_active(self):
+        return bool(self.tree.active[self.index])
+
+    @is_active.setter
+    def is_active(self, value):
+        self.tree.set_active(self.index, value)
+
+    @property
+    def is_active_leaf(self):
+        return self.is_active and self.is_leaf
+
+    def is_cut(self, filter, seeds_per_side=10):
+        return bool(self.tree.is_cut(self.index, filter, seeds_per_side)[0])
+
+    def is_inside(self, filter, seeds_per_side=10):
+        return bool(self.tree.is_inside(self.index, filter, seeds_per_side)[0])
+
+    @property
+    def leaves(self):
+        return self._cells(self.tree.subtree_leaves(self.index))
+
+    @property
+    def active_leaves(self):
+        return self._cells(self.tree.subtree_leaves(self.index, active_only=True))
+
+    def face_leaves(self, face, active_only=False):
+        return self._cells(
+            self.tree.subtree_leaves(self.index, active_only=active_only, face=face)
+        )
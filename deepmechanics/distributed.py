@@ -0,0 +1,76 @@
+import os
+import socket
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+
+def initialize(backend="gloo"):
+    # Ranks, world size and the address of rank 0 are read from the environment,
+    # as set by launch on a single machine or by torchrun across several nodes
+    if not dist.is_initialized():
+        dist.init_process_group(backend)
+
+
+def get_rank_and_world_size():
+    if not dist.is_initialized():
+        raise ValueError("Distributed training requires an initialized process group")
+
+    return dist.get_rank(), dist.get_world_size()
+
+
+def shard_rows(number_of_rows, rank, world_size):
+    # Contiguous blocks whose sizes differ by one row at most
+    bounds = np.linspace(0, number_of_rows, world_size + 1).round().astype(np.int64)
+    return slice(bounds[rank], bounds[rank + 1])
+
+
+def broadcast_parameters(parameters, source=0):
+    for parameter in parameters:
+        dist.broadcast(parameter.data, source)
+
+
+def all_reduce_gradients(parameters):
+    # A single collective for all the gradients, flattened into one buffer
+    parameters = [parameter for parameter in parameters if parameter.grad is not None]
+    if not parameters:
+        return
+
+    buffer = torch.cat([parameter.grad.reshape(-1) for parameter in parameters])
+    dist.all_reduce(buffer)
+
+    offset = 0
+    for parameter in parameters:
+        size = parameter.grad.numel()
+        parameter.grad.copy_(buffer[offset : offset + size].view_as(parameter.grad))
+        offset += size
+
+
+def _find_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run(rank, function, world_size, backend, port, args):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    os.environ["RANK"] = str(rank)
+    os.environ["WORLD_SIZE"] = str(world_size)
+
+    # The intra-op threads of the machine are split between the local processes
+    torch.set_num_threads(max(1, torch.get_num_threads() // world_size))
+
+    initialize(backend)
+    try:
+        function(*args)
+    finally:
+        dist.destroy_process_group()
+
+
+def launch(function, world_size, *args, backend="gloo"):
+    # Runs function(*args) in world_size local processes joined in a group
+    port = _find_free_port()
+    mp.spawn(_run, (function, world_size, backend, port, args), nprocs=world_size)
@@ -8,6 +8,7 @@ class Functional:
         self, integrator=gauss_legendre_integration, *neumann_bcs, source_function=None
     ):
         self.integrator = integrator
+        self.accumulation_dtype = None  # Defaults to the type of the integrands
 
         self.neumann_bcs = neumann_bcs
         self.source_function = source_function
@@ -25,29 +26,37 @@ class PotentialEnergyFunctional(Functional):
     def internal_term(self, ex, ey, gamma_xy, nx, ny, nxy, weights, jacobian_dets):
         integrand = 0.5 * ((ex * nx) + (ey * ny) + (gamma_xy * nxy))
 
-        return self.integrator(integrand, weights, jacobian_dets)
+        return self.integrator(
+            integrand, weights, jacobian_dets, dtype=self.accumulation_dtype
+        )
 
-    def external_term(self, approximator):
-        result = torch.tensor(0.0)
+    def external_term(self, approximator, rank=0, world_size=1):
+        result = 0.0
 
-        for bc in self.neumann_bcs:
+        # Conditions are dealt over the ranks of distributed runs
+        for bc in self.neumann_bcs[rank::world_size]:
             if bc is not None:
                 fx, fy = bc.load
-                ux, uy = approximator(bc.boundary_coords, bc.constraint)
+                ux, uy = approximator(bc.boundary_coords, bc.boundary_constraint)
                 integrand = -fx * ux - fy * uy  # Negative as potential is lost
-                result += self.integrator(
-                    integrand, bc.boundary_weights, bc.boundary_jacobian_dets
+                result = result + self.integrator(
+                    integrand,
+                    bc.boundary_weights,
+                    bc.boundary_jacobian_dets,
+                    dtype=self.accumulation_dtype,
                 )
 
-        return result
+        return torch.as_tensor(result)
 
     def source_term(self, ux, uy, coords, weights, jacobian_dets):
-        result = torch.tensor(0.0)
+        result = 0.0
 
         # Compute the external energy body load (if present)
         if self.source_function is not None:
             qx, qy = self.source_function(coords)
             integrand = -qx * ux - qy * uy  # Negative as potential is lost
-            result += self.integrator(integrand, weights, jacobian_dets)
+            result = result + self.integrator(
+                integrand, weights, jacobian_dets, dtype=self.accumulation_dtype
+            )
 
-        return result
+        return torch.as_tensor(result)
@@ -1,13 +1,47 @@
-from deepmechanics.cell import QuadCell
-from deepmechanics.utilities import make_array_unique, tensorize_1d, tensorize_2d
+import os
+import sys
+import warnings
+
+import numpy as np
+import torch
+
+from deepmechanics.cell import HexCell, QuadCell
+from deepmechanics.implicitgeometry import CUT, INSIDE, OUTSIDE, classify, evaluate
+from deepmechanics.integration import gauss_legendre_reference_rule
+from deepmechanics.lineartree import (
+    LinearOctree,
+    LinearQuadtree,
+    map_local_to_global,
+    subdivide,
+)
+from deepmechanics.utilities import tensorize_1d, tensorize_2d, tensorize_3d
+
+
+def _nbytes(value):
+    # Bytes of the arrays and tensors in nested caches, views are not counted
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, np.ndarray) and value.base is None:
+        return value.nbytes
+    if torch.is_tensor(value) and value._base is None:
+        return value.element_size() * value.nelement()
+    return 0
 
 
 class Grid:
-    def __init__(self, spatial_dimensions):
+    cell_type = None
+
+    def __init__(self, spatial_dimensions, integration_order=2):
         self.spatial_dimensions = spatial_dimensions
+        self._integration_order = integration_order
+        self._base_version = 0
+        self._quadrature_generation = 0  # Bumped when cut leaves need new points
+        self._domain = None  # Geometry resolved by the quadrature of cut leaves
+        self._subcell_depth = 0
+        self._seeds_per_side = 10
+        self._boundary_index = None
         self.base_cells = []
-        self._leaf_cells = []
-        self._active_leaf_cells = []
+        self.tree = None
         self._refinement_strategy = None
 
     def generate(self):
@@ -24,29 +58,572 @@ class Grid:
     def refinement_strategy(self, value):
         self._refinement_strategy = value
 
+    def get_cells(self, indices):
+        return [self.cell_type.from_tree(self.tree, i) for i in indices]
+
     @property
-    def leaf_cells(self):
-        self._leaf_cells.clear()
-        for cell in self.base_cells:
-            self._leaf_cells += cell.leaves
+    def leaf_indices(self):
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64)
 
-        return self._leaf_cells
+        return self.tree.leaves()
+
+    @property
+    def active_leaf_indices(self):
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64)
+
+        return self.tree.leaves(active_only=True)
+
+    @property
+    def leaf_cells(self):
+        return self.get_cells(self.leaf_indices)
 
     @property
     def active_leaf_cells(self):
-        self._active_leaf_cells.clear()
-        for cell in self.base_cells:
-            self._active_leaf_cells += cell.active_leaves
+        return self.get_cells(self.active_leaf_indices)
+
+    @property
+    def version(self):
+        if self.tree is None:
+            return self._base_version
+
+        return self._base_version + self.tree.version
+
+    @property
+    def domain(self):
+        return self._domain
+
+    @domain.setter
+    def domain(self, value):
+        if value is not self._domain:
+            self._quadrature_generation += 1
+        self._domain = value
+
+    @property
+    def subcell_depth(self):
+        return self._subcell_depth
+
+    @subcell_depth.setter
+    def subcell_depth(self, value):
+        if value != self._subcell_depth:
+            self._quadrature_generation += 1
+        self._subcell_depth = value
+
+    @property
+    def seeds_per_side(self):
+        return self._seeds_per_side
+
+    @seeds_per_side.setter
+    def seeds_per_side(self, value):
+        if value != self._seeds_per_side:
+            self._quadrature_generation += 1
+        self._seeds_per_side = value
+
+    @property
+    def integration_order(self):
+        return self._integration_order
+
+    @integration_order.setter
+    def integration_order(self, value):
+        gauss_legendre_reference_rule(value, self.spatial_dimensions)
+        self._integration_order = value
+        if self.tree is not None:
+            self.tree.set_integration_order(np.arange(self.tree.size), value)
+
+    def integration_point_arrays(self, leaves=None):
+        if leaves is None:
+            leaves = self.active_leaf_indices
+
+        return self._merge_cut_leaves(
+            leaves,
+            self._regular_integration_point_arrays,
+            self._subcell_integration_point_arrays,
+        )
+
+    def _merge_cut_leaves(self, leaves, get_regular_arrays, get_subcell_arrays):
+        cut = self.tree.cut[leaves]
+        if not cut.any():
+            return get_regular_arrays(leaves)
+
+        regular = get_regular_arrays(leaves[~cut])
+        subcell = get_subcell_arrays(leaves[cut])
+        arrays = [np.concatenate(pair) for pair in zip(regular, subcell)]
+
+        # Merge both blocks back into the order of the leaves
+        positions = np.empty(self.tree.size, dtype=np.int64)
+        positions[leaves] = np.arange(leaves.size)
+        rows = np.argsort(positions[arrays[3]], kind="stable")
+        return tuple(array[rows] for array in arrays)
+
+    def _volume_rule(self):
+        def rule(order):
+            return gauss_legendre_reference_rule(order, self.spatial_dimensions)
+
+        return rule, np.arange(self.spatial_dimensions)
+
+    def _regular_integration_point_arrays(self, leaves):
+        return self._pack_integration_points(leaves, *self._volume_rule())
 
-        return self._active_leaf_cells
+    def _face_rule(self, face):
+        # Rule of one dimension less on the face, with the local coordinate normal
+        # to it fixed to -1 or 1
+        axis, direction = self.tree.faces[face]
+        tangential_axes = np.delete(np.arange(self.spatial_dimensions), axis)
+
+        def rule(order):
+            points, weights = gauss_legendre_reference_rule(
+                order, self.spatial_dimensions - 1
+            )
+            local_coords = np.empty((len(weights), self.spatial_dimensions))
+            local_coords[:, tangential_axes] = points
+            local_coords[:, axis] = direction
+            return local_coords, weights
+
+        return rule, tangential_axes
+
+    def edge_integration_point_arrays(self, leaves, face):
+        # Cut leaves only integrate the part of the face inside the domain
+        return self._merge_cut_leaves(
+            leaves,
+            lambda leaves: self._pack_integration_points(
+                leaves, *self._face_rule(face)
+            ),
+            lambda leaves: self._subcell_integration_point_arrays(leaves, face),
+        )
+
+    def _pack_integration_points(self, leaves, rule, axes):
+        # Leaves are grouped by integration order so that every group is evaluated
+        # with a single broadcast of its reference rule, then the blocks are
+        # scattered back to keep the points of each leaf contiguous and in order.
+        # The jacobians are taken over the given axes
+        orders = self.tree.integration_order[leaves]
+        counts = orders.astype(np.int64) ** len(axes)
+        offsets = np.cumsum(counts) - counts
+        number_of_points = counts.sum()
+        coords = np.empty((number_of_points, self.spatial_dimensions))
+        weights = np.empty(number_of_points)
+        jacobian_dets = np.empty(number_of_points)
+
+        for order in np.unique(orders):
+            selection = np.flatnonzero(orders == order)
+            local_coords, local_weights = rule(order)
+            rows = (offsets[selection][:, None] + np.arange(len(local_weights))).ravel()
+            coords[rows] = self.tree.map_local_to_global(
+                leaves[selection], local_coords
+            ).reshape(-1, self.spatial_dimensions)
+            weights[rows] = np.tile(local_weights, selection.size)
+            lengths = self.tree.lengths(leaves[selection])[:, axes]
+            jacobian_dets[rows] = np.repeat(
+                np.prod(lengths / 2, axis=1), len(local_weights)
+            )
+
+        return coords, weights, jacobian_dets, np.repeat(leaves, counts)
+
+    def _subcell_integration_point_arrays(self, leaves, face=None):
+        if self.domain is None:
+            raise ValueError(
+                "Cut cells require a domain to be integrated, grids with cut cells "
+                "need it passed to load to integrate their edges or new cut cells"
+            )
+
+        # Cut leaves are subdivided level by level, keeping only the boxes cut by
+        # the domain. Boxes inside get the full rule, boxes outside are dropped and
+        # the points of boxes still cut at the last level are filtered one by one.
+        # On a face only the boxes touching it are kept and get the face rule
+        rule, axes = self._volume_rule() if face is None else self._face_rule(face)
+        if face is not None:
+            axis, direction = self.tree.faces[face]
+            bounds = self.tree.upper if direction > 0 else self.tree.lower
+            face_coords = bounds[leaves, axis]
+
+        owners = np.arange(leaves.size)
+        lower = self.tree.lower[leaves]
+        upper = self.tree.upper[leaves]
+        boxes = []
+        for level in range(self.subcell_depth + 1):
+            classes = classify(self.domain, lower, upper, self.seeds_per_side)
+            inside = classes == INSIDE
+            boxes.append((owners[inside], lower[inside], upper[inside], False))
+
+            cut = classes == CUT
+            owners, lower, upper = owners[cut], lower[cut], upper[cut]
+            if level == self.subcell_depth:
+                boxes.append((owners, lower, upper, True))
+            else:
+                lower, upper = subdivide(lower, upper)
+                owners = np.repeat(owners, 2**self.spatial_dimensions)
+                if face is not None:
+                    sides = upper if direction > 0 else lower
+                    on_face = sides[:, axis] == face_coords[owners]
+                    owners, lower, upper = (
+                        owners[on_face],
+                        lower[on_face],
+                        upper[on_face],
+                    )
+
+        owners = np.concatenate([box[0] for box in boxes])
+        lower = np.concatenate([box[1] for box in boxes])
+        upper = np.concatenate([box[2] for box in boxes])
+        filtered = np.concatenate([np.full(box[0].size, box[3]) for box in boxes])
+
+        orders = self.tree.integration_order[leaves][owners]
+        coords, weights, jacobian_dets, point_owners, point_filtered = (
+            [],
+            [],
+            [],
+            [],
+            [],
+        )
+        for order in np.unique(orders):
+            selection = np.flatnonzero(orders == order)
+            local_coords, local_weights = rule(order)
+            number_of_points = len(local_weights)
+            coords.append(
+                map_local_to_global(
+                    lower[selection], upper[selection], local_coords
+                ).reshape(-1, self.spatial_dimensions)
+            )
+            weights.append(np.tile(local_weights, selection.size))
+            box_jacobian_dets = np.prod((upper - lower)[selection][:, axes] / 2, axis=1)
+            jacobian_dets.append(np.repeat(box_jacobian_dets, number_of_points))
+            point_owners.append(np.repeat(owners[selection], number_of_points))
+            point_filtered.append(np.repeat(filtered[selection], number_of_points))
+
+        coords = np.concatenate(coords).reshape(-1, self.spatial_dimensions)
+        point_filtered = np.concatenate(point_filtered).astype(bool)
+        keep = ~point_filtered
+        keep[point_filtered] = evaluate(self.domain, *coords[point_filtered].T)
+
+        # Keep the points of each leaf contiguous and the leaves in order
+        point_owners = np.concatenate(point_owners).astype(np.int64)[keep]
+        rows = np.flatnonzero(keep)[np.argsort(point_owners, kind="stable")]
+        return (
+            coords[rows],
+            np.concatenate(weights)[rows],
+            np.concatenate(jacobian_dets)[rows],
+            leaves[np.sort(point_owners, kind="stable")],
+        )
+
+    @property
+    def boundary_index(self):
+        # Boundary leaves and face quadrature of every face, built once per version
+        index = self._boundary_index
+        if (
+            index is None
+            or index["version"] != self.version
+            or index["generation"] != self._quadrature_generation
+        ):
+            index = {face: self._face_index(face) for face in self.tree.faces}
+            index["version"] = self.version
+            index["generation"] = self._quadrature_generation
+            self._boundary_index = index
+
+        return index
+
+    def _face_index(self, face):
+        leaves = self.face_leaf_indices(face)
+        active_leaves = leaves[self.tree.active[leaves]]
+        coords, weights, jacobian_dets, leaf_indices = (
+            self.edge_integration_point_arrays(active_leaves, face)
+        )
+        return {
+            "leaves": leaves,
+            "active_leaves": active_leaves,
+            "coords": coords,
+            "weights": weights,
+            "jacobian_dets": jacobian_dets,
+            "leaf_indices": leaf_indices,
+        }
+
+    def set_active_state_with_filter(
+        self, filter, seeds_per_side=10, subcell_depth=None
+    ):
+        leaves = self.leaf_indices
+        classes = self.tree.classify(leaves, filter, seeds_per_side)
+        self.domain = filter
+        self.seeds_per_side = seeds_per_side
+
+        if subcell_depth is None:
+            self.tree.set_active(leaves, classes == INSIDE)
+            self.tree.set_cut(leaves, False)
+        else:
+            # Cut leaves stay active and their quadrature resolves the geometry
+            self.subcell_depth = subcell_depth
+            self.tree.set_active(leaves, classes != OUTSIDE)
+            self.tree.set_cut(leaves, classes == CUT)
+
+    def _base_cell_numbers(self, coords):
+        # Points on the end of the grid belong to the last cell along that axis
+        lower, upper = self.bounds
+        resolutions = np.asarray(self.resolutions)
+        cells = np.floor((coords - lower) / (upper - lower) * resolutions)
+        cells = np.clip(cells, 0, resolutions - 1).astype(np.int64)
+        strides = np.cumprod(np.concatenate([[1], resolutions[:-1]]))
+        return cells @ strides
+
+    def locate_leaf_indices(self, coords):
+        if torch.is_tensor(coords):
+            coords = coords.detach().cpu().numpy()
+
+        coords = np.asarray(coords, dtype=np.float64).reshape(
+            -1, self.spatial_dimensions
+        )
+        lower, upper = self.bounds
+        inside = np.all((lower <= coords) & (coords <= upper), axis=1)
+
+        # Points outside the grid are located in no leaf, marked with -1
+        leaf_indices = np.full(coords.shape[0], -1, dtype=np.int64)
+        roots = self.base_indices[self._base_cell_numbers(coords[inside])]
+        leaf_indices[inside] = self.tree.locate(roots, coords[inside])
+        return leaf_indices
 
     def refine(self):
         self.refinement_strategy.refine(self)
 
+    def _caches(self):
+        return [self._boundary_index]
+
+    def memory_usage(self):
+        # Bytes held by the grid, by component
+        usage = {
+            "tree": 0 if self.tree is None else self.tree.memory_usage(),
+            "cells": sys.getsizeof(self.base_cells)
+            + sum(sys.getsizeof(cell) for cell in self.base_cells),
+            "caches": sum(_nbytes(cache) for cache in self._caches() if cache),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+class TensorizedGrid:
+    # Integration point tensors cached on top of a grid, validated against the
+    # grid version. Share of the integration points that may change before the
+    # cached tensors are regenerated from scratch rather than spliced
+    rebuild_fraction = 0.5
+    _integration_points = None
+    _dtype = torch.float64
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, value):
+        # Tensors are generated again in the new precision when requested
+        self._dtype = value
+        self._clear_tensors()
+
+    def _clear_tensors(self):
+        cache = self._integration_points
+        self._integration_points = None
+        if cache is None:
+            return
+
+        # Loaded integration points are wrapped again from their mapped arrays,
+        # and cut leaves without a domain to integrate them again are converted
+        if "arrays" in cache:
+            self._integration_points = self._wrap_integration_points(cache)
+        elif self.domain is None and cache["cuts"].any():
+            for name in ["coords", "weights", "jacobian_dets"]:
+                cache[name] = cache[name].detach().to(self.dtype).requires_grad_()
+            cache.update(self._coordinate_views(cache["coords"]))
+            self._integration_points = cache
+
+    def _caches(self):
+        return super()._caches() + [self._integration_points]
+
+    def _tensorize_coords(self, coords):
+        if self.spatial_dimensions == 2:
+            return tensorize_2d(coords[:, 0], coords[:, 1], self.dtype)
+
+        return tensorize_3d(coords[:, 0], coords[:, 1], coords[:, 2], self.dtype)
+
+    def _coordinate_views(self, coords):
+        names = ("xs", "ys", "zs")[: self.spatial_dimensions]
+        return {name: coords[:, i].view(-1, 1) for i, name in enumerate(names)}
+
+    def _load_integration_points(self, read):
+        leaves = read("leaves")
+        cache = {
+            "leaves": leaves,
+            "lower": self.tree.lower[leaves],
+            "upper": self.tree.upper[leaves],
+            "orders": read("orders"),
+            "cuts": read("cuts"),
+            "leaf_indices": read("leaf_indices"),
+            "arrays": {
+                name: read(name) for name in ["coords", "weights", "jacobian_dets"]
+            },
+            "version": self.version,
+            "generation": self._quadrature_generation,
+        }
+        self._integration_points = self._wrap_integration_points(cache)
+
+    def _wrap_integration_points(self, cache):
+        # Tensors share memory with the mapped arrays, they are only copied when
+        # their precision differs. Read-only maps give read-only tensors
+        def wrap(array, shape):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                tensor = torch.from_numpy(array)
+            return tensor.view(shape).to(self.dtype).requires_grad_()
+
+        arrays = cache["arrays"]
+        cache["coords"] = wrap(arrays["coords"], (-1, self.spatial_dimensions))
+        cache["weights"] = wrap(arrays["weights"], (-1, 1))
+        cache["jacobian_dets"] = wrap(arrays["jacobian_dets"], (-1, 1))
+        cache.update(self._coordinate_views(cache["coords"]))
+        return cache
+
+    @staticmethod
+    def _leaf_keys(leaves, orders, cuts):
+        # A leaf whose integration order or cut state changed needs new integration
+        # points too
+        return (leaves * 128 + orders) * 2 + cuts
+
+    def _tensorize_integration_points(self, leaves):
+        coords, weights, jacobian_dets, leaf_indices = self.integration_point_arrays(
+            leaves
+        )
+        return {
+            "leaves": leaves,
+            "lower": self.tree.lower[leaves],
+            "upper": self.tree.upper[leaves],
+            "orders": self.tree.integration_order[leaves],
+            "cuts": self.tree.cut[leaves],
+            "leaf_indices": leaf_indices,
+            "coords": self._tensorize_coords(coords),
+            "weights": tensorize_1d(weights, self.dtype),
+            "jacobian_dets": tensorize_1d(jacobian_dets, self.dtype),
+        }
+
+    def _splice_integration_points(self, cache, leaves, orders, cuts):
+        old_keys = self._leaf_keys(cache["leaves"], cache["orders"], cache["cuts"])
+        new_keys = self._leaf_keys(leaves, orders, cuts)
+        kept = np.isin(old_keys, new_keys)
+
+        # Rows of coarsened leaves are reused by later refinements, so a cached
+        # leaf is only kept if it still spans the same box
+        old_leaves = cache["leaves"]
+        kept &= np.all(self.tree.lower[old_leaves] == cache["lower"], axis=1)
+        kept &= np.all(self.tree.upper[old_leaves] == cache["upper"], axis=1)
+        if cache["generation"] != self._quadrature_generation:
+            # Cut leaves were resolved with another geometry or sub-cell depth
+            kept &= ~cache["cuts"]
+        added = leaves[np.isin(new_keys, old_keys[kept], invert=True)]
+        if kept.all() and added.size == 0:
+            return cache
+
+        removed_rows = np.isin(cache["leaf_indices"], cache["leaves"][~kept])
+        new = self._tensorize_integration_points(added)
+        changed_rows = removed_rows.sum() + len(new["leaf_indices"])
+        if changed_rows > self.rebuild_fraction * len(cache["leaf_indices"]):
+            return self._tensorize_integration_points(leaves)
+
+        # Rows of the remaining leaves are kept and the new ones appended
+        rows = torch.from_numpy(np.flatnonzero(~removed_rows))
+        spliced = {
+            "leaves": np.concatenate([cache["leaves"][kept], added]),
+            "lower": np.concatenate([cache["lower"][kept], new["lower"]]),
+            "upper": np.concatenate([cache["upper"][kept], new["upper"]]),
+            "orders": np.concatenate([cache["orders"][kept], new["orders"]]),
+            "cuts": np.concatenate([cache["cuts"][kept], new["cuts"]]),
+            "leaf_indices": np.concatenate(
+                [cache["leaf_indices"][~removed_rows], new["leaf_indices"]]
+            ),
+        }
+        for name in ["coords", "weights", "jacobian_dets"]:
+            spliced[name] = torch.cat(
+                [cache[name].detach()[rows], new[name].detach()]
+            ).requires_grad_()
+
+        return spliced
+
+    @property
+    def _integration_points_cache(self):
+        cache = self._integration_points
+        if (
+            cache is not None
+            and cache["version"] == self.version
+            and cache["generation"] == self._quadrature_generation
+        ):
+            return cache
+
+        leaves = self.active_leaf_indices
+        if cache is None:
+            cache = self._tensorize_integration_points(leaves)
+        else:
+            orders = self.tree.integration_order[leaves]
+            cuts = self.tree.cut[leaves]
+            cache = self._splice_integration_points(cache, leaves, orders, cuts)
+
+        if "xs" not in cache:
+            cache.update(self._coordinate_views(cache["coords"]))
+
+        cache["version"] = self.version
+        cache["generation"] = self._quadrature_generation
+        self._integration_points = cache
+        return cache
+
+    @property
+    def integration_point_coords(self):
+        return self._integration_points_cache["coords"]
+
+    @property
+    def integration_point_weights(self):
+        return self._integration_points_cache["weights"]
+
+    @property
+    def integration_point_jacobian_dets(self):
+        return self._integration_points_cache["jacobian_dets"]
+
+    @property
+    def integration_point_leaf_indices(self):
+        return self._integration_points_cache["leaf_indices"]
+
+    @property
+    def integration_point_xs(self):
+        return self._integration_points_cache["xs"]
+
+    @property
+    def integration_point_ys(self):
+        return self._integration_points_cache["ys"]
+
+    @property
+    def integration_points_data(self):
+        return (
+            self.integration_point_coords,
+            self.integration_point_weights,
+            self.integration_point_jacobian_dets,
+        )
+
 
 class PlanarCartesianGrid(Grid):
-    def __init__(self, x_start, y_start, x_end, y_end, resolution_x, resolution_y):
-        super().__init__(2)
+    cell_type = QuadCell
+    _snapshot_parameters = (
+        "x_start",
+        "y_start",
+        "x_end",
+        "y_end",
+        "resolution_x",
+        "resolution_y",
+        "integration_order",
+        "subcell_depth",
+        "seeds_per_side",
+    )
+
+    def __init__(
+        self,
+        x_start,
+        y_start,
+        x_end,
+        y_end,
+        resolution_x,
+        resolution_y,
+        integration_order=2,
+    ):
+        super().__init__(2, integration_order)
         self.x_start = x_start
         self.y_start = y_start
         self.x_end = x_end
@@ -62,70 +639,129 @@ class PlanarCartesianGrid(Grid):
         dx = self.length_x / self.resolution_x
         dy = self.length_y / self.resolution_y
 
-        for j in range(self.resolution_y):
-            for i in range(self.resolution_x):
-                x_start_cell = self.x_start + dx * i
-                x_end_cell = x_start_cell + dx
-                y_start_cell = self.y_start + dy * j
-                y_end_cell = y_start_cell + dy
-                self.base_cells.append(
-                    QuadCell(x_start_cell, y_start_cell, x_end_cell, y_end_cell)
-                )
+        # Row-major ordering, i.e. base cell (i, j) is root j * resolution_x + i
+        i, j = np.meshgrid(np.arange(self.resolution_x), np.arange(self.resolution_y))
+        x_start_cells = self.x_start + dx * i.ravel()
+        y_start_cells = self.y_start + dy * j.ravel()
+        lower = np.stack([x_start_cells, y_start_cells], axis=1)
+        upper = np.stack([x_start_cells + dx, y_start_cells + dy], axis=1)
+
+        # A new tree restarts its own counter, so carry the grid version over
+        self._base_version = self.version + 1
+        self.tree = LinearQuadtree(capacity=4 * lower.shape[0])
+        roots = self.tree.add_roots(lower, upper, self.integration_order)
+        self.base_cells = [QuadCell.from_tree(self.tree, root) for root in roots]
+
+    def _corner_coords(self, leaves):
+        # Corners of every leaf as [sw, se, nw, ne], shape (leaves, 4, 2)
+        lower = self.tree.lower[leaves]
+        upper = self.tree.upper[leaves]
+        xs = np.stack([lower[:, 0], upper[:, 0], lower[:, 0], upper[:, 0]], axis=1)
+        ys = np.stack([lower[:, 1], lower[:, 1], upper[:, 1], upper[:, 1]], axis=1)
+        return np.stack([xs, ys], axis=2)
+
+    def connectivity(self, unique_vertices=False):
+        leaves = self.active_leaf_indices
+        corner_coords = self._corner_coords(leaves).reshape(-1, 2)
+        if not unique_vertices:
+            return corner_coords, np.arange(corner_coords.shape[0]).reshape(-1, 4)
+
+        # Corners lie on the lattice of the finest leaves, so their integer
+        # lattice coordinates hash them exactly
+        finest_level = int(self.tree.level[leaves].max()) if leaves.size else 0
+        cells_x = self.resolution_x * 2**finest_level
+        cells_y = self.resolution_y * 2**finest_level
+        i = np.rint((corner_coords[:, 0] - self.x_start) / self.length_x * cells_x)
+        j = np.rint((corner_coords[:, 1] - self.y_start) / self.length_y * cells_y)
+        keys = i.astype(np.int64) * (cells_y + 1) + j.astype(np.int64)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return corner_coords[first], inverse.reshape(-1, 4)
+
+    def triangulate(self, unique_vertices=False):
+        # Two triangles per leaf, indexing the vertices of connectivity
+        _, cells = self.connectivity(unique_vertices)
+        triangles = np.stack([cells[:, [0, 1, 3]], cells[:, [0, 3, 2]]], axis=1)
+        return triangles.reshape(-1, 3)
+
+    @property
+    def base_indices(self):
+        return np.arange(self.resolution_x * self.resolution_y)
+
+    def face_base_indices(self, face):
+        base_indices = self.base_indices
+        if face == "top":
+            return base_indices[-self.resolution_x :]
+        elif face == "bottom":
+            return base_indices[: self.resolution_x]
+        elif face == "right":
+            return base_indices[self.i_end :: self.resolution_x]
+        elif face == "left":
+            return base_indices[:: self.resolution_x]
+        else:
+            raise ValueError("Unknown face {}".format(face))
 
-    def triangulate(self):
-        triangles = []
-        for i in range(len(self.active_leaf_cells)):
-            triangles.append([4 * i, 4 * i + 1, 4 * i + 3])
-            triangles.append([4 * i, 4 * i + 3, 4 * i + 2])
-        return triangles
+    def face_leaf_indices(self, face, active_only=False):
+        return self.tree.leaves(
+            roots=self.face_base_indices(face), active_only=active_only, face=face
+        )
 
     @property
     def top_base_cells(self):
         return self.base_cells[-self.resolution_x :]
 
     @property
-    def top_leaf_cells(self):
-        leaf_cells = []
-        for cell in self.top_base_cells:
-            leaf_cells += cell.top_leaves
+    def top_leaf_indices(self):
+        return self.face_leaf_indices("top")
 
-        return leaf_cells
+    @property
+    def top_leaf_cells(self):
+        return self.get_cells(self.top_leaf_indices)
 
     @property
     def bottom_base_cells(self):
         return self.base_cells[: self.resolution_x]
 
     @property
-    def bottom_leaf_cells(self):
-        leaf_cells = []
-        for cell in self.bottom_base_cells:
-            leaf_cells += cell.bottom_leaves
+    def bottom_leaf_indices(self):
+        return self.face_leaf_indices("bottom")
 
-        return leaf_cells
+    @property
+    def bottom_leaf_cells(self):
+        return self.get_cells(self.bottom_leaf_indices)
 
     @property
     def right_base_cells(self):
         return self.base_cells[self.i_end :: self.resolution_x]
 
     @property
-    def right_leaf_cells(self):
-        leaf_cells = []
-        for cell in self.right_base_cells:
-            leaf_cells += cell.right_leaves
+    def right_leaf_indices(self):
+        return self.face_leaf_indices("right")
 
-        return leaf_cells
+    @property
+    def right_leaf_cells(self):
+        return self.get_cells(self.right_leaf_indices)
 
     @property
     def left_base_cells(self):
         return self.base_cells[:: self.resolution_x]
 
+    @property
+    def left_leaf_indices(self):
+        return self.face_leaf_indices("left")
+
     @property
     def left_leaf_cells(self):
-        leaf_cells = []
-        for cell in self.left_base_cells:
-            leaf_cells += cell.left_leaves
+        return self.get_cells(self.left_leaf_indices)
 
-        return leaf_cells
+    @property
+    def bounds(self):
+        return np.array([self.x_start, self.y_start]), np.array(
+            [self.x_end, self.y_end]
+        )
+
+    @property
+    def resolutions(self):
+        return self.resolution_x, self.resolution_y
 
     @property
     def length_x(self):
@@ -145,216 +781,165 @@ class PlanarCartesianGrid(Grid):
 
     @property
     def integration_point_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.active_leaf_cells:
-            xs, ys = cell.integration_point_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        coords, _, _, _ = self.integration_point_arrays()
+        return coords[:, 0], coords[:, 1]
 
     @property
     def integration_point_weights(self):
-        weights = []
-        for cell in self.active_leaf_cells:
-            weights += cell.integration_point_weights
+        _, weights, _, _ = self.integration_point_arrays()
         return weights
 
     @property
     def integration_point_jacobian_dets(self):
-        jacobian_dets = []
-        for cell in self.active_leaf_cells:
-            jacobian_dets += cell.integration_point_jacobian_dets
+        _, _, jacobian_dets, _ = self.integration_point_arrays()
         return jacobian_dets
 
+    @property
+    def integration_point_leaf_indices(self):
+        _, _, _, leaf_indices = self.integration_point_arrays()
+        return leaf_indices
+
+    def _face_index(self, face):
+        face_index = super()._face_index(face)
+        leaves = face_index["leaves"]
+
+        # Corners of all leaves along the face, sorted along it
+        axis, direction = self.tree.faces[face]
+        tangential_axis = 1 - axis
+        bounds = np.concatenate(
+            [
+                self.tree.lower[leaves, tangential_axis],
+                self.tree.upper[leaves, tangential_axis],
+            ]
+        )
+        vertex_coords = np.empty((0, 2))
+        if leaves.size:
+            vertices = np.unique(bounds)
+            vertex_coords = np.empty((vertices.size, 2))
+            vertex_coords[:, tangential_axis] = vertices
+            bound = self.tree.upper if direction > 0 else self.tree.lower
+            vertex_coords[:, axis] = bound[leaves[0], axis]
+
+        face_index["vertex_coords"] = vertex_coords
+        return face_index
+
     @property
     def top_edge_integration_point_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.top_base_cells:
-            xs, ys = cell.top_edge_integration_point_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        coords = self.boundary_index["top"]["coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def top_edge_integration_point_weights(self):
-        weights = []
-        for cell in self.top_base_cells:
-            weights += cell.top_edge_integration_point_weights
-        return weights
+        return self.boundary_index["top"]["weights"]
 
     @property
     def top_edge_integration_point_jacobian_dets(self):
-        jacobian_dets = []
-        for cell in self.top_base_cells:
-            jacobian_dets += cell.top_edge_integration_point_jacobian_dets
-        return jacobian_dets
+        return self.boundary_index["top"]["jacobian_dets"]
 
     @property
     def bottom_edge_integration_point_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.bottom_base_cells:
-            xs, ys = cell.bottom_edge_integration_point_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        coords = self.boundary_index["bottom"]["coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def bottom_edge_integration_point_weights(self):
-        weights = []
-        for cell in self.bottom_base_cells:
-            weights += cell.bottom_edge_integration_point_weights
-        return weights
+        return self.boundary_index["bottom"]["weights"]
 
     @property
     def bottom_edge_integration_point_jacobian_dets(self):
-        jacobian_dets = []
-        for cell in self.bottom_base_cells:
-            jacobian_dets += cell.bottom_edge_integration_point_jacobian_dets
-        return jacobian_dets
+        return self.boundary_index["bottom"]["jacobian_dets"]
 
     @property
     def right_edge_integration_point_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.right_base_cells:
-            xs, ys = cell.right_edge_integration_point_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        coords = self.boundary_index["right"]["coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def right_edge_integration_point_weights(self):
-        weights = []
-        for cell in self.right_base_cells:
-            weights += cell.right_edge_integration_point_weights
-        return weights
+        return self.boundary_index["right"]["weights"]
 
     @property
     def right_edge_integration_point_jacobian_dets(self):
-        jacobian_dets = []
-        for cell in self.right_base_cells:
-            jacobian_dets += cell.right_edge_integration_point_jacobian_dets
-        return jacobian_dets
+        return self.boundary_index["right"]["jacobian_dets"]
 
     @property
     def left_edge_integration_point_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.left_base_cells:
-            xs, ys = cell.left_edge_integration_point_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        coords = self.boundary_index["left"]["coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def left_edge_integration_point_weights(self):
-        weights = []
-        for cell in self.left_base_cells:
-            weights += cell.left_edge_integration_point_weights
-        return weights
+        return self.boundary_index["left"]["weights"]
 
     @property
     def left_edge_integration_point_jacobian_dets(self):
-        jacobian_dets = []
-        for cell in self.left_base_cells:
-            jacobian_dets += cell.left_edge_integration_point_jacobian_dets
-        return jacobian_dets
+        return self.boundary_index["left"]["jacobian_dets"]
 
     @property
     def top_coords(self):
-        all_xs = []
-        all_ys = []
-        for i in range(self.resolution_x):
-            cell = self.get_cell_at_indices(i, self.j_end)
-            for leaf in cell.leaves:
-                xs, ys = leaf.top_coords
-                if self.y_end in ys:
-                    all_xs += xs
-        all_xs = make_array_unique(all_xs)
-        all_xs.sort()
-        all_ys = [self.y_end] * len(all_xs)
-        return all_xs, all_ys
+        coords = self.boundary_index["top"]["vertex_coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def bottom_coords(self):
-        all_xs = []
-        all_ys = []
-        for i in range(self.resolution_x):
-            cell = self.get_cell_at_indices(i, 0)
-            for leaf in cell.leaves:
-                xs, ys = leaf.bottom_coords
-                if self.y_start in ys:
-                    all_xs += xs
-        all_xs = make_array_unique(all_xs)
-        all_xs.sort()
-        all_ys = [self.y_start] * len(all_xs)
-        return all_xs, all_ys
+        coords = self.boundary_index["bottom"]["vertex_coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def right_coords(self):
-        all_xs = []
-        all_ys = []
-        for j in range(self.resolution_y):
-            cell = self.get_cell_at_indices(self.i_end, j)
-            for leaf in cell.leaves:
-                xs, ys = leaf.right_coords
-                if self.x_end in xs:
-                    all_ys += ys
-        all_ys = make_array_unique(all_ys)
-        all_ys.sort()
-        all_xs = [self.x_end] * len(all_ys)
-        return all_xs, all_ys
+        coords = self.boundary_index["right"]["vertex_coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def left_coords(self):
-        all_xs = []
-        all_ys = []
-        for j in range(self.resolution_y):
-            cell = self.get_cell_at_indices(0, j)
-            for leaf in cell.leaves:
-                xs, ys = leaf.left_coords
-                if self.x_start in xs:
-                    all_ys += ys
-        all_ys = make_array_unique(all_ys)
-        all_ys.sort()
-        all_xs = [self.x_start] * len(all_ys)
-        return all_xs, all_ys
+        coords = self.boundary_index["left"]["vertex_coords"]
+        return coords[:, 0], coords[:, 1]
 
     @property
     def corner_coords(self):
-        all_xs = []
-        all_ys = []
-        for cell in self.active_leaf_cells:
-            xs, ys = cell.corner_coords
-            all_xs += xs
-            all_ys += ys
-        return all_xs, all_ys
+        corner_coords = self._corner_coords(self.active_leaf_indices).reshape(-1, 2)
+        return corner_coords[:, 0], corner_coords[:, 1]
 
-    def get_samples(
-        self, filter=None, number_of_samples_x=100, number_of_samples_y=100
+    def _sample_range(
+        self, start, end, filter, number_of_samples_x, number_of_samples_y
     ):
-        all_xs = []
-        all_ys = []
+        # Samples are numbered with y varying fastest, i.e. k = i * ny + j
+        k = np.arange(start, end)
+        i, j = np.divmod(k, number_of_samples_y)
         dx = self.length_x / (number_of_samples_x - 1)
         dy = self.length_y / (number_of_samples_y - 1)
-        for i in range(number_of_samples_x):
-            x = self.x_start + i * dx
-            for j in range(number_of_samples_y):
-                y = self.y_start + j * dy
-                if filter is None:
-                    all_xs.append(x)
-                    all_ys.append(y)
-                elif filter(x, y):
-                    all_xs.append(x)
-                    all_ys.append(y)
-        return all_xs, all_ys
-
-    def set_active_state_with_filter(self, filter, seeds_per_side=10):
-        for cell in self.leaf_cells:
-            cell.is_active = cell.is_inside(filter, seeds_per_side)
+        xs = self.x_start + i * dx
+        ys = self.y_start + j * dy
+        if filter is not None:
+            inside = evaluate(filter, xs, ys)
+            xs, ys = xs[inside], ys[inside]
+        return xs, ys
+
+    def get_samples(
+        self, filter=None, number_of_samples_x=100, number_of_samples_y=100
+    ):
+        return self._sample_range(
+            0,
+            number_of_samples_x * number_of_samples_y,
+            filter,
+            number_of_samples_x,
+            number_of_samples_y,
+        )
+
+    def iter_samples(
+        self,
+        filter=None,
+        number_of_samples_x=100,
+        number_of_samples_y=100,
+        chunk_size=65536,
+    ):
+        # Same samples as get_samples, in chunks of at most chunk_size points
+        number_of_samples = number_of_samples_x * number_of_samples_y
+        for start in range(0, number_of_samples, chunk_size):
+            end = min(start + chunk_size, number_of_samples)
+            yield self._sample_range(
+                start, end, filter, number_of_samples_x, number_of_samples_y
+            )
 
     def _index_exists(self, i, j):
         return 0 <= i <= self.i_end and 0 <= j <= self.j_end
@@ -368,12 +953,83 @@ class PlanarCartesianGrid(Grid):
     def _point_is_inside_grid(self, x, y):
         return self.x_start <= x <= self.x_end and self.y_start <= y <= self.y_end
 
+    def save(self, path):
+        # One .npy file per array so that they can be memory-mapped when loaded
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "parameters": np.array(
+                [getattr(self, name) for name in self._snapshot_parameters],
+                dtype=np.float64,
+            )
+        }
+        for name, array in self.tree.to_arrays().items():
+            arrays["tree_" + name] = array
+
+        leaves = self.active_leaf_indices
+        coords, weights, jacobian_dets, leaf_indices = self.integration_point_arrays(
+            leaves
+        )
+        arrays.update(
+            {
+                "leaves": leaves,
+                "orders": self.tree.integration_order[leaves],
+                "cuts": self.tree.cut[leaves],
+                "coords": coords,
+                "weights": weights,
+                "jacobian_dets": jacobian_dets,
+                "leaf_indices": leaf_indices,
+            }
+        )
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), array)
+
+    @classmethod
+    def load(cls, path, mmap_mode="c", domain=None):
+        # The default copy-on-write mapping reads pages lazily and still lets the
+        # loaded grid be refined or modified without touching the files
+        def read(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+
+        parameters = dict(zip(cls._snapshot_parameters, read("parameters").tolist()))
+        grid = cls(
+            parameters["x_start"],
+            parameters["y_start"],
+            parameters["x_end"],
+            parameters["y_end"],
+            int(parameters["resolution_x"]),
+            int(parameters["resolution_y"]),
+            int(parameters["integration_order"]),
+        )
+        grid.subcell_depth = int(parameters["subcell_depth"])
+        grid.seeds_per_side = int(parameters["seeds_per_side"])
+        grid.domain = domain
+
+        grid._base_version = grid.version + 1
+        grid.tree = LinearQuadtree.from_arrays(
+            {name: read("tree_" + name) for name in LinearQuadtree._fields}
+        )
+        grid.base_cells = [
+            QuadCell.from_tree(grid.tree, root) for root in grid.base_indices
+        ]
+        grid._load_integration_points(read)
+        return grid
+
+    def _load_integration_points(self, read):
+        # Integration points are computed on demand, only cached grids reuse them
+        pass
+
+    def _base_cell_indices(self, xs, ys):
+        # Points on the end of the grid belong to the last row or column of cells
+        i = np.floor((xs - self.x_start) / self.length_x * self.resolution_x)
+        j = np.floor((ys - self.y_start) / self.length_y * self.resolution_y)
+        i = np.clip(i, 0, self.i_end).astype(np.int64)
+        j = np.clip(j, 0, self.j_end).astype(np.int64)
+        return i, j
+
     def get_cell_indices_from_coords(self, x, y):
         if self._point_is_inside_grid(x, y):
-            i = int((x - self.x_start) / self.length_x)
-            j = int((y - self.y_start) / self.length_y)
-
-            return i, j
+            i, j = self._base_cell_indices(x, y)
+            return int(i), int(j)
 
         raise ValueError("Point ({},{}) is outside the grid".format(x, y))
 
@@ -381,124 +1037,115 @@ class PlanarCartesianGrid(Grid):
         i, j = self.get_cell_indices_from_coords(x, y)
         return self.get_cell_at_indices(i, j)
 
+    def get_leaf_cell_from_coords(self, x, y):
+        if self._point_is_inside_grid(x, y):
+            return self.get_cells(self.locate_leaf_indices([x, y]))[0]
 
-class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
-    def __init__(self, x_start, y_start, x_end, y_end, resolution_x, resolution_y):
-        super().__init__(x_start, y_start, x_end, y_end, resolution_x, resolution_y)
-        # Cashed values for efficiency
-        self._integration_point_coords = None
-        self._integration_point_weights = None
-        self._integration_point_jacobian_dets = None
-        self._integration_point_xs = None
-        self._integration_point_ys = None
-        self._top_edge_integration_point_coords = None
-        self._top_edge_integration_point_weights = None
-        self._top_edge_integration_point_jacobian_dets = None
-        self._top_edge_integration_point_xs = None
-        self._top_edge_integration_point_ys = None
-        self._bottom_edge_integration_point_coords = None
-        self._bottom_edge_integration_point_weights = None
-        self._bottom_edge_integration_point_jacobian_dets = None
-        self._bottom_edge_integration_point_xs = None
-        self._bottom_edge_integration_point_ys = None
-        self._right_edge_integration_point_coords = None
-        self._right_edge_integration_point_weights = None
-        self._right_edge_integration_point_jacobian_dets = None
-        self._right_edge_integration_point_xs = None
-        self._right_edge_integration_point_ys = None
-        self._left_edge_integration_point_coords = None
-        self._left_edge_integration_point_weights = None
-        self._left_edge_integration_point_jacobian_dets = None
-        self._left_edge_integration_point_xs = None
-        self._left_edge_integration_point_ys = None
-        self._samples_coords = None
-        self._samples_xs = None
-        self._samples_ys = None
-
-    @property
-    def integration_point_coords(self):
-        if self._integration_point_coords is None:
-            xs, ys = super().integration_point_coords
-            self._integration_point_coords = tensorize_2d(xs, ys)
-
-        return self._integration_point_coords
-
-    @property
-    def integration_point_weights(self):
-        if self._integration_point_weights is None:
-            weights = super().integration_point_weights
-            self._integration_point_weights = tensorize_1d(weights)
-
-        return self._integration_point_weights
-
-    @property
-    def integration_point_jacobian_dets(self):
-        if self._integration_point_jacobian_dets is None:
-            jacobian_dets = super().integration_point_jacobian_dets
-            self._integration_point_jacobian_dets = tensorize_1d(jacobian_dets)
-
-        return self._integration_point_jacobian_dets
-
-    @property
-    def integration_point_xs(self):
-        if self._integration_point_xs is None:
-            self._integration_point_xs = self.integration_point_coords[:, 0].view(-1, 1)
-
-        return self._integration_point_xs
-
-    @property
-    def integration_point_ys(self):
-        if self._integration_point_ys is None:
-            self._integration_point_ys = self.integration_point_coords[:, 1].view(-1, 1)
+        raise ValueError("Point ({},{}) is outside the grid".format(x, y))
 
-        return self._integration_point_ys
 
-    @property
-    def integration_points_data(self):
-        return (
-            self.integration_point_coords,
-            self.integration_point_weights,
-            self.integration_point_jacobian_dets,
+class TensorizedPlanarCartesianGrid(TensorizedGrid, PlanarCartesianGrid):
+    def __init__(
+        self,
+        x_start,
+        y_start,
+        x_end,
+        y_end,
+        resolution_x,
+        resolution_y,
+        integration_order=2,
+        dtype=torch.float64,
+    ):
+        super().__init__(
+            x_start,
+            y_start,
+            x_end,
+            y_end,
+            resolution_x,
+            resolution_y,
+            integration_order,
         )
+        # Cached values for efficiency, validated against the grid version
+        self._edge_integration_points = {}
+        self._samples_coords = None
+        self._dtype = dtype
+
+    def _clear_tensors(self):
+        super()._clear_tensors()
+        self._edge_integration_points = {}
+        if self._samples_coords is not None:
+            self._samples_coords = (
+                self._samples_coords.detach().to(self.dtype).requires_grad_()
+            )
+
+    def _caches(self):
+        return super()._caches() + [
+            self._edge_integration_points,
+            {"samples": self._samples_coords},
+        ]
+
+    def _edge_integration_points_cache(self, face):
+        cache = self._edge_integration_points.get(face)
+        generation = self._quadrature_generation
+        if (
+            cache is not None
+            and cache["version"] == self.version
+            and cache["generation"] == generation
+        ):
+            return cache
+
+        # Edge data only depends on the active leaves along that edge
+        face_index = self.boundary_index[face]
+        leaves = face_index["active_leaves"]
+        orders = self.tree.integration_order[leaves]
+        # Rows of coarsened leaves are reused, so their boxes are compared too
+        bounds = np.hstack([self.tree.lower[leaves], self.tree.upper[leaves]])
+        cuts = self.tree.cut[leaves]
+        if (
+            cache is None
+            or not np.array_equal(leaves, cache["leaves"])
+            or not np.array_equal(orders, cache["orders"])
+            or not np.array_equal(bounds, cache["bounds"])
+            or not np.array_equal(cuts, cache["cuts"])
+            or (cuts.any() and generation != cache["generation"])
+        ):
+            coords = self._tensorize_coords(face_index["coords"])
+            cache = {
+                "leaves": leaves,
+                "orders": orders,
+                "bounds": bounds,
+                "cuts": cuts,
+                "coords": coords,
+                "weights": tensorize_1d(face_index["weights"], self.dtype),
+                "jacobian_dets": tensorize_1d(face_index["jacobian_dets"], self.dtype),
+                "xs": coords[:, 0].view(-1, 1),
+                "ys": coords[:, 1].view(-1, 1),
+            }
+
+        cache["version"] = self.version
+        cache["generation"] = generation
+        self._edge_integration_points[face] = cache
+        return cache
 
     @property
     def top_edge_integration_point_coords(self):
-        if self._top_edge_integration_point_coords is None:
-            xs, ys = super().top_edge_integration_point_coords
-            self._top_edge_integration_point_coords = tensorize_2d(xs, ys)
-        return self._top_edge_integration_point_coords
+        return self._edge_integration_points_cache("top")["coords"]
 
     @property
     def top_edge_integration_point_weights(self):
-        if self._top_edge_integration_point_weights is None:
-            weights = super().top_edge_integration_point_weights
-            self._top_edge_integration_point_weights = tensorize_1d(weights)
-
-        return self._top_edge_integration_point_weights
+        return self._edge_integration_points_cache("top")["weights"]
 
     @property
     def top_edge_integration_point_jacobian_dets(self):
-        if self._top_edge_integration_point_jacobian_dets is None:
-            jacobian_dets = super().top_edge_integration_point_jacobian_dets
-            self._top_edge_integration_point_jacobian_dets = tensorize_1d(jacobian_dets)
-
-        return self._top_edge_integration_point_jacobian_dets
+        return self._edge_integration_points_cache("top")["jacobian_dets"]
 
     @property
     def top_edge_integration_point_xs(self):
-        if self._top_edge_integration_point_xs is None:
-            self._top_edge_integration_point_xs = (
-                self.top_edge_integration_point_coords[:, 0].view(-1, 1)
-            )
-        return self._top_edge_integration_point_xs
+        return self._edge_integration_points_cache("top")["xs"]
 
     @property
     def top_edge_integration_point_ys(self):
-        if self._top_edge_integration_point_ys is None:
-            self._top_edge_integration_point_ys = (
-                self.top_edge_integration_point_coords[:, 1].view(-1, 1)
-            )
-        return self._top_edge_integration_point_ys
+        return self._edge_integration_points_cache("top")["ys"]
 
     @property
     def top_edge_integration_points_data(self):
@@ -510,44 +1157,23 @@ class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
 
     @property
     def bottom_edge_integration_point_coords(self):
-        if self._bottom_edge_integration_point_coords is None:
-            xs, ys = super().bottom_edge_integration_point_coords
-            self._bottom_edge_integration_point_coords = tensorize_2d(xs, ys)
-        return self._bottom_edge_integration_point_coords
+        return self._edge_integration_points_cache("bottom")["coords"]
 
     @property
     def bottom_edge_integration_point_weights(self):
-        if self._bottom_edge_integration_point_weights is None:
-            weights = super().bottom_edge_integration_point_weights
-            self._bottom_edge_integration_point_weights = tensorize_1d(weights)
-
-        return self._bottom_edge_integration_point_weights
+        return self._edge_integration_points_cache("bottom")["weights"]
 
     @property
     def bottom_edge_integration_point_jacobian_dets(self):
-        if self._bottom_edge_integration_point_jacobian_dets is None:
-            jacobian_dets = super().bottom_edge_integration_point_jacobian_dets
-            self._bottom_edge_integration_point_jacobian_dets = tensorize_1d(
-                jacobian_dets
-            )
-
-        return self._bottom_edge_integration_point_jacobian_dets
+        return self._edge_integration_points_cache("bottom")["jacobian_dets"]
 
     @property
     def bottom_edge_integration_point_xs(self):
-        if self._bottom_edge_integration_point_xs is None:
-            self._bottom_edge_integration_point_xs = (
-                self.bottom_edge_integration_point_coords[:, 0].view(-1, 1)
-            )
-        return self._bottom_edge_integration_point_xs
+        return self._edge_integration_points_cache("bottom")["xs"]
 
     @property
     def bottom_edge_integration_point_ys(self):
-        if self._bottom_edge_integration_point_ys is None:
-            self._bottom_edge_integration_point_ys = (
-                self.bottom_edge_integration_point_coords[:, 1].view(-1, 1)
-            )
-        return self._bottom_edge_integration_point_ys
+        return self._edge_integration_points_cache("bottom")["ys"]
 
     @property
     def bottom_edge_integration_points_data(self):
@@ -559,44 +1185,23 @@ class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
 
     @property
     def right_edge_integration_point_coords(self):
-        if self._right_edge_integration_point_coords is None:
-            xs, ys = super().right_edge_integration_point_coords
-            self._right_edge_integration_point_coords = tensorize_2d(xs, ys)
-        return self._right_edge_integration_point_coords
+        return self._edge_integration_points_cache("right")["coords"]
 
     @property
     def right_edge_integration_point_weights(self):
-        if self._right_edge_integration_point_weights is None:
-            weights = super().right_edge_integration_point_weights
-            self._right_edge_integration_point_weights = tensorize_1d(weights)
-
-        return self._right_edge_integration_point_weights
+        return self._edge_integration_points_cache("right")["weights"]
 
     @property
     def right_edge_integration_point_jacobian_dets(self):
-        if self._right_edge_integration_point_jacobian_dets is None:
-            jacobian_dets = super().right_edge_integration_point_jacobian_dets
-            self._right_edge_integration_point_jacobian_dets = tensorize_1d(
-                jacobian_dets
-            )
-
-        return self._right_edge_integration_point_jacobian_dets
+        return self._edge_integration_points_cache("right")["jacobian_dets"]
 
     @property
     def right_edge_integration_point_xs(self):
-        if self._right_edge_integration_point_xs is None:
-            self._right_edge_integration_point_xs = (
-                self.right_edge_integration_point_coords[:, 0].view(-1, 1)
-            )
-        return self._right_edge_integration_point_xs
+        return self._edge_integration_points_cache("right")["xs"]
 
     @property
     def right_edge_integration_point_ys(self):
-        if self._right_edge_integration_point_ys is None:
-            self._right_edge_integration_point_ys = (
-                self.right_edge_integration_point_coords[:, 1].view(-1, 1)
-            )
-        return self._right_edge_integration_point_ys
+        return self._edge_integration_points_cache("right")["ys"]
 
     @property
     def right_edge_integration_points_data(self):
@@ -608,44 +1213,23 @@ class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
 
     @property
     def left_edge_integration_point_coords(self):
-        if self._left_edge_integration_point_coords is None:
-            xs, ys = super().left_edge_integration_point_coords
-            self._left_edge_integration_point_coords = tensorize_2d(xs, ys)
-        return self._left_edge_integration_point_coords
+        return self._edge_integration_points_cache("left")["coords"]
 
     @property
     def left_edge_integration_point_weights(self):
-        if self._left_edge_integration_point_weights is None:
-            weights = super().left_edge_integration_point_weights
-            self._left_edge_integration_point_weights = tensorize_1d(weights)
-
-        return self._left_edge_integration_point_weights
+        return self._edge_integration_points_cache("left")["weights"]
 
     @property
     def left_edge_integration_point_jacobian_dets(self):
-        if self._left_edge_integration_point_jacobian_dets is None:
-            jacobian_dets = super().left_edge_integration_point_jacobian_dets
-            self._left_edge_integration_point_jacobian_dets = tensorize_1d(
-                jacobian_dets
-            )
-
-        return self._left_edge_integration_point_jacobian_dets
+        return self._edge_integration_points_cache("left")["jacobian_dets"]
 
     @property
     def left_edge_integration_point_xs(self):
-        if self._left_edge_integration_point_xs is None:
-            self._left_edge_integration_point_xs = (
-                self.left_edge_integration_point_coords[:, 0].view(-1, 1)
-            )
-        return self._left_edge_integration_point_xs
+        return self._edge_integration_points_cache("left")["xs"]
 
     @property
     def left_edge_integration_point_ys(self):
-        if self._left_edge_integration_point_ys is None:
-            self._left_edge_integration_point_ys = (
-                self.left_edge_integration_point_coords[:, 1].view(-1, 1)
-            )
-        return self._left_edge_integration_point_ys
+        return self._edge_integration_points_cache("left")["ys"]
 
     @property
     def left_edge_integration_points_data(self):
@@ -658,10 +1242,26 @@ class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
     def prepare_samples(
         self, implicit_geometry=None, number_of_samples_x=100, number_of_samples_y=100
     ):
-        xs, ys = super().get_samples(
+        xs, ys = self.get_samples(
             implicit_geometry, number_of_samples_x, number_of_samples_y
         )
-        self._samples_coords = tensorize_2d(xs, ys)
+        self._samples_coords = self._tensorize_samples(xs, ys)
+
+    def _tensorize_samples(self, xs, ys):
+        coords = torch.from_numpy(np.stack([xs, ys], axis=1))
+        return coords.to(self.dtype).requires_grad_()
+
+    def iter_samples_coords(
+        self,
+        implicit_geometry=None,
+        number_of_samples_x=100,
+        number_of_samples_y=100,
+        chunk_size=65536,
+    ):
+        for xs, ys in self.iter_samples(
+            implicit_geometry, number_of_samples_x, number_of_samples_y, chunk_size
+        ):
+            yield self._tensorize_samples(xs, ys)
 
     @property
     def samples_coords(self):
@@ -683,3 +1283,210 @@ class TensorizedPlanarCartesianGrid(PlanarCartesianGrid):
             raise ValueError("Samples are not prepared")
         else:
             return self._samples_coords[:, 1].view(-1, 1)
+
+
+class SolidCartesianGrid(Grid):
+    cell_type = HexCell
+
+    def __init__(
+        self,
+        x_start,
+        y_start,
+        z_start,
+        x_end,
+        y_end,
+        z_end,
+        resolution_x,
+        resolution_y,
+        resolution_z,
+        integration_order=2,
+    ):
+        super().__init__(3, integration_order)
+        self.x_start = x_start
+        self.y_start = y_start
+        self.z_start = z_start
+        self.x_end = x_end
+        self.y_end = y_end
+        self.z_end = z_end
+        self.resolution_x = resolution_x
+        self.resolution_y = resolution_y
+        self.resolution_z = resolution_z
+        self.generate()
+
+    def generate(self):
+        if self.base_cells:
+            raise ValueError("Grid already generated!")
+
+        lower_bound, upper_bound = self.bounds
+        steps = (upper_bound - lower_bound) / np.array(self.resolutions)
+
+        # Base cell (i, j, k) is root (k * resolution_y + j) * resolution_x + i
+        k, j, i = np.meshgrid(
+            np.arange(self.resolution_z),
+            np.arange(self.resolution_y),
+            np.arange(self.resolution_x),
+            indexing="ij",
+        )
+        cells = np.stack([i.ravel(), j.ravel(), k.ravel()], axis=1)
+        lower = lower_bound + steps * cells
+        upper = lower + steps
+
+        # A new tree restarts its own counter, so carry the grid version over
+        self._base_version = self.version + 1
+        self.tree = LinearOctree(capacity=8 * lower.shape[0])
+        roots = self.tree.add_roots(lower, upper, self.integration_order)
+        self.base_cells = [HexCell.from_tree(self.tree, root) for root in roots]
+
+    @property
+    def bounds(self):
+        return (
+            np.array([self.x_start, self.y_start, self.z_start]),
+            np.array([self.x_end, self.y_end, self.z_end]),
+        )
+
+    @property
+    def resolutions(self):
+        return self.resolution_x, self.resolution_y, self.resolution_z
+
+    @property
+    def length_x(self):
+        return self.x_end - self.x_start
+
+    @property
+    def length_y(self):
+        return self.y_end - self.y_start
+
+    @property
+    def length_z(self):
+        return self.z_end - self.z_start
+
+    @property
+    def i_end(self):
+        return self.resolution_x - 1
+
+    @property
+    def j_end(self):
+        return self.resolution_y - 1
+
+    @property
+    def k_end(self):
+        return self.resolution_z - 1
+
+    @property
+    def base_indices(self):
+        return np.arange(self.resolution_x * self.resolution_y * self.resolution_z)
+
+    def face_base_indices(self, face):
+        base_indices = self.base_indices.reshape(
+            self.resolution_z, self.resolution_y, self.resolution_x
+        )
+        if face == "top":
+            return base_indices[:, -1, :].ravel()
+        elif face == "bottom":
+            return base_indices[:, 0, :].ravel()
+        elif face == "right":
+            return base_indices[:, :, -1].ravel()
+        elif face == "left":
+            return base_indices[:, :, 0].ravel()
+        elif face == "front":
+            return base_indices[-1].ravel()
+        elif face == "back":
+            return base_indices[0].ravel()
+        else:
+            raise ValueError("Unknown face {}".format(face))
+
+    def face_leaf_indices(self, face, active_only=False):
+        return self.tree.leaves(
+            roots=self.face_base_indices(face), active_only=active_only, face=face
+        )
+
+    def _index_exists(self, i, j, k):
+        return 0 <= i <= self.i_end and 0 <= j <= self.j_end and 0 <= k <= self.k_end
+
+    def get_cell_at_indices(self, i, j, k):
+        if self._index_exists(i, j, k):
+            return self.base_cells[(k * self.resolution_y + j) * self.resolution_x + i]
+
+        raise ValueError("Indices ({},{},{}) are outside the grid".format(i, j, k))
+
+    @property
+    def integration_point_coords(self):
+        coords, _, _, _ = self.integration_point_arrays()
+        return coords[:, 0], coords[:, 1], coords[:, 2]
+
+    @property
+    def integration_point_weights(self):
+        _, weights, _, _ = self.integration_point_arrays()
+        return weights
+
+    @property
+    def integration_point_jacobian_dets(self):
+        _, _, jacobian_dets, _ = self.integration_point_arrays()
+        return jacobian_dets
+
+    @property
+    def integration_point_leaf_indices(self):
+        _, _, _, leaf_indices = self.integration_point_arrays()
+        return leaf_indices
+
+
+class TensorizedSolidCartesianGrid(TensorizedGrid, SolidCartesianGrid):
+    def __init__(
+        self,
+        x_start,
+        y_start,
+        z_start,
+        x_end,
+        y_end,
+        z_end,
+        resolution_x,
+        resolution_y,
+        resolution_z,
+        integration_order=2,
+        dtype=torch.float64,
+    ):
+        super().__init__(
+            x_start,
+            y_start,
+            z_start,
+            x_end,
+            y_end,
+            z_end,
+            resolution_x,
+            resolution_y,
+            resolution_z,
+            integration_order,
+        )
+        # Cached values for efficiency, validated against the grid version
+        self._face_integration_points = {}
+        self._dtype = dtype
+
+    def _clear_tensors(self):
+        super()._clear_tensors()
+        self._face_integration_points = {}
+
+    def _caches(self):
+        return super()._caches() + [self._face_integration_points]
+
+    @property
+    def integration_point_zs(self):
+        return self._integration_points_cache["zs"]
+
+    def face_integration_points_data(self, face):
+        cache = self._face_integration_points.get(face)
+        if (
+            cache is None
+            or cache["version"] != self.version
+            or cache["generation"] != self._quadrature_generation
+        ):
+            face_index = self.boundary_index[face]
+            cache = {
+                "coords": self._tensorize_coords(face_index["coords"]),
+                "weights": tensorize_1d(face_index["weights"], self.dtype),
+                "jacobian_dets": tensorize_1d(face_index["jacobian_dets"], self.dtype),
+                "version": self.version,
+                "generation": self._quadrature_generation,
+            }
+            self._face_integration_points[face] = cache
+
+        return cache["coords"], cache["weights"], cache["jacobian_dets"]
@@ -1,31 +1,225 @@
+import numpy as np
+import torch
+
+# Classification of a cell with respect to a geometry
+OUTSIDE = -1
+CUT = 0
+INSIDE = 1
+
+
+def _logical_not(values):
+    if torch.is_tensor(values):
+        return torch.logical_not(values)
+
+    return np.logical_not(values)
+
+
+def _minimum(a, b):
+    if torch.is_tensor(a) or torch.is_tensor(b):
+        return torch.minimum(torch.as_tensor(a), torch.as_tensor(b))
+
+    return np.minimum(a, b)
+
+
+def _maximum(a, b):
+    if torch.is_tensor(a) or torch.is_tensor(b):
+        return torch.maximum(torch.as_tensor(a), torch.as_tensor(b))
+
+    return np.maximum(a, b)
+
+
+class ImplicitGeometry:
+    # Geometries are evaluated elementwise, so the same object classifies a single
+    # point given as floats or many points given as NumPy arrays or torch tensors
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *coords):
+        return self.function(*coords)
+
+    def __or__(self, other):
+        return union(self, other)
+
+    def __and__(self, other):
+        return intersection(self, other)
+
+    def __sub__(self, other):
+        return difference(self, other)
+
+    def __invert__(self):
+        return invert(self)
+
+
+class SignedDistanceGeometry(ImplicitGeometry):
+    # The distance is negative inside and never overestimates the distance to the
+    # boundary, so a cell whose centre is further away from the boundary than its
+    # half-diagonal cannot be cut
+    def __init__(self, distance):
+        super().__init__(lambda *coords: distance(*coords) <= 0)
+        self.distance = distance
+
+
+def evaluate(domain, *coords):
+    if isinstance(domain, ImplicitGeometry):
+        return np.asarray(domain(*coords), dtype=bool)
+
+    # Plain callables are only guaranteed to work on scalars
+    return np.vectorize(domain, otypes=[bool])(*coords)
+
+
+def seed_coords(lower, upper, seeds_per_side=10):
+    # Lattice of seeds_per_side points per axis including the box bounds
+    spatial_dimensions = lower.shape[1]
+    steps = (upper - lower) / (seeds_per_side - 1)
+    lattice = np.meshgrid(
+        *[np.arange(seeds_per_side)] * spatial_dimensions, indexing="ij"
+    )
+    lattice = np.stack([i.ravel() for i in lattice], axis=1)
+    return lower[:, None, :] + lattice[None, :, :] * steps[:, None, :]
+
+
+def count_inside_seeds(domain, lower, upper, seeds_per_side=10, chunk_size=65536):
+    lower = np.atleast_2d(lower)
+    upper = np.atleast_2d(upper)
+    counts = np.empty(lower.shape[0], dtype=np.int64)
+
+    # Chunks bound the size of the seed arrays for very large numbers of boxes
+    for start in range(0, lower.shape[0], chunk_size):
+        end = start + chunk_size
+        seeds = seed_coords(lower[start:end], upper[start:end], seeds_per_side)
+        inside = evaluate(domain, *np.moveaxis(seeds, -1, 0))
+        counts[start:end] = inside.sum(axis=1)
+
+    return counts
+
+
+def classify(domain, lower, upper, seeds_per_side=10):
+    lower = np.atleast_2d(lower)
+    upper = np.atleast_2d(upper)
+    classes = np.full(lower.shape[0], CUT, dtype=np.int8)
+
+    if isinstance(domain, SignedDistanceGeometry):
+        # One evaluation per box, at its centre
+        centres = (lower + upper) / 2
+        half_diagonals = np.linalg.norm(upper - lower, axis=1) / 2
+        distances = np.asarray(domain.distance(*centres.T), dtype=np.float64)
+        classes[distances < -half_diagonals] = INSIDE
+        classes[distances > half_diagonals] = OUTSIDE
+    else:
+        counts = count_inside_seeds(domain, lower, upper, seeds_per_side)
+        classes[counts == seeds_per_side ** lower.shape[1]] = INSIDE
+        classes[counts == 0] = OUTSIDE
+
+    return classes
+
+
 def make_circle(x0, y0, radius):
-    return lambda x, y: (x - x0) ** 2 + (y - y0) ** 2 <= radius**2
+    return ImplicitGeometry(lambda x, y: (x - x0) ** 2 + (y - y0) ** 2 <= radius**2)
 
 
 def make_ellipse(x0, y0, a, b):
-    return lambda x, y: ((x - x0) / a) ** 2 + ((y - y0) / b) ** 2 <= 1
+    return ImplicitGeometry(lambda x, y: ((x - x0) / a) ** 2 + ((y - y0) / b) ** 2 <= 1)
 
 
 def make_rectangle(x_start, y_start, x_end, y_end):
-    return lambda x, y: (x_start <= x <= x_end) and (y_start <= y <= y_end)
+    return ImplicitGeometry(
+        lambda x, y: (x_start <= x) & (x <= x_end) & (y_start <= y) & (y <= y_end)
+    )
+
+
+def make_sphere(x0, y0, z0, radius):
+    return ImplicitGeometry(
+        lambda x, y, z: (x - x0) ** 2 + (y - y0) ** 2 + (z - z0) ** 2 <= radius**2
+    )
+
+
+def make_signed_distance_circle(x0, y0, radius):
+    return SignedDistanceGeometry(
+        lambda x, y: ((x - x0) ** 2 + (y - y0) ** 2) ** 0.5 - radius
+    )
+
+
+def make_signed_distance_ellipse(x0, y0, a, b):
+    # The level set of the scaled norm is a lower bound of the exact distance
+    return SignedDistanceGeometry(
+        lambda x, y: min(a, b)
+        * ((((x - x0) / a) ** 2 + ((y - y0) / b) ** 2) ** 0.5 - 1)
+    )
+
+
+def make_signed_distance_sphere(x0, y0, z0, radius):
+    return SignedDistanceGeometry(
+        lambda x, y, z: ((x - x0) ** 2 + (y - y0) ** 2 + (z - z0) ** 2) ** 0.5 - radius
+    )
+
+
+def make_signed_distance_rectangle(x_start, y_start, x_end, y_end):
+    x_mid = (x_start + x_end) / 2
+    y_mid = (y_start + y_end) / 2
+    half_x = (x_end - x_start) / 2
+    half_y = (y_end - y_start) / 2
+
+    def distance(x, y):
+        dx = abs(x - x_mid) - half_x
+        dy = abs(y - y_mid) - half_y
+        outside = (_maximum(dx, 0.0) ** 2 + _maximum(dy, 0.0) ** 2) ** 0.5
+        inside = _minimum(_maximum(dx, dy), 0.0)
+        return outside + inside
+
+    return SignedDistanceGeometry(distance)
+
+
+def _are_signed_distances(*domains):
+    return all(isinstance(domain, SignedDistanceGeometry) for domain in domains)
 
 
 def union(domain_a, domain_b):
-    return lambda x, y: domain_a(x, y) or domain_b(x, y)
+    if _are_signed_distances(domain_a, domain_b):
+        return SignedDistanceGeometry(
+            lambda *coords: _minimum(
+                domain_a.distance(*coords), domain_b.distance(*coords)
+            )
+        )
+
+    return ImplicitGeometry(lambda *coords: domain_a(*coords) | domain_b(*coords))
 
 
 def intersection(domain_a, domain_b):
-    return lambda x, y: domain_a(x, y) and domain_b(x, y)
+    if _are_signed_distances(domain_a, domain_b):
+        return SignedDistanceGeometry(
+            lambda *coords: _maximum(
+                domain_a.distance(*coords), domain_b.distance(*coords)
+            )
+        )
+
+    return ImplicitGeometry(lambda *coords: domain_a(*coords) & domain_b(*coords))
 
 
 def difference(domain_a, domain_b):
-    return lambda x, y: domain_a(x, y) and not domain_b(x, y)
+    if _are_signed_distances(domain_a, domain_b):
+        return SignedDistanceGeometry(
+            lambda *coords: _maximum(
+                domain_a.distance(*coords), -domain_b.distance(*coords)
+            )
+        )
+
+    return ImplicitGeometry(
+        lambda *coords: domain_a(*coords) & _logical_not(domain_b(*coords))
+    )
 
 
 def invert(domain):
-    return lambda x, y: not domain(x, y)
+    if _are_signed_distances(domain):
+        return SignedDistanceGeometry(lambda *coords: -domain.distance(*coords))
+
+    return ImplicitGeometry(lambda *coords: _logical_not(domain(*coords)))
 
 
 def make_circular_hole(x0, y0, radius):
     circle = make_circle(x0, y0, radius)
     return invert(circle)
+
+
+def make_signed_distance_circular_hole(x0, y0, radius):
+    circle = make_signed_distance_circle(x0, y0, radius)
+    return invert(circle)
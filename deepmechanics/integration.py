@@ -1,5 +1,41 @@
+from functools import lru_cache
+
+import numpy as np
 import torch
 
 
-def gauss_legendre_integration(integrand, weights, jacobian_dets):
-    return torch.sum(integrand * weights * jacobian_dets)
+def gauss_legendre_integration(integrand, weights, jacobian_dets, dtype=None):
+    # The sum can be accumulated in a wider type than the integrand
+    return torch.sum(integrand * weights * jacobian_dets, dtype=dtype)
+
+
+def tensor_product_rule(points, weights, spatial_dimensions):
+    # The first local coordinate varies slowest, i.e. (xi, eta) loops as xi -> eta
+    points = np.meshgrid(*[np.asarray(points)] * spatial_dimensions, indexing="ij")
+    weights = np.meshgrid(*[np.asarray(weights)] * spatial_dimensions, indexing="ij")
+    points = np.stack([p.ravel() for p in points], axis=1)
+    weights = np.prod(np.stack([w.ravel() for w in weights], axis=1), axis=1)
+    return points, weights
+
+
+@lru_cache(maxsize=None)
+def gauss_legendre_rule(order):
+    if order < 1:
+        raise ValueError("Integration order must be positive, got {}".format(order))
+
+    points, weights = np.polynomial.legendre.leggauss(int(order))
+
+    # Rules are shared by every cell, so they must not be modified in place
+    points.flags.writeable = False
+    weights.flags.writeable = False
+    return points, weights
+
+
+@lru_cache(maxsize=None)
+def gauss_legendre_reference_rule(order, spatial_dimensions):
+    points, weights = tensor_product_rule(
+        *gauss_legendre_rule(order), spatial_dimensions
+    )
+    points.flags.writeable = False
+    weights.flags.writeable = False
+    return points, weights
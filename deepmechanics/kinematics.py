@@ -7,6 +7,9 @@ class LinearKinematicLaw:
         dux = get_derivative(ux, coords, 1)
         duy = get_derivative(uy, coords, 1)
 
+        return self.compute_strains_from_gradients(dux, duy)
+
+    def compute_strains_from_gradients(self, dux, duy):
         # Filter components out
         ex = dux[:, 0].view(-1, 1)
         exy = dux[:, 1].view(-1, 1)
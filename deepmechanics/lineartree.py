@@ -0,0 +1,354 @@
+import numpy as np
+
+from deepmechanics.implicitgeometry import CUT, INSIDE, classify, count_inside_seeds
+
+
+def subdivide(lower, upper):
+    # Bit k of a child position tells if the child lies in the upper half of
+    # axis k, which gives the [sw, se, nw, ne] ordering in 2D
+    spatial_dimensions = lower.shape[1]
+    positions = np.arange(2**spatial_dimensions)
+    offsets = ((positions[:, None] >> np.arange(spatial_dimensions)) & 1).astype(bool)
+
+    # Broadcast (boxes, 1, dims) against (1, children, dims)
+    lower = lower[:, None, :]
+    upper = upper[:, None, :]
+    mid = (lower + upper) / 2
+    return (
+        np.where(offsets, mid, lower).reshape(-1, spatial_dimensions),
+        np.where(offsets, upper, mid).reshape(-1, spatial_dimensions),
+    )
+
+
+def map_local_to_global(lower, upper, local_coords):
+    # Broadcast (boxes, 1, dims) against (1, points, dims)
+    lower = lower[:, None, :]
+    upper = upper[:, None, :]
+    return (lower + upper) / 2 + (upper - lower) * local_coords[None, :, :] / 2
+
+
+def pack_masks(masks):
+    # Eight nodes per byte, the sizes recover the padding of the last byte
+    return [(np.packbits(mask), mask.size) for mask in masks]
+
+
+def unpack_masks(packed_masks):
+    return [np.unpackbits(bits, count=size).astype(bool) for bits, size in packed_masks]
+
+
+class LinearTree:
+    faces = {}
+    _fields = (
+        "lower",
+        "upper",
+        "level",
+        "key",
+        "root",
+        "first_child",
+        "active",
+        "alive",
+        "integration_order",
+        "cut",
+    )
+
+    def __init__(self, spatial_dimensions, capacity=64):
+        self.spatial_dimensions = spatial_dimensions
+        self.number_of_children = 2**spatial_dimensions
+        self.max_level = 62 // spatial_dimensions  # Morton keys must fit in int64
+        self.size = 0
+        self.version = 0  # Bumped on every change of the leaves or their state
+        self.free_blocks = np.empty(0, dtype=np.int64)  # Released blocks of children
+
+        # Struct of arrays, one row per node (alive or not)
+        self.lower = np.empty((capacity, spatial_dimensions))
+        self.upper = np.empty((capacity, spatial_dimensions))
+        self.level = np.empty(capacity, dtype=np.int8)
+        self.key = np.empty(capacity, dtype=np.int64)
+        self.root = np.empty(capacity, dtype=np.int64)
+        self.first_child = np.empty(capacity, dtype=np.int64)
+        self.active = np.empty(capacity, dtype=bool)
+        self.alive = np.empty(capacity, dtype=bool)
+        self.integration_order = np.empty(capacity, dtype=np.int8)
+        self.cut = np.empty(capacity, dtype=bool)  # Active but cut by the domain
+
+    @property
+    def capacity(self):
+        return self.level.shape[0]
+
+    def _reserve(self, count):
+        required = self.size + count
+        if required <= self.capacity:
+            return
+
+        capacity = max(2 * self.capacity, required)
+        for name in self._fields:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def to_arrays(self):
+        return {name: getattr(self, name)[: self.size] for name in self._fields}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        tree = cls.__new__(cls)
+        LinearTree.__init__(tree, arrays["lower"].shape[1], capacity=0)
+        for name in cls._fields:
+            setattr(tree, name, arrays[name])
+        tree.size = tree.level.shape[0]
+
+        # Released blocks start with the first child, at position 0, of a dead
+        # block of siblings
+        first = (tree.level > 0) & (tree.key & (tree.number_of_children - 1) == 0)
+        tree.free_blocks = np.flatnonzero(first & ~tree.alive)
+        return tree
+
+    def shrink_to_fit(self):
+        # Releases the capacity reserved for future refinements
+        for name in self._fields:
+            setattr(self, name, getattr(self, name)[: self.size].copy())
+
+    def __len__(self):
+        return self.size
+
+    def memory_usage(self):
+        return sum(getattr(self, name).nbytes for name in self._fields)
+
+    def _allocate(self, count):
+        self._reserve(count)
+        nodes = np.arange(self.size, self.size + count)
+        self.size += count
+        return nodes
+
+    def _allocate_blocks(self, count):
+        # Blocks of children released by coarsening are reused before the arrays
+        # grow, so refine and coarsen cycles run in constant storage
+        reused = self.free_blocks[:count]
+        self.free_blocks = self.free_blocks[count:]
+        added = self._allocate((count - reused.size) * self.number_of_children)
+        return np.concatenate([reused, added[:: self.number_of_children]])
+
+    def add_roots(self, lower, upper, integration_order=2):
+        lower = np.asarray(lower, dtype=np.float64).reshape(-1, self.spatial_dimensions)
+        upper = np.asarray(upper, dtype=np.float64).reshape(-1, self.spatial_dimensions)
+
+        nodes = self._allocate(lower.shape[0])
+        self.lower[nodes] = lower
+        self.upper[nodes] = upper
+        self.level[nodes] = 0
+        self.key[nodes] = 0
+        self.root[nodes] = nodes
+        self.first_child[nodes] = -1
+        self.active[nodes] = True
+        self.alive[nodes] = True
+        self.integration_order[nodes] = integration_order
+        self.cut[nodes] = False
+        self.version += 1
+        return nodes
+
+    def is_leaf(self, nodes):
+        return self.first_child[nodes] < 0
+
+    def children(self, node):
+        if self.first_child[node] < 0:
+            return np.empty(0, dtype=np.int64)
+
+        return self.first_child[node] + np.arange(self.number_of_children)
+
+    def children_of(self, nodes):
+        # Children of refined nodes, in the order of their parents
+        return (
+            self.first_child[nodes][:, None] + np.arange(self.number_of_children)
+        ).ravel()
+
+    def refine(self, nodes):
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int64))
+        nodes = nodes[self.is_leaf(nodes)]
+        if nodes.size == 0:
+            return nodes
+
+        if np.any(self.level[nodes] >= self.max_level):
+            raise ValueError(
+                "Cells cannot be refined beyond level {}".format(self.max_level)
+            )
+
+        self.first_child[nodes] = self._allocate_blocks(nodes.size)
+        self.active[nodes] = False
+        children = self.children_of(nodes)
+
+        self.lower[children], self.upper[children] = subdivide(
+            self.lower[nodes], self.upper[nodes]
+        )
+
+        positions = np.arange(self.number_of_children)
+        self.level[children] = np.repeat(self.level[nodes] + 1, self.number_of_children)
+        self.key[children] = (
+            (self.key[nodes][:, None] << self.spatial_dimensions) | positions
+        ).ravel()
+        self.root[children] = np.repeat(self.root[nodes], self.number_of_children)
+        self.first_child[children] = -1
+        self.active[children] = True
+        self.alive[children] = True
+        self.integration_order[children] = np.repeat(
+            self.integration_order[nodes], self.number_of_children
+        )
+        self.cut[children] = np.repeat(self.cut[nodes], self.number_of_children)
+        self.version += 1
+        return children
+
+    def coarsen(self, nodes):
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int64))
+        frontier = nodes[~self.is_leaf(nodes)]
+        while frontier.size:
+            children = self.children_of(frontier)
+            self.alive[children] = False
+            self.free_blocks = np.concatenate(
+                [self.free_blocks, self.first_child[frontier]]
+            )
+            frontier = children[~self.is_leaf(children)]
+
+        self.first_child[nodes] = -1
+        self.active[nodes] = True
+        self.version += 1
+
+    def refinement_masks(self, roots):
+        # One mask per level telling which nodes of that level are refined, the
+        # nodes of a level being the children of the refined nodes of the previous
+        # one. Together with the roots this describes the subtrees completely
+        masks = []
+        frontier = np.atleast_1d(np.asarray(roots, dtype=np.int64))
+        while frontier.size:
+            refined = ~self.is_leaf(frontier)
+            if not refined.any():
+                break
+
+            masks.append(refined)
+            frontier = self.children_of(frontier[refined])
+
+        return masks
+
+    def apply_refinement_masks(self, roots, masks):
+        # Nodes that are already refined are kept, so masks can extend a subtree
+        frontier = np.atleast_1d(np.asarray(roots, dtype=np.int64))
+        for mask in masks:
+            nodes = frontier[mask]
+            self.refine(nodes)
+            frontier = self.children_of(nodes)
+
+    def set_active(self, nodes, value):
+        self.active[nodes] = value
+        self.version += 1
+
+    def set_cut(self, nodes, value):
+        self.cut[nodes] = value
+        self.version += 1
+
+    def set_integration_order(self, nodes, value):
+        self.integration_order[nodes] = value
+        self.version += 1
+
+    def lengths(self, nodes):
+        return self.upper[nodes] - self.lower[nodes]
+
+    def jacobian_dets(self, nodes):
+        return np.prod(self.lengths(nodes) / 2, axis=1)
+
+    def map_local_to_global(self, nodes, local_coords):
+        return map_local_to_global(self.lower[nodes], self.upper[nodes], local_coords)
+
+    def count_inside_seeds(self, nodes, filter, seeds_per_side=10, chunk_size=65536):
+        return count_inside_seeds(
+            filter, self.lower[nodes], self.upper[nodes], seeds_per_side, chunk_size
+        )
+
+    def classify(self, nodes, filter, seeds_per_side=10):
+        return classify(filter, self.lower[nodes], self.upper[nodes], seeds_per_side)
+
+    def is_cut(self, nodes, filter, seeds_per_side=10):
+        return self.classify(nodes, filter, seeds_per_side) == CUT
+
+    def is_inside(self, nodes, filter, seeds_per_side=10):
+        return self.classify(nodes, filter, seeds_per_side) == INSIDE
+
+    def morton_keys(self, nodes):
+        # Keys of the first descendant at the finest level, so that sorting by them
+        # reproduces the depth-first [sw, se, nw, ne] traversal
+        levels = self.level[nodes].astype(np.int64)
+        return self.key[nodes] << (self.spatial_dimensions * (self.max_level - levels))
+
+    def sort(self, nodes):
+        return nodes[np.lexsort((self.morton_keys(nodes), self.root[nodes]))]
+
+    def locate(self, roots, coords):
+        # Descends from the given root of every point, all points at once and one
+        # level per iteration, choosing the child by comparing against the midpoint
+        nodes = np.array(roots, dtype=np.int64)
+        coords = np.asarray(coords, dtype=np.float64)
+        axes = np.arange(self.spatial_dimensions)
+        pending = np.flatnonzero(~self.is_leaf(nodes))
+        while pending.size:
+            parents = nodes[pending]
+            mid = (self.lower[parents] + self.upper[parents]) / 2
+            upper_halves = coords[pending] >= mid
+            positions = (upper_halves.astype(np.int64) << axes).sum(axis=1)
+            nodes[pending] = self.first_child[parents] + positions
+            pending = pending[~self.is_leaf(nodes[pending])]
+
+        return nodes
+
+    def _leaf_nodes(self, active_only):
+        mask = self.alive[: self.size] & (self.first_child[: self.size] < 0)
+        if active_only:
+            mask &= self.active[: self.size]
+        return np.flatnonzero(mask)
+
+    def _on_face(self, nodes, owners, face):
+        axis, direction = self.faces[face]
+        bounds = self.upper if direction > 0 else self.lower
+        return bounds[nodes, axis] == bounds[owners, axis]
+
+    def leaves(self, roots=None, active_only=False, face=None):
+        nodes = self._leaf_nodes(active_only)
+        if roots is not None:
+            nodes = nodes[np.isin(self.root[nodes], roots)]
+
+        if face is not None:
+            nodes = nodes[self._on_face(nodes, self.root[nodes], face)]
+
+        return self.sort(nodes)
+
+    def subtree_leaves(self, node, active_only=False, face=None):
+        nodes = self._leaf_nodes(active_only)
+        level = self.level[node]
+        nodes = nodes[
+            (self.root[nodes] == self.root[node]) & (self.level[nodes] >= level)
+        ]
+        shifts = self.spatial_dimensions * (self.level[nodes] - level).astype(np.int64)
+        nodes = nodes[(self.key[nodes] >> shifts) == self.key[node]]
+
+        if face is not None:
+            nodes = nodes[self._on_face(nodes, node, face)]
+
+        return self.sort(nodes)
+
+
+class LinearQuadtree(LinearTree):
+    faces = {"top": (1, 1), "bottom": (1, -1), "right": (0, 1), "left": (0, -1)}
+
+    def __init__(self, capacity=64):
+        super().__init__(spatial_dimensions=2, capacity=capacity)
+
+
+class LinearOctree(LinearTree):
+    faces = {
+        "top": (1, 1),
+        "bottom": (1, -1),
+        "right": (0, 1),
+        "left": (0, -1),
+        "front": (2, 1),
+        "back": (2, -1),
+    }
+
+    def __init__(self, capacity=64):
+        super().__init__(spatial_dimensions=3, capacity=capacity)
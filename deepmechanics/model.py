@@ -1,5 +1,26 @@
+import functools
+
+import numpy as np
 import torch
 
+from deepmechanics.distributed import (
+    all_reduce_gradients,
+    broadcast_parameters,
+    get_rank_and_world_size,
+    shard_rows,
+)
+from deepmechanics.optimization import EarlyStopping, OptimizerSchedule, step_scheduler
+from deepmechanics.refinement import RefineUniformly
+from deepmechanics.utilities import chain_jacobian, get_jacobian
+
+# Types of the tensors and of the energy sums for every precision, the mixed one
+# evaluating the fields in single precision and accumulating them in double
+PRECISIONS = {
+    "float64": (torch.float64, None),
+    "float32": (torch.float32, None),
+    "mixed": (torch.float32, torch.float64),
+}
+
 
 class Model:
     def __init__(self, approximator, grid, dirichlet_bcs, functional):
@@ -26,11 +47,54 @@ class MechanicalModel(Model):
         functional,
         kinematic_law,
         material_model,
+        derivatives=None,
+        precision=None,
     ):
         super().__init__(approximator, grid, dirichlet_bcs, functional)
         self.kinematic_law = kinematic_law
         self.material_model = material_model
 
+        # Networks that propagate their own Jacobian are differentiated analytically,
+        # unless some of their activations have no known derivative
+        if derivatives is None:
+            if hasattr(approximator, "forward_with_jacobian") and getattr(
+                approximator, "has_analytic_jacobian", True
+            ):
+                derivatives = "analytic"
+            else:
+                derivatives = "reverse"
+
+        if derivatives not in ("reverse", "forward", "analytic"):
+            raise ValueError(
+                "Derivatives must be computed in reverse or forward mode or analytically"
+            )
+
+        self.derivatives = derivatives
+        self._compiled_domain_energies = None
+
+        # Components keep the precision they were created with unless one is given
+        self.precision = None
+        if precision is not None:
+            self.set_precision(precision)
+
+    def set_precision(self, precision):
+        if precision not in PRECISIONS:
+            raise ValueError(
+                "Precision must be one of {}, got {}".format(
+                    ", ".join(PRECISIONS), precision
+                )
+            )
+
+        dtype, accumulation_dtype = PRECISIONS[precision]
+        self.grid.dtype = dtype
+        self.approximator.to(dtype)
+        self.functional.accumulation_dtype = accumulation_dtype
+        for bc in self.functional.neumann_bcs:
+            if bc is not None:
+                bc.dtype = dtype
+        self._compiled_domain_energies = None
+        self.precision = precision
+
     def get_displacements(self, coords, constraint):
         displacements = self.approximator(coords)
 
@@ -47,53 +111,291 @@ class MechanicalModel(Model):
         ex, ey, gamma_xy = self.get_strains(coords, constraint)
         return self.material_model.compute_stresses(ex, ey, gamma_xy)
 
-    def closure(self):
-        self.optimizer.zero_grad()
-        self.total_energy.backward(retain_graph=True)
+    def get_closure(self, batch, get_domain_energies=None, energies=None, shard=(0, 1)):
+        # Every call evaluates the energy again at the current parameters and
+        # frees its graph in the backward pass, so optimizers that evaluate the
+        # closure several times per step, like LBFGS, see up to date energies
+        def closure():
+            self.optimizer.zero_grad()
+            terms = self.get_energies(*batch, get_domain_energies, shard)
+            self.total_energy = sum(terms)
+            self.total_energy.backward()
 
-        return self.total_energy
+            # Ranks hold partial sums of the energy, their gradients add up to the
+            # gradient of the whole energy
+            values = torch.tensor([term.item() for term in terms], dtype=torch.float64)
+            if shard[1] > 1:
+                all_reduce_gradients(self.approximator.parameters())
+                torch.distributed.all_reduce(values)
 
-    def solve(self, epochs=100, early_stopping=True, optimizer=None, **kwargs):
-        if not optimizer:
+            if energies is not None:
+                energies.append(values.tolist())
+
+            return values.sum()
+
+        return closure
+
+    def get_displacements_and_strains(self, coords, derivatives=None):
+        derivatives = derivatives or self.derivatives
+        get_constraint = self.dirichlet_bcs.get_constraint_on_coords
+        if derivatives == "reverse":
+            ux, uy = self.get_displacements(coords, get_constraint(coords))
+            return (ux, uy), self.kinematic_law.compute_strains(ux, uy, coords)
+
+        # The displacement gradients come out of the same forward pass as the
+        # displacements, leaving a single graph for the backward pass to the
+        # parameters instead of a graph of reverse mode derivatives
+        if derivatives == "forward":
+            u, du = self._get_forward_jacobian(coords.detach(), get_constraint)
+        else:
+            u, du = self._get_analytic_jacobian(coords.detach(), get_constraint)
+
+        strains = self.kinematic_law.compute_strains_from_gradients(du[:, 0], du[:, 1])
+        return (u[:, 0].view(-1, 1), u[:, 1].view(-1, 1)), strains
+
+    def _get_forward_jacobian(self, coords, get_constraint):
+        def displacements(coords):
+            return torch.cat(self.get_displacements(coords, get_constraint(coords)), 1)
+
+        return get_jacobian(displacements, coords)
+
+    def _get_analytic_jacobian(self, coords, get_constraint):
+        # The network propagates its Jacobian in closed form and only the
+        # elementwise constraint is differentiated on top of it
+        outputs, jacobians = self.approximator.forward_with_jacobian(coords)
+
+        def constrain(coords, outputs):
+            ux = outputs[:, 0].view(-1, 1)
+            uy = outputs[:, 1].view(-1, 1)
+            return torch.cat(get_constraint(coords)(ux, uy), 1)
+
+        return chain_jacobian(constrain, coords, outputs, jacobians)
+
+    def get_domain_energies(self, coords, weights, jacobian_dets, derivatives=None):
+        # Predict field quantities
+        (ux, uy), (ex, ey, gamma_xy) = self.get_displacements_and_strains(
+            coords, derivatives
+        )
+        nx, ny, nxy = self.material_model.compute_stresses(ex, ey, gamma_xy)
+
+        # Get energy values
+        internal_energy = self.functional.internal_term(
+            ex, ey, gamma_xy, nx, ny, nxy, weights, jacobian_dets
+        )
+
+        source_energy = self.functional.source_term(
+            ux, uy, coords, weights, jacobian_dets
+        )
+
+        return internal_energy, source_energy
+
+    def get_energies(
+        self, coords, weights, jacobian_dets, get_domain_energies=None, shard=(0, 1)
+    ):
+        get_domain_energies = get_domain_energies or self.get_domain_energies
+        internal_energy, source_energy = get_domain_energies(
+            coords, weights, jacobian_dets
+        )
+
+        # Boundary data is looked up on the grid, so this term stays out of the
+        # compiled domain energies
+        external_energy = self.functional.external_term(self.get_displacements, *shard)
+
+        return internal_energy, external_energy, source_energy
+
+    def _get_compiled_domain_energies(self):
+        # Compiled once per model, so later solves reuse the generated kernels
+        if self._compiled_domain_energies is None:
+            # Compiled graphs cannot be differentiated twice, so reverse mode
+            # strains are replaced by the forward mode ones, which are the same
+            derivatives = self.derivatives
+            if derivatives == "reverse":
+                derivatives = "forward"
+
+            self._compiled_domain_energies = torch.compile(
+                functools.partial(self.get_domain_energies, derivatives=derivatives)
+            )
+
+        return self._compiled_domain_energies
+
+    def _batches(self, coords, weights, jacobian_dets, sampler):
+        if sampler is None:
+            yield coords, weights, jacobian_dets
+            return
+
+        # Batch coordinates are new autograd leaves so that strains are derivatives
+        # w.r.t. the sampled points only, and their weights are scaled to estimate
+        # the energy of the whole grid
+        leaf_indices = self.grid.integration_point_leaf_indices
+        for indices, scale in sampler.batches(coords.shape[0], leaf_indices):
+            batch_coords = coords.detach()[indices].requires_grad_()
+            batch_weights = weights.detach()[indices] * scale.to(weights.dtype)
+            yield batch_coords, batch_weights, jacobian_dets.detach()[indices]
+
+    def solve(
+        self,
+        epochs=100,
+        early_stopping=True,
+        optimizer=None,
+        sampler=None,
+        compiled=False,
+        distributed=False,
+        scheduler=None,
+        **kwargs
+    ):
+        if distributed and sampler is not None:
+            raise ValueError("Mini-batches are not supported in distributed training")
+
+        # Schedules build a new optimizer, and scheduler, at the start of a stage
+        schedule = None
+        if isinstance(optimizer, OptimizerSchedule):
+            if scheduler is not None:
+                raise ValueError(
+                    "Schedulers of optimizer schedules are given to their stages"
+                )
+
+            schedule = optimizer
+        elif not optimizer:
             optimizer = torch.optim.Adam(self.approximator.parameters(), **kwargs)
 
         self.optimizer = optimizer
 
+        if early_stopping is True:
+            early_stopping = EarlyStopping()
+        elif early_stopping is False:
+            early_stopping = None
+        else:
+            early_stopping.reset()
+
+        # The compiled domain energies trace the forward and backward passes into
+        # fused kernels, at the cost of compiling them during the first epoch
+        get_domain_energies = None
+        if compiled:
+            get_domain_energies = self._get_compiled_domain_energies()
+
         # Get data for training
         coords, weights, jacobian_dets = self.grid.integration_points_data
-        constraint = self.dirichlet_bcs.get_constraint_on_integration_points()
 
-        print("\033[1mStarting neural network training...\033[0m")
+        # Every rank trains on its own block of integration points, starting from
+        # the parameters of rank 0
+        shard = (0, 1)
+        if distributed:
+            shard = get_rank_and_world_size()
+            broadcast_parameters(self.approximator.parameters())
+            rows = shard_rows(coords.shape[0], *shard)
+            coords = coords.detach()[rows].requires_grad_()
+            weights = weights.detach()[rows]
+            jacobian_dets = jacobian_dets.detach()[rows]
 
-        # Train
+        verbose = shard[0] == 0
+        if verbose:
+            print("\033[1mStarting neural network training...\033[0m")
+
+        # Train, with one step per batch and a new set of batches every epoch
+        self.history = []
+        stage = None
         for i in range(epochs + 1):
-            # Predict field quantities
-            ux, uy = self.get_displacements(coords, constraint)
-            ex, ey, gamma_xy = self.kinematic_law.compute_strains(ux, uy, coords)
-            nx, ny, nxy = self.material_model.compute_stresses(ex, ey, gamma_xy)
-
-            # Get energy values
-            internal_energy = self.functional.internal_term(
-                ex, ey, gamma_xy, nx, ny, nxy, weights, jacobian_dets
-            )
+            if schedule is not None and schedule.stage_at(i) != stage:
+                stage = schedule.stage_at(i)
+                optimizer, scheduler = schedule.stages[stage].make(
+                    self.approximator.parameters()
+                )
+                self.optimizer = optimizer
 
-            external_energy = self.functional.external_term(self.get_displacements)
+                # A new optimizer gets a fresh patience window
+                if early_stopping is not None:
+                    early_stopping.reset()
 
-            source_energy = self.functional.source_term(
-                ux, uy, coords, weights, jacobian_dets
-            )
+            energies = []
+            for batch in self._batches(coords, weights, jacobian_dets, sampler):
+                evaluations = []
+                optimizer.step(
+                    self.get_closure(batch, get_domain_energies, evaluations, shard)
+                )
+
+                # Energies at the parameters the step started from
+                energies.append(evaluations[0])
 
-            print(
-                "\033[1mEpoch\033[0m = {}\t \033[1mInternal energy\033[0m = {:.4e}\t \033[1mExternal energy\033[0m = {:.4e}\t \033[1mSource energy\033[0m = {:.4e}".format(
-                    i,
-                    internal_energy,
-                    external_energy.detach().numpy(),
-                    source_energy.detach().numpy(),
+            # Batch estimates are averaged over the epoch
+            internal_energy, external_energy, source_energy = np.mean(energies, axis=0)
+            energy = internal_energy + external_energy + source_energy
+            self.history.append([internal_energy, external_energy, source_energy])
+            if verbose:
+                print(
+                    "\033[1mEpoch\033[0m = {}\t \033[1mInternal energy\033[0m = {:.4e}\t \033[1mExternal energy\033[0m = {:.4e}\t \033[1mSource energy\033[0m = {:.4e}".format(
+                        i,
+                        internal_energy,
+                        external_energy,
+                        source_energy,
+                    )
                 )
-            )
 
-            self.total_energy = internal_energy + external_energy + source_energy
+            if scheduler is not None:
+                step_scheduler(scheduler, energy)
+
+            # Energies and gradients are reduced over the ranks, so all of them
+            # stop at the same epoch
+            if early_stopping is not None and early_stopping.update(
+                energy, self.get_gradient_norm()
+            ):
+                if verbose:
+                    print("\033[1mConverged at epoch {}\033[0m".format(i))
+                break
+
+        if verbose:
+            print("\033[1mFinished training!\033[0m")
+
+    def get_gradient_norm(self):
+        gradients = [
+            parameter.grad.reshape(-1)
+            for parameter in self.approximator.parameters()
+            if parameter.grad is not None
+        ]
+        if not gradients:
+            return 0.0
+
+        return torch.linalg.vector_norm(torch.cat(gradients)).item()
+
+    def solve_multilevel(
+        self,
+        epochs,
+        refinement=None,
+        early_stopping=True,
+        optimizer=None,
+        sampler=None,
+        compiled=False,
+        distributed=False,
+        scheduler=None,
+        **kwargs
+    ):
+        # One epoch budget per level. The first level trains on the grid as it is
+        # and every later one refines it in place and carries on training the
+        # same network, so fine grids start from the coarse solution
+        if refinement is None:
+            refinement = RefineUniformly(1)
+
+        if not optimizer:
+            optimizer = torch.optim.Adam(self.approximator.parameters(), **kwargs)
+
+        # A level stops early once it converged, and its remaining epochs are not
+        # carried over to the next one
+        for level, level_epochs in enumerate(epochs):
+            if level > 0:
+                refinement.refine(self.grid)
 
-            optimizer.step(self.closure)
+            if not distributed or torch.distributed.get_rank() == 0:
+                print(
+                    "\033[1mLevel {}: {} active cells\033[0m".format(
+                        level, len(self.grid.active_leaf_indices)
+                    )
+                )
 
-        print("\033[1mFinished training!\033[0m")
+            self.solve(
+                level_epochs,
+                early_stopping=early_stopping,
+                optimizer=optimizer,
+                sampler=sampler,
+                compiled=compiled,
+                distributed=distributed,
+                scheduler=scheduler,
+            )
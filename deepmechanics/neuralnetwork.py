@@ -1,5 +1,12 @@
+import torch
 import torch.nn as nn
 
+# Derivatives of the activations in terms of their outputs
+ACTIVATION_DERIVATIVES = {
+    nn.Tanh: lambda y: 1 - y**2,
+    nn.Sigmoid: lambda y: y * (1 - y),
+}
+
 
 class NeuralNetwork(nn.Sequential):
     def __init__(
@@ -8,6 +15,7 @@ class NeuralNetwork(nn.Sequential):
         nodes_count_in_hidden_layers,
         output_dimension,
         activation=nn.Tanh,
+        dtype=torch.float64,
     ):
         super().__init__()
 
@@ -32,4 +40,35 @@ class NeuralNetwork(nn.Sequential):
             "output", nn.Linear(nodes_count_in_hidden_layers[-1], output_dimension)
         )
 
-        self.double()  # Use dtype=float64
+        self.to(dtype)
+
+    @property
+    def has_analytic_jacobian(self):
+        return all(
+            isinstance(layer, nn.Linear) or type(layer) in ACTIVATION_DERIVATIVES
+            for layer in self
+        )
+
+    def forward_with_jacobian(self, x):
+        # The Jacobian of every layer w.r.t. the input is carried alongside its
+        # output as (points, inputs, features), so linear layers are a single
+        # product with the transposed weights and activations a scaling
+        jacobian = None
+        for layer in self:
+            x = layer(x)
+            if isinstance(layer, nn.Linear):
+                if jacobian is None:
+                    jacobian = layer.weight.t().expand(x.shape[0], -1, -1)
+                else:
+                    jacobian = jacobian @ layer.weight.t()
+            elif type(layer) in ACTIVATION_DERIVATIVES:
+                jacobian = jacobian * ACTIVATION_DERIVATIVES[type(layer)](x)[:, None, :]
+            else:
+                raise TypeError(
+                    "Jacobians cannot be propagated through {}".format(
+                        type(layer).__name__
+                    )
+                )
+
+        # Returned per point as (points, outputs, inputs)
+        return x, jacobian.transpose(1, 2)
@@ -0,0 +1,76 @@
+import torch
+
+
+class EarlyStopping:
+    def __init__(self, tolerance=1e-6, gradient_tolerance=0.0, patience=10):
+        self.tolerance = tolerance
+        self.gradient_tolerance = gradient_tolerance
+        self.patience = patience
+        self.reset()
+
+    def reset(self):
+        self.previous_energy = None
+        self.stalled_epochs = 0
+
+    def update(self, energy, gradient_norm):
+        # An epoch stalls when the relative change of the energy or the gradient
+        # norm falls below its tolerance, and training stops once patience epochs
+        # in a row have stalled
+        stalled = gradient_norm <= self.gradient_tolerance
+        if self.previous_energy is not None:
+            change = abs(energy - self.previous_energy)
+            scale = max(abs(self.previous_energy), torch.finfo(torch.float64).tiny)
+            stalled = stalled or change <= self.tolerance * scale
+
+        self.previous_energy = energy
+        self.stalled_epochs = self.stalled_epochs + 1 if stalled else 0
+        return self.stalled_epochs >= self.patience
+
+
+class OptimizationStage:
+    def __init__(self, optimizer_class, epochs=None, scheduler=None, **options):
+        self.optimizer_class = optimizer_class
+        self.epochs = epochs  # None runs the stage until training ends
+        self.scheduler = scheduler  # Builds a learning rate scheduler
+        self.options = options
+
+    def make(self, parameters):
+        optimizer = self.optimizer_class(parameters, **self.options)
+        scheduler = self.scheduler(optimizer) if self.scheduler else None
+        return optimizer, scheduler
+
+
+class OptimizerSchedule:
+    def __init__(self, *stages):
+        if not stages:
+            raise ValueError("Schedules need at least one stage")
+
+        self.stages = list(stages)
+
+    def stage_at(self, epoch):
+        # The last stage carries on once the epochs of all stages are used up
+        start = 0
+        for index, stage in enumerate(self.stages):
+            if stage.epochs is None or epoch < start + stage.epochs:
+                return index
+
+            start += stage.epochs
+
+        return len(self.stages) - 1
+
+
+def make_adam_then_lbfgs(warm_up_epochs, lr=1e-2, **lbfgs_options):
+    # Adam moves the network close to the minimum, where the curvature
+    # information of LBFGS pays off
+    lbfgs_options.setdefault("line_search_fn", "strong_wolfe")
+    return OptimizerSchedule(
+        OptimizationStage(torch.optim.Adam, warm_up_epochs, lr=lr),
+        OptimizationStage(torch.optim.LBFGS, **lbfgs_options),
+    )
+
+
+def step_scheduler(scheduler, energy):
+    if isinstance(scheduler, torch.optim.lr_scheduler.ReduceLROnPlateau):
+        scheduler.step(energy)
+    else:
+        scheduler.step()
@@ -1,23 +1,114 @@
+import multiprocessing
+
+import numpy as np
+
+from deepmechanics.implicitgeometry import CUT, OUTSIDE
+from deepmechanics.lineartree import LinearTree, pack_masks, unpack_masks
+
+# Strategy of the worker processes, inherited when they are forked so that
+# geometries built from closures do not need to be pickled
+_worker_strategy = None
+
+
+def _initialize_worker(strategy):
+    global _worker_strategy
+    _worker_strategy = strategy
+
+
+def _refine_subtrees(task):
+    return _worker_strategy.refine_subtrees(*task)
+
+
 class Refinement:
     def __init__(self, depth):
         self.depth = depth
 
 
+class RefineUniformly(Refinement):
+    def refine(self, grid, seeds_per_side=None):
+        # Every active leaf is split, one level at a time
+        tree = grid.tree
+        seeds_per_side = seeds_per_side or grid.seeds_per_side
+        for _ in range(self.depth):
+            leaves = tree.leaves(active_only=True)
+            cut = tree.cut[leaves]
+            children = tree.refine(leaves).reshape(-1, tree.number_of_children)
+
+            # Children inherit the state of their parents, but those of cut
+            # leaves may lie entirely inside or outside the domain
+            children = children[cut].ravel()
+            if children.size and grid.domain is not None:
+                classes = tree.classify(children, grid.domain, seeds_per_side)
+                tree.set_active(children, classes != OUTSIDE)
+                tree.set_cut(children, classes == CUT)
+
+
 class RefineBoundaries(Refinement):
-    def __init__(self, depth, domain):
+    # Base cells are handed out in chunks, several per process to balance the load
+    chunks_per_process = 4
+
+    def __init__(self, depth, domain, processes=None):
         super().__init__(depth)
         self.domain = domain
+        self.processes = processes
 
     def refine(self, grid, seeds_per_side=10):
-        for cell in grid.base_cells:
-            self.refine_recursive(cell, self.domain, self.depth, seeds_per_side)
+        if self.processes is not None and self.processes > 1:
+            self._refine_in_parallel(grid, seeds_per_side)
+            return
+
+        roots = grid.base_indices
+        self.refine_levels(grid.tree, roots, self.domain, self.depth, seeds_per_side)
+
+    def _refine_in_parallel(self, grid, seeds_per_side):
+        # Subtrees of the base cells are independent, so every worker refines a
+        # copy of its chunk and sends back only which nodes it refined
+        tree = grid.tree
+        roots = grid.base_indices
+        number_of_chunks = min(roots.size, self.processes * self.chunks_per_process)
+        chunks = np.array_split(roots, number_of_chunks)
+        tasks = [
+            (
+                tree.lower[chunk],
+                tree.upper[chunk],
+                pack_masks(tree.refinement_masks(chunk)),
+                seeds_per_side,
+            )
+            for chunk in chunks
+        ]
+
+        context = multiprocessing.get_context("fork")
+        with context.Pool(
+            self.processes, initializer=_initialize_worker, initargs=(self,)
+        ) as pool:
+            results = pool.map(_refine_subtrees, tasks)
+
+        for chunk, packed_masks in zip(chunks, results):
+            tree.apply_refinement_masks(chunk, unpack_masks(packed_masks))
+
+    def refine_subtrees(self, lower, upper, packed_masks, seeds_per_side=10):
+        tree = LinearTree(lower.shape[1], capacity=4 * lower.shape[0])
+        roots = tree.add_roots(lower, upper)
+        tree.apply_refinement_masks(roots, unpack_masks(packed_masks))
+        self.refine_levels(tree, roots, self.domain, self.depth, seeds_per_side)
+
+        return pack_masks(tree.refinement_masks(roots))
+
+    def refine_levels(self, tree, roots, domain, depth, seeds_per_side=10):
+        # Breadth first, one level at a time: the whole frontier is classified at
+        # once and its cut nodes are split together. Refined nodes are descended
+        # into as well, so refining an already refined grid goes deeper
+        frontier = np.atleast_1d(np.asarray(roots, dtype=np.int64))
+        for _ in range(depth):
+            if frontier.size == 0:
+                break
+
+            nodes = frontier[tree.is_cut(frontier, domain, seeds_per_side)]
+            tree.refine(nodes)
+            frontier = tree.children_of(nodes)
 
     def refine_recursive(self, cell, domain, depth, seeds_per_side=10):
-        if depth != 0 and cell.is_cut(domain, seeds_per_side):
-            cell.refine()
-            for child in cell.children:
-                if child.is_cut(domain, seeds_per_side):
-                    self.refine_recursive(child, domain, depth - 1, seeds_per_side)
+        self.refine_levels(cell.tree, cell.index, domain, depth, seeds_per_side)
 
 
 class AgregatedRefinementStrategy:
@@ -0,0 +1,56 @@
+import numpy as np
+import torch
+
+
+class BatchSampler:
+    def __init__(self, batch_size, seed=None):
+        self.batch_size = batch_size
+        self.generator = np.random.default_rng(seed)
+
+    def number_of_batches(self, number_of_points):
+        return max(1, -(-number_of_points // self.batch_size))
+
+    def batches(self, number_of_points, leaf_indices=None):
+        raise NotImplementedError("Batches method not overriden in derived class")
+
+
+class UniformBatchSampler(BatchSampler):
+    def batches(self, number_of_points, leaf_indices=None):
+        # Every epoch visits each point once in a new random order. A batch of b
+        # points out of n estimates the full sum when scaled by n / b
+        permutation = self.generator.permutation(number_of_points)
+        for start in range(0, number_of_points, self.batch_size):
+            indices = permutation[start : start + self.batch_size]
+            scale = np.full(indices.size, number_of_points / indices.size)
+            yield torch.from_numpy(indices), torch.from_numpy(scale).view(-1, 1)
+
+
+class StratifiedBatchSampler(BatchSampler):
+    def batches(self, number_of_points, leaf_indices=None):
+        if leaf_indices is None:
+            raise ValueError("Stratified batches require the leaf of every point")
+
+        # The points of every leaf are shuffled and dealt over the batches starting
+        # at a random batch, so every batch samples all leaves evenly. Each point
+        # then lands in a given batch with probability 1 / batches, which is the
+        # scale that makes every batch an unbiased estimate of the full sum
+        number_of_batches = self.number_of_batches(number_of_points)
+        _, leaves = np.unique(leaf_indices, return_inverse=True)
+        permutation = self.generator.permutation(number_of_points)
+        order = permutation[np.argsort(leaves[permutation], kind="stable")]
+        sorted_leaves = leaves[order]
+
+        counts = np.bincount(sorted_leaves)
+        starts = np.cumsum(counts) - counts
+        ranks = np.arange(number_of_points) - starts[sorted_leaves]
+        offsets = self.generator.integers(number_of_batches, size=counts.size)
+        batch_ids = (ranks + offsets[sorted_leaves]) % number_of_batches
+
+        batch_order = np.argsort(batch_ids, kind="stable")
+        bounds = np.searchsorted(
+            batch_ids[batch_order], np.arange(number_of_batches + 1)
+        )
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            indices = order[batch_order[start:end]]
+            scale = np.full(indices.size, float(number_of_batches))
+            yield torch.from_numpy(indices), torch.from_numpy(scale).view(-1, 1)
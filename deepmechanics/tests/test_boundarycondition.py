@@ -1,7 +1,12 @@
 import unittest
 
+import torch
+
 import deepmechanics.boundarycondition as bcond
-from deepmechanics.grid import TensorizedPlanarCartesianGrid
+from deepmechanics.grid import (
+    TensorizedPlanarCartesianGrid,
+    TensorizedSolidCartesianGrid,
+)
 
 
 class TestFixedDisplacementsOnTopEdge(unittest.TestCase):
@@ -27,3 +32,68 @@ class TestFixedDisplacementsOnTopEdge(unittest.TestCase):
 
     def test_get_constraint_on_left_edge(self):
         pass
+
+
+class TestNeumannBoundaryCondition(unittest.TestCase):
+    def setUp(self):
+        self.grid = TensorizedPlanarCartesianGrid(0, 0, 2, 1, 2, 1)
+        constraint = bcond.FixedDisplacementsOnLeftEdge(self.grid)
+        self.bc = bcond.NeumannBoundaryCondition.from_grid(
+            lambda coords: (0 * coords[:, 0], 0 * coords[:, 0] - 1),
+            self.grid,
+            "top",
+            constraint.get_constraint_on_top_edge(),
+        )
+
+    def test_boundary_data_follows_refinement(self):
+        self.assertEqual(len(self.bc.boundary_coords), 4)
+        self.assertEqual(len(self.bc.load[1]), 4)
+
+        self.grid.get_cell_at_indices(0, 0).refine()
+        self.assertEqual(len(self.bc.boundary_coords), 6)
+        self.assertEqual(len(self.bc.boundary_weights), 6)
+        self.assertEqual(len(self.bc.load[1]), 6)
+        self.assertAlmostEqual(
+            (self.bc.boundary_weights * self.bc.boundary_jacobian_dets).sum().item(),
+            2.0,
+        )
+
+    def test_boundary_data_on_solid_grids(self):
+        grid = TensorizedSolidCartesianGrid(0, 0, 0, 2, 1, 1, 2, 1, 1)
+        bc = bcond.NeumannBoundaryCondition.from_grid(
+            lambda coords: (0 * coords[:, 0], 0 * coords[:, 0] - 1),
+            grid,
+            "front",
+            lambda ux, uy: (ux, uy),
+        )
+        self.assertEqual(len(bc.boundary_coords), 8)
+        self.assertTrue(torch.all(bc.boundary_coords[:, 2] == 1))
+        self.assertEqual(len(bc.load[1]), 8)
+        self.assertAlmostEqual(
+            (bc.boundary_weights * bc.boundary_jacobian_dets).sum().item(), 2.0
+        )
+
+        with self.assertRaises(ValueError):
+            bcond.NeumannBoundaryCondition.from_grid(None, grid, "side", None)
+
+
+class TestConstraintOnCoords(unittest.TestCase):
+    def setUp(self):
+        self.grid = TensorizedPlanarCartesianGrid(0, 0, 2, 1, 2, 1)
+        self.bc = bcond.AggregatedDirichletBoundaryCondition(
+            bcond.FixedDisplacementsOnLeftEdge(self.grid),
+            bcond.FixedDisplacementsOnBottomEdge(self.grid),
+        )
+
+    def test_matches_constraint_on_integration_points(self):
+        coords = self.grid.integration_point_coords
+        ux = coords[:, 0].view(-1, 1) + 1
+        uy = coords[:, 1].view(-1, 1) + 1
+
+        expected = self.bc.get_constraint_on_integration_points()(ux, uy)
+        indices = [5, 0, 3]
+        actual = self.bc.get_constraint_on_coords(coords[indices])(
+            ux[indices], uy[indices]
+        )
+        for e, a in zip(expected, actual):
+            self.assertTrue(e[indices].allclose(a))
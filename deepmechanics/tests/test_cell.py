@@ -1,6 +1,6 @@
 import unittest
 
-from deepmechanics.cell import Cell, QuadCell
+from deepmechanics.cell import Cell, HexCell, QuadCell
 from deepmechanics.implicitgeometry import make_rectangle
 
 
@@ -40,6 +40,36 @@ class TestQuadCell(unittest.TestCase):
         self.assertAlmostEqual(ys[2], 1.42264973081037)
         self.assertAlmostEqual(ys[3], 2.57735026918963)
 
+    def test_compact_handle(self):
+        self.assertFalse(hasattr(self.cell, "__dict__"))
+        self.cell.refine()
+
+        # Handles to the same node compare equal and share the rule
+        child = self.cell.children[1]
+        self.assertEqual(child, self.cell.children[1])
+        self.assertIs(child.integration_points, self.cell.integration_points)
+
+    def test_integration_order(self):
+        self.assertEqual(self.cell.integration_order, 2)
+        self.cell.integration_order = 3
+
+        xs, ys = self.cell.integration_point_coords
+        self.assertEqual(len(xs), 9)
+        self.assertAlmostEqual(xs[4], 3.0)
+        self.assertAlmostEqual(ys[4], 2.0)
+        self.assertAlmostEqual(sum(self.cell.integration_point_weights), 4.0)
+        self.assertEqual(len(self.cell.integration_point_jacobian_dets), 9)
+
+        # Children inherit the order of their parent
+        self.cell.refine()
+        self.assertEqual(self.cell.children[0].integration_order, 3)
+        self.cell.delete_all_children()
+
+        with self.assertRaises(ValueError):
+            self.cell.integration_order = 0
+
+        self.cell.integration_order = 2
+
     def test_top_edge_integration_point_coords(self):
         xs, ys = self.cell.top_edge_integration_point_coords
         self.assertAlmostEqual(xs[0], 1.84529946162075)
@@ -315,3 +345,27 @@ class TestQuadCell(unittest.TestCase):
         self.assertEqual(len(self.cell.left_leaves), 3)
 
         self.cell.delete_all_children()
+
+
+class TestHexCell(unittest.TestCase):
+    def setUp(self):
+        self.cell = HexCell(1.0, 1.0, 1.0, 5.0, 3.0, 2.0)
+
+    def test_geometry(self):
+        self.assertAlmostEqual(self.cell.z_mid, 1.5)
+        self.assertAlmostEqual(self.cell.jacobian_det, 1.0)
+        self.assertEqual(self.cell.map_local_to_global(1, -1, 0), (5.0, 1.0, 1.5))
+
+    def test_refine(self):
+        self.cell.refine()
+
+        self.assertEqual(len(self.cell.children), 8)
+        self.assertFalse(self.cell.is_active)
+        self.assertEqual(self.cell.children[4].z_start, 1.5)
+        self.assertEqual(len(self.cell.face_leaves("front")), 4)
+
+        self.cell.children[4].is_active = False
+        self.assertEqual(len(self.cell.face_leaves("front", active_only=True)), 3)
+
+        self.cell.delete_all_children()
+        self.assertTrue(self.cell.is_active_leaf)
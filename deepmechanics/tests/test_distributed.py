@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+import deepmechanics.boundarycondition as bcond
+from deepmechanics.distributed import launch, shard_rows
+from deepmechanics.functional import PotentialEnergyFunctional
+from deepmechanics.grid import TensorizedPlanarCartesianGrid
+from deepmechanics.kinematics import LinearKinematicLaw
+from deepmechanics.materialmodel import LinearElasticPlaneStressMaterialModel
+from deepmechanics.model import MechanicalModel
+from deepmechanics.neuralnetwork import NeuralNetwork
+
+
+def make_model(seed):
+    torch.manual_seed(seed)
+    grid = TensorizedPlanarCartesianGrid(0, 0, 4, 1, 4, 3)
+    dirichlet_bcs = bcond.FixedDisplacementsOnLeftEdge(grid)
+
+    # Two loads, so that every rank integrates one of them
+    functional = PotentialEnergyFunctional()
+    functional.neumann_bcs = tuple(
+        bcond.NeumannBoundaryCondition.from_grid(
+            lambda coords: (0, -1),
+            grid,
+            face,
+            getattr(dirichlet_bcs, "get_constraint_on_{}_edge".format(face))(),
+        )
+        for face in ("top", "bottom")
+    )
+    return MechanicalModel(
+        NeuralNetwork(2, [8], 2),
+        grid,
+        dirichlet_bcs,
+        functional,
+        LinearKinematicLaw(),
+        LinearElasticPlaneStressMaterialModel(100, 0.3, 0.1),
+    )
+
+
+def train(path, distributed):
+    # Ranks start from different parameters, training must synchronize them
+    rank = torch.distributed.get_rank() if distributed else 0
+    model = make_model(rank)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.solve(epochs=3, early_stopping=False, distributed=distributed, lr=1e-2)
+
+    torch.save(
+        [parameter.detach() for parameter in model.approximator.parameters()],
+        os.path.join(path, "{}_{}.pt".format(distributed, rank)),
+    )
+
+
+class TestDistributed(unittest.TestCase):
+    def test_shard_rows(self):
+        shards = [shard_rows(10, rank, 3) for rank in range(3)]
+        self.assertEqual(
+            [np.arange(10)[shard].tolist() for shard in shards],
+            [[0, 1, 2], [3, 4, 5, 6], [7, 8, 9]],
+        )
+
+    def test_distributed_training_matches_serial_training(self):
+        with tempfile.TemporaryDirectory() as path:
+            train(path, False)
+            launch(train, 2, path, True)
+
+            expected = torch.load(os.path.join(path, "False_0.pt"))
+            for rank in range(2):
+                parameters = torch.load(os.path.join(path, "True_{}.pt".format(rank)))
+                for e, p in zip(expected, parameters):
+                    self.assertTrue(torch.allclose(e, p))
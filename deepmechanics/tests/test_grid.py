@@ -1,7 +1,24 @@
+import os
+import tempfile
 import unittest
 
-from deepmechanics.grid import Grid, PlanarCartesianGrid
-from deepmechanics.implicitgeometry import make_rectangle
+import numpy as np
+import torch
+
+from deepmechanics.grid import (
+    Grid,
+    PlanarCartesianGrid,
+    SolidCartesianGrid,
+    TensorizedPlanarCartesianGrid,
+    TensorizedSolidCartesianGrid,
+)
+from deepmechanics.implicitgeometry import (
+    invert,
+    make_circular_hole,
+    make_rectangle,
+    make_signed_distance_circular_hole,
+    make_signed_distance_sphere,
+)
 
 
 class TestGrid(unittest.TestCase):
@@ -29,6 +46,17 @@ class TestPlanarCartesianGrid(unittest.TestCase):
         self.assertTrue(self.grid.leaf_cells)
         self.assertEqual(len(self.grid.base_cells), 8)
 
+    def test_active_leaf_cells(self):
+        cell = self.grid.get_cell_at_indices(0, 0)
+        cell.refine()
+        cell.children[0].is_active = False
+
+        self.assertEqual(len(self.grid.leaf_cells), 11)
+        self.assertEqual(len(self.grid.active_leaf_cells), 10)
+        self.assertNotIn(cell.children[0], self.grid.active_leaf_cells)
+
+        cell.delete_all_children()
+
     def test_top_base_cells(self):
         self.assertEqual(len(self.grid.top_base_cells), 4)
 
@@ -123,6 +151,33 @@ class TestPlanarCartesianGrid(unittest.TestCase):
         self.assertEqual(len(xs), 4 * 4 * 2)
         self.assertEqual(len(ys), 4 * 4 * 2)
 
+    def test_integration_point_data_matches_cells(self):
+        self.grid.get_cell_at_indices(1, 0).refine()
+
+        xs, ys = self.grid.integration_point_coords
+        weights = self.grid.integration_point_weights
+        jacobian_dets = self.grid.integration_point_jacobian_dets
+
+        expected_xs, expected_ys, expected_weights, expected_dets = [], [], [], []
+        for cell in self.grid.active_leaf_cells:
+            cell_xs, cell_ys = cell.integration_point_coords
+            expected_xs += cell_xs
+            expected_ys += cell_ys
+            expected_weights += cell.integration_point_weights
+            expected_dets += cell.integration_point_jacobian_dets
+
+        self.assertEqual(len(xs), 4 * 11)
+        for values, expected in [
+            (xs, expected_xs),
+            (ys, expected_ys),
+            (weights, expected_weights),
+            (jacobian_dets, expected_dets),
+        ]:
+            for value, expected_value in zip(values, expected):
+                self.assertAlmostEqual(value, expected_value)
+
+        self.grid.get_cell_at_indices(1, 0).delete_all_children()
+
     def test_top_edge_integration_point_coords(self):
         self.grid.get_cell_at_indices(0, self.grid.j_end).refine()
 
@@ -163,6 +218,37 @@ class TestPlanarCartesianGrid(unittest.TestCase):
 
         self.grid.get_cell_at_indices(0, 0).delete_all_children()
 
+    def test_boundary_index(self):
+        cell = self.grid.get_cell_at_indices(0, self.grid.j_end)
+        cell.refine()
+        cell.children[2].is_active = False
+
+        index = self.grid.boundary_index
+        self.assertIs(self.grid.boundary_index, index)
+        self.assertEqual(
+            list(index["top"]["leaves"]),
+            [cell.children[2].index, cell.children[3].index, 5, 6, 7],
+        )
+        self.assertEqual(
+            list(index["top"]["active_leaves"]), [cell.children[3].index, 5, 6, 7]
+        )
+        self.assertEqual(len(index["top"]["coords"]), 2 * 4)
+        self.assertEqual(len(index["left"]["coords"]), 2 * 2)
+
+        # Integrating one along the edges gives their lengths
+        for face, length in [
+            ("top", 3.5),
+            ("bottom", 4.0),
+            ("left", 1.5),
+            ("right", 2.0),
+        ]:
+            weights = index[face]["weights"] * index[face]["jacobian_dets"]
+            self.assertAlmostEqual(weights.sum(), length)
+
+        cell.delete_all_children()
+        self.assertIsNot(self.grid.boundary_index, index)
+        self.assertEqual(len(self.grid.boundary_index["top"]["coords"]), 2 * 4)
+
     def test_top_coords(self):
         xs, ys = self.grid.top_coords
 
@@ -211,6 +297,56 @@ class TestPlanarCartesianGrid(unittest.TestCase):
         for y_expected, y in zip(ys_expected, ys):
             self.assertAlmostEqual(y_expected, y)
 
+    def test_corner_coords(self):
+        xs, ys = self.grid.corner_coords
+        self.assertEqual(list(xs[:8]), [1.0, 2.0, 1.0, 2.0, 2.0, 3.0, 2.0, 3.0])
+        self.assertEqual(list(ys[:8]), [1.0, 1.0, 2.0, 2.0, 1.0, 1.0, 2.0, 2.0])
+
+    def test_triangulate(self):
+        triangles = self.grid.triangulate()
+        self.assertEqual(triangles.shape, (2 * 8, 3))
+        self.assertEqual(
+            triangles[:4].tolist(), [[0, 1, 3], [0, 3, 2], [4, 5, 7], [4, 7, 6]]
+        )
+
+    def test_connectivity_with_unique_vertices(self):
+        self.grid.get_cell_at_indices(0, 0).refine()
+
+        vertex_coords, cells = self.grid.connectivity(unique_vertices=True)
+        self.assertEqual(cells.shape, (11, 4))
+        self.assertEqual(len(vertex_coords), 5 * 3 + 5)
+
+        # Every cell references its own corners
+        xs, ys = self.grid.corner_coords
+        self.assertTrue(np.array_equal(vertex_coords[cells].reshape(-1, 2)[:, 0], xs))
+        self.assertTrue(np.array_equal(vertex_coords[cells].reshape(-1, 2)[:, 1], ys))
+
+        triangles = self.grid.triangulate(unique_vertices=True)
+        self.assertEqual(triangles.max(), len(vertex_coords) - 1)
+
+    def test_get_samples(self):
+        xs, ys = self.grid.get_samples(number_of_samples_x=3, number_of_samples_y=2)
+        self.assertEqual(list(xs), [1.0, 1.0, 3.0, 3.0, 5.0, 5.0])
+        self.assertEqual(list(ys), [1.0, 3.0, 1.0, 3.0, 1.0, 3.0])
+
+        rectangle = make_rectangle(0.0, 0.0, 3.0, 2.0)
+        xs, ys = self.grid.get_samples(rectangle, 3, 2)
+        self.assertEqual(list(xs), [1.0, 3.0])
+
+        # Plain callables are accepted too
+        xs, ys = self.grid.get_samples(lambda x, y: x + y > 5.0, 3, 2)
+        self.assertEqual(list(xs), [3.0, 5.0, 5.0])
+
+    def test_iter_samples(self):
+        rectangle = make_rectangle(0.0, 0.0, 4.0, 2.5)
+        xs, ys = self.grid.get_samples(rectangle, 11, 7)
+
+        chunks = list(self.grid.iter_samples(rectangle, 11, 7, chunk_size=10))
+        self.assertEqual(len(chunks), 8)
+        self.assertTrue(all(len(chunk_xs) <= 10 for chunk_xs, _ in chunks))
+        self.assertTrue(np.array_equal(np.concatenate([c[0] for c in chunks]), xs))
+        self.assertTrue(np.array_equal(np.concatenate([c[1] for c in chunks]), ys))
+
     def test_set_active_state_with_domain(self):
         # Deactivate all
         for cell in self.grid.leaf_cells:
@@ -231,6 +367,48 @@ class TestPlanarCartesianGrid(unittest.TestCase):
         for cell in self.grid.leaf_cells:
             cell.is_active = True
 
+    def test_cut_cells_integration(self):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 4.0, 4, 4)
+        hole = make_signed_distance_circular_hole(2.0, 2.0, 1.0)
+        grid.set_active_state_with_filter(hole, subcell_depth=4)
+
+        # Cut cells stay active, only the points in the hole are dropped
+        self.assertEqual(len(grid.active_leaf_indices), 16)
+        self.assertEqual(np.count_nonzero(grid.tree.cut[grid.leaf_indices]), 12)
+
+        coords, weights, jacobian_dets, leaf_indices = grid.integration_point_arrays()
+        distances = np.hypot(coords[:, 0] - 2.0, coords[:, 1] - 2.0)
+        self.assertTrue(np.all(distances >= 1.0))
+        self.assertTrue(np.all(np.diff(leaf_indices) >= 0))
+        self.assertAlmostEqual(np.sum(weights * jacobian_dets), 16 - np.pi, places=2)
+
+        # Plain filters are resolved by the same sub-cells
+        grid.set_active_state_with_filter(
+            make_circular_hole(2.0, 2.0, 1.0), subcell_depth=4
+        )
+        _, weights, jacobian_dets, _ = grid.integration_point_arrays()
+        self.assertAlmostEqual(np.sum(weights * jacobian_dets), 16 - np.pi, places=2)
+
+        # Without sub-cells the cut cells are deactivated
+        grid.set_active_state_with_filter(hole)
+        self.assertEqual(len(grid.active_leaf_indices), 4)
+        self.assertFalse(grid.tree.cut[grid.leaf_indices].any())
+
+    def test_cut_cells_edge_integration(self):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 4.0, 4, 4)
+        hole = make_signed_distance_circular_hole(2.0, 4.0, 1.0)
+        grid.set_active_state_with_filter(hole, subcell_depth=6)
+
+        # Edge points of cut leaves only cover the part of the edge in the domain
+        leaves = grid.face_leaf_indices("top")
+        coords, weights, jacobian_dets, leaf_indices = (
+            grid.edge_integration_point_arrays(leaves, "top")
+        )
+        self.assertTrue(np.all(coords[:, 1] == 4.0))
+        self.assertTrue(np.all(np.abs(coords[:, 0] - 2.0) >= 1.0))
+        self.assertTrue(np.all(np.diff(leaf_indices) >= 0))
+        self.assertAlmostEqual(np.sum(weights * jacobian_dets), 2.0, places=2)
+
     def test_index_exists(self):
         # Corners
         self.assertTrue(self.grid._index_exists(0, 0))
@@ -265,16 +443,379 @@ class TestPlanarCartesianGrid(unittest.TestCase):
         self.assertFalse(self.grid._point_is_inside_grid(-100, 1))
 
     def test_get_cell_indices_from_coords(self):
-        self.assertTrue(self.grid.get_cell_indices_from_coords(1.1, 1.1), (0, 0))
-        self.assertTrue(
-            self.grid.get_cell_indices_from_coords(4.9, 2.9),
+        self.assertEqual(self.grid.get_cell_indices_from_coords(1.1, 1.1), (0, 0))
+        self.assertEqual(self.grid.get_cell_indices_from_coords(3.5, 2.5), (2, 1))
+        self.assertEqual(
+            self.grid.get_cell_indices_from_coords(5.0, 3.0),
             (self.grid.i_end, self.grid.j_end),
         )
 
     def test_get_cell_from_coords(self):
-        self.assertTrue(
+        self.assertEqual(
             self.grid.get_cell_from_coords(1.1, 1.1), self.grid.base_cells[0]
         )
-        self.assertTrue(
+        self.assertEqual(
             self.grid.get_cell_from_coords(4.9, 2.9), self.grid.base_cells[-1]
         )
+
+    def test_locate_leaf_indices(self):
+        cell = self.grid.get_cell_at_indices(1, 0)
+        cell.refine()
+        cell.children[2].refine()
+
+        coords = torch.tensor([[1.1, 1.1], [2.9, 1.9], [2.1, 1.6], [9.0, 1.0]])
+        leaf_indices = self.grid.locate_leaf_indices(coords)
+
+        expected = [
+            self.grid.base_cells[0],
+            cell.children[3],
+            cell.children[2].children[0],
+        ]
+        self.assertEqual(self.grid.get_cells(leaf_indices[:3]), expected)
+        self.assertEqual(leaf_indices[3], -1)
+
+        # Every integration point lies in its own leaf
+        coords, _, _, leaves = self.grid.integration_point_arrays()
+        self.assertTrue(np.array_equal(self.grid.locate_leaf_indices(coords), leaves))
+
+    def test_get_leaf_cell_from_coords(self):
+        cell = self.grid.get_cell_at_indices(3, 1)
+        cell.refine()
+
+        self.assertEqual(
+            self.grid.get_leaf_cell_from_coords(4.9, 2.9), cell.children[3]
+        )
+        with self.assertRaises(ValueError):
+            self.grid.get_leaf_cell_from_coords(0.0, 2.0)
+
+
+class TestTensorizedPlanarCartesianGrid(unittest.TestCase):
+    def setUp(self):
+        self.grid = TensorizedPlanarCartesianGrid(1.0, 1.0, 5.0, 3.0, 4, 2)
+
+    def assertIntegratesArea(self, grid):
+        area = torch.sum(
+            grid.integration_point_weights * grid.integration_point_jacobian_dets
+        )
+        self.assertAlmostEqual(area.item(), grid.length_x * grid.length_y)
+
+    def assertPointsInsideLeaves(self, grid):
+        coords = grid.integration_point_coords.detach().numpy()
+        leaves = grid.integration_point_leaf_indices
+        self.assertEqual(len(coords), len(leaves))
+        self.assertTrue(np.all(coords > grid.tree.lower[leaves]))
+        self.assertTrue(np.all(coords < grid.tree.upper[leaves]))
+
+    def test_version(self):
+        version = self.grid.version
+        self.grid.base_cells[0].refine()
+        self.assertGreater(self.grid.version, version)
+
+        version = self.grid.version
+        self.grid.base_cells[1].is_active = False
+        self.assertGreater(self.grid.version, version)
+
+    def test_memory_usage(self):
+        usage = self.grid.memory_usage()
+        self.assertEqual(usage["tree"], self.grid.tree.memory_usage())
+        self.assertEqual(usage["caches"], 0)
+
+        self.grid.integration_point_coords
+        usage = self.grid.memory_usage()
+        self.assertGreaterEqual(usage["caches"], 4 * 8 * (2 + 1 + 1) * 8)
+        self.assertEqual(
+            usage["total"], usage["tree"] + usage["cells"] + usage["caches"]
+        )
+
+    def test_save_and_load(self):
+        cell = self.grid.get_cell_at_indices(1, 0)
+        cell.refine()
+        cell.children[0].is_active = False
+        cell.children[3].integration_order = 3
+
+        with tempfile.TemporaryDirectory() as path:
+            self.grid.save(path)
+            self.assertTrue(os.path.exists(os.path.join(path, "coords.npy")))
+            grid = TensorizedPlanarCartesianGrid.load(path)
+
+            self.assertEqual(grid.length_x, self.grid.length_x)
+            self.assertEqual(grid.resolution_y, self.grid.resolution_y)
+            self.assertTrue(
+                np.array_equal(grid.active_leaf_indices, self.grid.active_leaf_indices)
+            )
+            self.assertTrue(
+                torch.equal(
+                    grid.integration_point_coords, self.grid.integration_point_coords
+                )
+            )
+            self.assertIs(
+                grid.integration_point_weights, grid._integration_points["weights"]
+            )
+
+            # Integration point tensors share memory with the mapped files
+            arrays = grid._integration_points["arrays"]
+            self.assertIsInstance(arrays["coords"], np.memmap)
+            self.assertEqual(
+                grid.integration_point_coords.data_ptr(), arrays["coords"].ctypes.data
+            )
+            self.assertEqual(
+                grid.integration_point_weights.data_ptr(), arrays["weights"].ctypes.data
+            )
+
+            # Loaded grids can still be modified
+            grid.get_cell_at_indices(0, 0).refine()
+            self.assertEqual(len(grid.active_leaf_indices), 13)
+            area = torch.sum(
+                grid.integration_point_weights * grid.integration_point_jacobian_dets
+            )
+            self.assertAlmostEqual(area.item(), 8 - 0.25)
+            self.assertEqual(len(self.grid.active_leaf_indices), 10)
+
+    def test_load_cut_cells_and_change_dtype(self):
+        hole = make_signed_distance_circular_hole(3.0, 2.0, 0.5)
+        self.grid.set_active_state_with_filter(hole, subcell_depth=3)
+
+        with tempfile.TemporaryDirectory() as path:
+            self.grid.save(path)
+            grid = TensorizedPlanarCartesianGrid.load(path)
+
+            # Snapshots loaded without their domain keep their integration points
+            for dtype in (torch.float32, torch.float64):
+                grid.dtype = dtype
+                self.assertEqual(grid.integration_point_coords.dtype, dtype)
+                self.assertEqual(grid.integration_point_xs.dtype, dtype)
+                self.assertTrue(
+                    torch.allclose(
+                        grid.integration_point_weights.double(),
+                        self.grid.integration_point_weights,
+                    )
+                )
+
+            # Also after cut leaves were spliced into new tensors
+            grid.get_cell_at_indices(0, 0).refine()
+            grid.dtype = torch.float32
+            self.assertEqual(grid.integration_point_jacobian_dets.dtype, torch.float32)
+            self.assertEqual(
+                len(grid.integration_point_coords),
+                len(self.grid.integration_point_coords) + 4 * 3,
+            )
+
+            # Edges of cut leaves are only integrated with the domain
+            with self.assertRaises(ValueError):
+                grid.bottom_edge_integration_point_coords
+
+            grid = TensorizedPlanarCartesianGrid.load(path, domain=hole)
+            length = torch.sum(
+                grid.bottom_edge_integration_point_weights
+                * grid.bottom_edge_integration_point_jacobian_dets
+            )
+            self.assertAlmostEqual(length.item(), 4.0)
+
+    def test_cut_cells_integration(self):
+        def get_area(grid):
+            return torch.sum(
+                grid.integration_point_weights * grid.integration_point_jacobian_dets
+            ).item()
+
+        def make_grid(radius, subcell_depth):
+            grid = TensorizedPlanarCartesianGrid(0.0, 0.0, 8.0, 4.0, 8, 4)
+            hole = make_signed_distance_circular_hole(4.0, 2.0, radius)
+            grid.set_active_state_with_filter(hole, subcell_depth=subcell_depth)
+            return grid
+
+        # Cut leaves of cached grids follow a new geometry or sub-cell depth
+        grid = make_grid(0.5, 2)
+        self.assertEqual(get_area(grid), get_area(make_grid(0.5, 2)))
+        for radius, subcell_depth in [(0.55, 2), (0.55, 5)]:
+            hole = make_signed_distance_circular_hole(4.0, 2.0, radius)
+            grid.set_active_state_with_filter(hole, subcell_depth=subcell_depth)
+            self.assertAlmostEqual(
+                get_area(grid), get_area(make_grid(radius, subcell_depth))
+            )
+
+    def test_cut_cells_edge_integration(self):
+        grid = TensorizedPlanarCartesianGrid(0.0, 0.0, 8.0, 4.0, 8, 4)
+        for radius in (1.0, 0.5):
+            hole = make_signed_distance_circular_hole(4.0, 4.0, radius)
+            grid.set_active_state_with_filter(hole, subcell_depth=6)
+            length = torch.sum(
+                grid.top_edge_integration_point_weights
+                * grid.top_edge_integration_point_jacobian_dets
+            )
+            self.assertAlmostEqual(length.item(), 8.0 - 2 * radius, places=2)
+
+    def test_prepare_samples(self):
+        self.grid.prepare_samples(number_of_samples_x=3, number_of_samples_y=2)
+        self.assertEqual(self.grid.samples_coords.shape, (6, 2))
+        self.assertEqual(self.grid.samples_coords.dtype, torch.float64)
+        self.assertTrue(self.grid.samples_coords.requires_grad)
+
+        chunks = list(self.grid.iter_samples_coords(None, 3, 2, chunk_size=4))
+        self.assertTrue(torch.equal(torch.cat(chunks), self.grid.samples_coords))
+
+    def test_dtype(self):
+        self.grid.prepare_samples(number_of_samples_x=3, number_of_samples_y=2)
+        coords = self.grid.integration_point_coords
+
+        self.grid.dtype = torch.float32
+        for tensor in (
+            self.grid.integration_point_coords,
+            self.grid.integration_point_weights,
+            self.grid.integration_point_xs,
+            self.grid.top_edge_integration_point_coords,
+            self.grid.samples_coords,
+        ):
+            self.assertEqual(tensor.dtype, torch.float32)
+
+        self.assertTrue(self.grid.samples_coords.requires_grad)
+        self.assertTrue(
+            torch.allclose(self.grid.integration_point_coords.double(), coords)
+        )
+        self.assertIntegratesArea(self.grid)
+
+        grid = TensorizedPlanarCartesianGrid(0, 0, 1, 1, 1, 1, dtype=torch.float32)
+        self.assertEqual(grid.integration_point_jacobian_dets.dtype, torch.float32)
+
+    def test_refine_invalidates_integration_points(self):
+        self.assertEqual(len(self.grid.integration_point_coords), 4 * 8)
+
+        self.grid.get_cell_at_indices(1, 0).refine()
+        self.assertEqual(len(self.grid.integration_point_coords), 4 * 11)
+        self.assertEqual(len(self.grid.integration_point_xs), 4 * 11)
+        self.assertEqual(len(self.grid.integration_point_weights), 4 * 11)
+        self.assertIntegratesArea(self.grid)
+        self.assertPointsInsideLeaves(self.grid)
+
+    def test_set_active_invalidates_integration_points(self):
+        self.assertEqual(len(self.grid.integration_point_coords), 4 * 8)
+
+        self.grid.get_cell_at_indices(1, 0).is_active = False
+        self.assertEqual(len(self.grid.integration_point_coords), 4 * 7)
+        self.assertPointsInsideLeaves(self.grid)
+
+    def test_incremental_rebuild(self):
+        self.grid.rebuild_fraction = 1.0
+        coords = self.grid.integration_point_coords.detach().clone()
+
+        cell = self.grid.get_cell_at_indices(1, 0)
+        cell.refine()
+        cell.children[3].integration_order = 3
+
+        # Rows of untouched leaves are kept in place, new rows are appended
+        new_coords = self.grid.integration_point_coords
+        self.assertEqual(len(new_coords), 4 * 10 + 9)
+        self.assertTrue(torch.equal(new_coords[:4], coords[:4]))
+        self.assertTrue(torch.equal(new_coords[4:28], coords[8:]))
+        self.assertTrue(new_coords.requires_grad)
+        self.assertIntegratesArea(self.grid)
+        self.assertPointsInsideLeaves(self.grid)
+
+        full = TensorizedPlanarCartesianGrid(1.0, 1.0, 5.0, 3.0, 4, 2)
+        full_cell = full.get_cell_at_indices(1, 0)
+        full_cell.refine()
+        full_cell.children[3].integration_order = 3
+        self.assertAlmostEqual(
+            torch.sum(new_coords).item(),
+            torch.sum(full.integration_point_coords).item(),
+        )
+
+    def test_rebuild_after_coarsening(self):
+        self.grid.rebuild_fraction = 1.0
+        self.grid.get_cell_at_indices(0, 0).refine()
+        self.grid.integration_point_coords
+        self.grid.bottom_edge_integration_point_coords
+
+        # The rows released by the first cell are reused by the second one
+        self.grid.get_cell_at_indices(0, 0).delete_all_children()
+        self.grid.get_cell_at_indices(1, 0).refine()
+        self.assertEqual(len(self.grid.tree), 8 + 4)
+        self.assertIntegratesArea(self.grid)
+        self.assertPointsInsideLeaves(self.grid)
+
+        coords = self.grid.bottom_edge_integration_point_coords.detach().numpy()
+        self.assertTrue(np.array_equal(np.unique(coords[:, 1]), [1.0]))
+        full = TensorizedPlanarCartesianGrid(1.0, 1.0, 5.0, 3.0, 4, 2)
+        full.get_cell_at_indices(1, 0).refine()
+        self.assertTrue(
+            torch.allclose(
+                torch.sort(torch.from_numpy(coords[:, 0]))[0],
+                torch.sort(full.bottom_edge_integration_point_xs.view(-1))[0],
+            )
+        )
+
+    def test_edge_cache_depends_on_edge_leaves(self):
+        top_coords = self.grid.top_edge_integration_point_coords
+        bottom_coords = self.grid.bottom_edge_integration_point_coords
+
+        self.grid.get_cell_at_indices(0, 0).refine()
+
+        self.assertIs(self.grid.top_edge_integration_point_coords, top_coords)
+        self.assertEqual(len(self.grid.bottom_edge_integration_point_coords), 2 * 5)
+        self.assertIsNot(self.grid.bottom_edge_integration_point_coords, bottom_coords)
+
+
+class TestSolidCartesianGrid(unittest.TestCase):
+    def setUp(self):
+        self.grid = SolidCartesianGrid(1.0, 1.0, 1.0, 5.0, 3.0, 2.0, 4, 2, 2)
+
+    def test_generate(self):
+        self.assertEqual(len(self.grid.base_cells), 16)
+        cell = self.grid.get_cell_at_indices(3, 0, 1)
+        self.assertEqual((cell.x_start, cell.y_start, cell.z_start), (4.0, 1.0, 1.5))
+
+    def test_face_base_indices(self):
+        self.assertEqual(list(self.grid.face_base_indices("front")), list(range(8, 16)))
+        self.assertEqual(list(self.grid.face_base_indices("right")), [3, 7, 11, 15])
+        self.assertEqual(
+            list(self.grid.face_base_indices("top")), [4, 5, 6, 7, 12, 13, 14, 15]
+        )
+
+    def test_integration_points(self):
+        self.grid.get_cell_at_indices(0, 0, 0).refine()
+        self.grid.get_cell_at_indices(1, 0, 0).integration_order = 3
+
+        xs, ys, zs = self.grid.integration_point_coords
+        self.assertEqual(len(xs), 8 * (15 - 1) + 8 * 8 + 27)
+        volume = np.sum(
+            self.grid.integration_point_weights
+            * self.grid.integration_point_jacobian_dets
+        )
+        self.assertAlmostEqual(volume, 8.0)
+
+        # Every integration point lies in its own leaf
+        coords = np.stack([xs, ys, zs], axis=1)
+        self.assertTrue(
+            np.array_equal(
+                self.grid.locate_leaf_indices(coords),
+                self.grid.integration_point_leaf_indices,
+            )
+        )
+
+    def test_boundary_index(self):
+        self.grid.get_cell_at_indices(3, 1, 1).refine()
+
+        for face, area in [("top", 4.0), ("right", 2.0), ("front", 8.0)]:
+            face_index = self.grid.boundary_index[face]
+            weights = face_index["weights"] * face_index["jacobian_dets"]
+            self.assertAlmostEqual(weights.sum(), area)
+
+    def test_set_active_state_with_filter(self):
+        grid = TensorizedSolidCartesianGrid(0.0, 0.0, 0.0, 2.0, 2.0, 2.0, 4, 4, 4)
+        hole = invert(make_signed_distance_sphere(1.0, 1.0, 1.0, 0.5))
+        grid.set_active_state_with_filter(hole, subcell_depth=3)
+
+        volume = torch.sum(
+            grid.integration_point_weights * grid.integration_point_jacobian_dets
+        )
+        self.assertAlmostEqual(volume.item(), 8 - 4 / 3 * np.pi * 0.5**3, places=2)
+        self.assertEqual(grid.integration_point_zs.shape[1], 1)
+
+        coords, weights, jacobian_dets = grid.face_integration_points_data("back")
+        self.assertAlmostEqual(torch.sum(weights * jacobian_dets).item(), 4.0)
+
+        # Faces cut by a new geometry only cover its part inside the domain
+        hole = invert(make_signed_distance_sphere(1.0, 1.0, 0.0, 0.5))
+        grid.set_active_state_with_filter(hole, subcell_depth=5)
+        coords, weights, jacobian_dets = grid.face_integration_points_data("back")
+        area = torch.sum(weights * jacobian_dets)
+        self.assertAlmostEqual(area.item(), 4 - np.pi * 0.5**2, places=2)
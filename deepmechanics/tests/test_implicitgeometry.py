@@ -0,0 +1,147 @@
+import unittest
+
+import numpy as np
+import torch
+
+import deepmechanics.implicitgeometry as ig
+
+
+class TestImplicitGeometry(unittest.TestCase):
+    def setUp(self):
+        self.circle = ig.make_circle(0.0, 0.0, 1.0)
+        self.rectangle = ig.make_rectangle(0.0, 0.0, 2.0, 2.0)
+        self.xs = np.array([0.0, 0.9, 1.5, -0.5])
+        self.ys = np.array([0.0, 0.9, 1.5, 0.5])
+
+    def test_scalars(self):
+        self.assertTrue(self.circle(0.5, 0.5))
+        self.assertFalse(self.circle(1.5, 0.5))
+        self.assertTrue(self.rectangle(2.0, 0.0))
+        self.assertFalse(self.rectangle(2.1, 0.0))
+
+    def test_arrays(self):
+        self.assertEqual(
+            list(self.circle(self.xs, self.ys)), [True, False, False, True]
+        )
+        self.assertEqual(
+            list(self.rectangle(self.xs, self.ys)), [True, True, True, False]
+        )
+
+    def test_tensors(self):
+        inside = self.circle(torch.from_numpy(self.xs), torch.from_numpy(self.ys))
+        self.assertTrue(torch.is_tensor(inside))
+        self.assertEqual(inside.tolist(), [True, False, False, True])
+
+        outside = ig.invert(self.circle)(
+            torch.from_numpy(self.xs), torch.from_numpy(self.ys)
+        )
+        self.assertEqual(outside.tolist(), [False, True, True, False])
+
+    def test_boolean_operations(self):
+        xs, ys = self.xs, self.ys
+        self.assertEqual(
+            list(ig.union(self.circle, self.rectangle)(xs, ys)),
+            [True, True, True, True],
+        )
+        self.assertEqual(
+            list(ig.intersection(self.circle, self.rectangle)(xs, ys)),
+            [True, False, False, False],
+        )
+        self.assertEqual(
+            list(ig.difference(self.rectangle, self.circle)(xs, ys)),
+            [False, True, True, False],
+        )
+        self.assertEqual(
+            list((self.rectangle - self.circle)(xs, ys)), [False, True, True, False]
+        )
+        self.assertEqual(list((~self.circle)(xs, ys)), [False, True, True, False])
+        self.assertFalse(ig.make_circular_hole(0.0, 0.0, 1.0)(0.0, 0.0))
+
+    def test_evaluate(self):
+        self.assertEqual(
+            list(ig.evaluate(self.circle, self.xs, self.ys)), [True, False, False, True]
+        )
+
+        # Callables that only work on scalars are still supported
+        scalar_circle = lambda x, y: x**2 + y**2 <= 1.0 and True
+        self.assertEqual(
+            list(ig.evaluate(scalar_circle, self.xs, self.ys)),
+            [True, False, False, True],
+        )
+
+
+class TestSignedDistanceGeometry(unittest.TestCase):
+    def setUp(self):
+        self.circle = ig.make_signed_distance_circle(0.0, 0.0, 1.0)
+        self.rectangle = ig.make_signed_distance_rectangle(0.0, 0.0, 2.0, 2.0)
+        self.xs = np.array([0.0, 0.9, 1.5, -0.5])
+        self.ys = np.array([0.0, 0.9, 1.5, 0.5])
+
+    def test_circle(self):
+        self.assertAlmostEqual(self.circle.distance(0.0, 0.0), -1.0)
+        self.assertAlmostEqual(self.circle.distance(3.0, 4.0), 4.0)
+        self.assertEqual(
+            list(self.circle(self.xs, self.ys)), [True, False, False, True]
+        )
+
+    def test_rectangle(self):
+        self.assertAlmostEqual(self.rectangle.distance(1.0, 0.5), -0.5)
+        self.assertAlmostEqual(self.rectangle.distance(3.0, 1.0), 1.0)
+        self.assertAlmostEqual(self.rectangle.distance(5.0, 6.0), 5.0)
+        self.assertEqual(
+            list(self.rectangle(self.xs, self.ys)), [True, True, True, False]
+        )
+
+    def test_ellipse(self):
+        ellipse = ig.make_signed_distance_ellipse(0.0, 0.0, 2.0, 1.0)
+        self.assertAlmostEqual(ellipse.distance(0.0, 0.0), -1.0)
+        self.assertAlmostEqual(ellipse.distance(0.0, 1.0), 0.0)
+
+        # Never overestimates the exact distance of 2 to the tip
+        self.assertLessEqual(ellipse.distance(4.0, 0.0), 2.0)
+
+    def test_tensors(self):
+        distances = self.circle.distance(
+            torch.from_numpy(self.xs), torch.from_numpy(self.ys)
+        )
+        self.assertTrue(torch.is_tensor(distances))
+        self.assertAlmostEqual(distances[0].item(), -1.0)
+
+    def test_boolean_operations(self):
+        self.assertIsInstance(
+            ig.union(self.circle, self.rectangle), ig.SignedDistanceGeometry
+        )
+        self.assertIsInstance(self.rectangle - self.circle, ig.SignedDistanceGeometry)
+        self.assertIsInstance(self.rectangle & self.circle, ig.SignedDistanceGeometry)
+        self.assertIsInstance(
+            ig.make_signed_distance_circular_hole(0.0, 0.0, 1.0),
+            ig.SignedDistanceGeometry,
+        )
+
+        self.assertAlmostEqual(
+            ig.union(self.circle, self.rectangle).distance(1.0, 1.0), -1.0
+        )
+        self.assertAlmostEqual(
+            (self.rectangle - self.circle).distance(0.5, 0.5), 1 - 0.5**0.5
+        )
+        self.assertAlmostEqual((~self.circle).distance(0.0, 0.0), 1.0)
+        self.assertEqual(
+            list((self.rectangle - self.circle)(self.xs, self.ys)),
+            [False, True, True, False],
+        )
+
+        # Mixing with predicates falls back to a predicate
+        predicate = ig.make_circle(0.0, 0.0, 1.0)
+        self.assertNotIsInstance(
+            ig.union(predicate, self.rectangle), ig.SignedDistanceGeometry
+        )
+
+    def test_sphere(self):
+        sphere = ig.make_signed_distance_sphere(0.0, 0.0, 0.0, 1.0)
+        self.assertAlmostEqual(sphere.distance(0.0, 0.0, 3.0), 2.0)
+
+        # Three dimensional geometries combine like planar ones
+        hollow = sphere - ig.make_sphere(0.0, 0.0, 0.0, 0.5)
+        self.assertEqual(
+            list(hollow(self.xs, self.ys, self.ys)), [False, False, False, True]
+        )
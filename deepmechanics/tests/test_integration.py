@@ -3,7 +3,11 @@ import unittest
 import torch
 
 from deepmechanics.grid import TensorizedPlanarCartesianGrid
-from deepmechanics.integration import gauss_legendre_integration
+from deepmechanics.integration import (
+    gauss_legendre_integration,
+    gauss_legendre_reference_rule,
+    gauss_legendre_rule,
+)
 
 
 class TestIntegration(unittest.TestCase):
@@ -21,3 +25,40 @@ class TestIntegration(unittest.TestCase):
         )
 
         self.assertAlmostEqual(result, 16.0 * 4.0 * 2.0)
+
+    def test_gauss_legendre_rule(self):
+        points, weights = gauss_legendre_rule(2)
+        self.assertAlmostEqual(points[0], -0.5773502691896257)
+        self.assertAlmostEqual(points[1], 0.5773502691896257)
+        self.assertAlmostEqual(weights[0], 1.0)
+        self.assertAlmostEqual(weights[1], 1.0)
+
+        # Rules are computed once per order
+        self.assertIs(gauss_legendre_rule(3), gauss_legendre_rule(3))
+        self.assertAlmostEqual(sum(gauss_legendre_rule(5)[1]), 2.0)
+
+        with self.assertRaises(ValueError):
+            gauss_legendre_rule(0)
+
+    def test_gauss_legendre_reference_rule(self):
+        points, weights = gauss_legendre_reference_rule(3, 2)
+        self.assertEqual(points.shape, (9, 2))
+        self.assertAlmostEqual(sum(weights), 4.0)
+
+        # xi varies slowest
+        self.assertAlmostEqual(points[0][0], points[1][0])
+        self.assertAlmostEqual(points[0][1], points[3][1])
+
+    def test_mixed_order_integration(self):
+        grid = TensorizedPlanarCartesianGrid(0.0, 0.0, 2.0, 1.0, 2, 1, 3)
+        grid.base_cells[1].integration_order = 1
+        grid.base_cells[0].refine()
+
+        # x**4 is integrated exactly on the third order cells only
+        xs = grid.integration_point_xs
+        weights = grid.integration_point_weights
+        jacobian_dets = grid.integration_point_jacobian_dets
+        self.assertEqual(len(xs), 4 * 9 + 1)
+
+        result = gauss_legendre_integration(xs**4, weights, jacobian_dets)
+        self.assertAlmostEqual(result.item(), 0.2 + 1.5**4)
@@ -1,7 +1,9 @@
 import unittest
 
+import torch
+
 from deepmechanics.kinematics import LinearKinematicLaw
-from deepmechanics.utilities import tensorize_2d
+from deepmechanics.utilities import get_jacobian, tensorize_2d
 
 
 class TestKinematics(unittest.TestCase):
@@ -32,3 +34,24 @@ class TestKinematics(unittest.TestCase):
             self.assertAlmostEqual(
                 gamma_xy.detach().numpy()[i][0], gamma_xy_expected[i][0]
             )
+
+    def test_compute_strains_from_gradients(self):
+        samples = [0, 1, 2, 3, 4]
+        coords = tensorize_2d(samples, samples)
+
+        # Same manufactured field, differentiated in forward mode
+        def displacements(coords):
+            xs = coords[:, 0].view(-1, 1)
+            ys = coords[:, 1].view(-1, 1)
+            return torch.cat([xs**2 + ys**2, xs**3 + ys**3], dim=1)
+
+        _, du = get_jacobian(displacements, coords.detach())
+
+        u = displacements(coords)
+        ux = u[:, 0].view(-1, 1)
+        uy = u[:, 1].view(-1, 1)
+        expected = self.kinematic_law.compute_strains(ux, uy, coords)
+        computed = self.kinematic_law.compute_strains_from_gradients(du[:, 0], du[:, 1])
+
+        for e, c in zip(expected, computed):
+            self.assertTrue(torch.allclose(e, c))
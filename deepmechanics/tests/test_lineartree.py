@@ -0,0 +1,214 @@
+import unittest
+
+import numpy as np
+
+from deepmechanics.implicitgeometry import (
+    CUT,
+    INSIDE,
+    OUTSIDE,
+    make_rectangle,
+    make_signed_distance_rectangle,
+)
+from deepmechanics.lineartree import (
+    LinearOctree,
+    LinearQuadtree,
+    pack_masks,
+    unpack_masks,
+)
+
+
+class TestLinearQuadtree(unittest.TestCase):
+    def setUp(self):
+        self.tree = LinearQuadtree(capacity=1)
+        self.roots = self.tree.add_roots(
+            [[0.0, 0.0], [4.0, 0.0]], [[4.0, 2.0], [8.0, 2.0]]
+        )
+
+    def test_add_roots(self):
+        self.assertEqual(list(self.roots), [0, 1])
+        self.assertEqual(list(self.tree.root[: self.tree.size]), [0, 1])
+        self.assertTrue(np.all(self.tree.is_leaf(self.roots)))
+        self.assertTrue(np.all(self.tree.active[self.roots]))
+
+    def test_refine(self):
+        children = self.tree.refine(0)
+
+        self.assertEqual(len(children), 4)
+        self.assertFalse(self.tree.active[0])
+        self.assertFalse(self.tree.is_leaf(0))
+        self.assertEqual(list(self.tree.children(0)), list(children))
+
+        # [child_sw, child_se, child_nw, child_ne]
+        self.assertEqual(list(self.tree.lower[children[0]]), [0.0, 0.0])
+        self.assertEqual(list(self.tree.upper[children[0]]), [2.0, 1.0])
+        self.assertEqual(list(self.tree.lower[children[1]]), [2.0, 0.0])
+        self.assertEqual(list(self.tree.lower[children[2]]), [0.0, 1.0])
+        self.assertEqual(list(self.tree.upper[children[3]]), [4.0, 2.0])
+
+        self.assertEqual(list(self.tree.level[children]), [1, 1, 1, 1])
+        self.assertEqual(list(self.tree.key[children]), [0, 1, 2, 3])
+
+    def test_refine_ignores_refined_nodes(self):
+        self.tree.refine(0)
+        self.assertEqual(self.tree.refine(0).size, 0)
+
+    def test_shrink_to_fit(self):
+        children = self.tree.refine(0)
+        self.tree.refine(children[0])
+        self.assertEqual(self.tree.capacity, 12)
+
+        self.tree.shrink_to_fit()
+        self.assertEqual(self.tree.capacity, 10)
+        self.assertEqual(self.tree.memory_usage(), 10 * (2 * 2 * 8 + 3 * 8 + 5))
+        self.assertEqual(self.tree.refine(1).size, 4)
+
+    def test_coarsen(self):
+        children = self.tree.refine(0)
+        self.tree.refine(children[0])
+        self.tree.coarsen(0)
+
+        self.assertTrue(self.tree.is_leaf(0))
+        self.assertTrue(self.tree.active[0])
+        self.assertEqual(list(self.tree.leaves()), [0, 1])
+
+    def test_coarsen_releases_rows(self):
+        children = self.tree.refine(0)
+        self.tree.refine(children[0])
+        size = len(self.tree)
+
+        # Released blocks are reused, whatever node is refined next
+        for node in (1, 0, 1):
+            self.tree.coarsen([0, 1])
+            children = self.tree.refine(node)
+            self.tree.refine(children[0])
+            self.assertEqual(len(self.tree), size)
+
+        self.assertEqual(list(self.tree.lower[children[3]]), [6.0, 1.0])
+        self.assertEqual(len(self.tree.leaves()), 8)
+
+        # Snapshots recover the released blocks from the dead rows
+        self.tree.coarsen(0)
+        tree = LinearQuadtree.from_arrays(self.tree.to_arrays())
+        self.assertEqual(list(tree.free_blocks), list(self.tree.free_blocks))
+
+    def test_leaves(self):
+        children = self.tree.refine(0)
+        grandchildren = self.tree.refine(children[1])
+
+        # Depth-first [sw, se, nw, ne] ordering per root
+        expected = [children[0]] + list(grandchildren) + list(children[2:]) + [1]
+        self.assertEqual(list(self.tree.leaves()), expected)
+        self.assertEqual(list(self.tree.leaves(roots=[1])), [1])
+
+        self.tree.active[children[0]] = False
+        self.assertNotIn(children[0], self.tree.leaves(active_only=True))
+
+    def test_leaves_on_face(self):
+        children = self.tree.refine(0)
+        self.tree.refine(children[3])
+
+        self.assertEqual(len(self.tree.leaves(face="top")), 4)
+        self.assertEqual(len(self.tree.leaves(face="bottom")), 3)
+        self.assertEqual(len(self.tree.leaves(roots=[0], face="right")), 3)
+        self.assertEqual(len(self.tree.leaves(roots=[0], face="left")), 2)
+
+    def test_subtree_leaves(self):
+        children = self.tree.refine(0)
+        grandchildren = self.tree.refine(children[2])
+
+        self.assertEqual(
+            list(self.tree.subtree_leaves(children[2])), list(grandchildren)
+        )
+        self.assertEqual(len(self.tree.subtree_leaves(0, face="top")), 3)
+        self.assertEqual(list(self.tree.subtree_leaves(1)), [1])
+
+    def test_refinement_masks(self):
+        children = self.tree.refine(0)
+        self.tree.refine(children[[1, 2]])
+
+        masks = self.tree.refinement_masks(self.roots)
+        self.assertEqual([list(mask) for mask in masks[:1]], [[True, False]])
+        self.assertEqual(list(masks[1]), [False, True, True, False])
+        self.assertEqual(len(masks), 2)
+
+        # Replaying the masks reproduces the subtrees
+        other = LinearQuadtree()
+        roots = other.add_roots(
+            self.tree.lower[self.roots], self.tree.upper[self.roots]
+        )
+        other.apply_refinement_masks(roots, unpack_masks(pack_masks(masks)))
+        self.assertTrue(
+            np.array_equal(
+                other.lower[other.leaves()], self.tree.lower[self.tree.leaves()]
+            )
+        )
+
+    def test_locate(self):
+        children = self.tree.refine(0)
+        grandchildren = self.tree.refine(children[1])
+
+        coords = [[1.0, 1.5], [3.5, 0.2], [2.5, 0.7], [5.0, 1.0]]
+        self.assertEqual(
+            list(self.tree.locate([0, 0, 0, 1], coords)),
+            [children[2], grandchildren[1], grandchildren[2], 1],
+        )
+
+    def test_is_cut_and_is_inside(self):
+        children = self.tree.refine(0)
+        rectangle = make_rectangle(0.0, 0.0, 2.5, 1.5)
+        nodes = np.concatenate([children, [1]])
+
+        self.assertEqual(
+            list(self.tree.is_cut(nodes, rectangle)), [False, True, True, True, False]
+        )
+        self.assertEqual(
+            list(self.tree.is_inside(nodes, rectangle)),
+            [True, False, False, False, False],
+        )
+        self.assertEqual(
+            list(self.tree.count_inside_seeds(nodes, rectangle, chunk_size=2)),
+            [100, 30, 50, 15, 0],
+        )
+
+    def test_classify_with_signed_distance(self):
+        children = self.tree.refine(0)
+        rectangle = make_signed_distance_rectangle(-3.0, -3.0, 3.0, 4.0)
+        nodes = np.concatenate([children, [1]])
+
+        self.assertEqual(
+            list(self.tree.classify(nodes, rectangle)),
+            [INSIDE, CUT, INSIDE, CUT, OUTSIDE],
+        )
+
+        # Thin features between seeds are still detected
+        slit = make_signed_distance_rectangle(5.0, 0.0, 5.01, 2.0)
+        self.assertFalse(self.tree.is_cut(1, make_rectangle(5.0, 0.0, 5.01, 2.0))[0])
+        self.assertTrue(self.tree.is_cut(1, slit)[0])
+
+
+class TestLinearOctree(unittest.TestCase):
+    def setUp(self):
+        self.tree = LinearOctree()
+        self.root = self.tree.add_roots([0.0, 0.0, 0.0], [2.0, 2.0, 4.0])[0]
+
+    def test_refine(self):
+        children = self.tree.refine(self.root)
+
+        self.assertEqual(len(children), 8)
+        self.assertEqual(list(self.tree.lower[children[5]]), [1.0, 0.0, 2.0])
+        self.assertTrue(np.allclose(self.tree.jacobian_dets(children), 0.25))
+
+    def test_leaves_on_face(self):
+        children = self.tree.refine(self.root)
+        self.tree.refine(children[7])
+
+        self.assertEqual(len(self.tree.leaves(face="front")), 7)
+        self.assertEqual(len(self.tree.leaves(face="back")), 4)
+        self.assertEqual(len(self.tree.leaves(face="top")), 7)
+
+    def test_locate(self):
+        children = self.tree.refine(self.root)
+        self.assertEqual(
+            list(self.tree.locate([0, 0], [[0.5, 1.5, 3.0], [1.5, 0.5, 1.0]])),
+            [children[6], children[1]],
+        )
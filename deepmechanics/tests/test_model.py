@@ -0,0 +1,212 @@
+import contextlib
+import io
+import unittest
+
+import torch
+
+import deepmechanics.boundarycondition as bcond
+from deepmechanics.functional import PotentialEnergyFunctional
+from deepmechanics.grid import TensorizedPlanarCartesianGrid
+from deepmechanics.kinematics import LinearKinematicLaw
+from deepmechanics.materialmodel import LinearElasticPlaneStressMaterialModel
+from deepmechanics.model import MechanicalModel
+from deepmechanics.neuralnetwork import NeuralNetwork
+from deepmechanics.optimization import EarlyStopping, make_adam_then_lbfgs
+
+
+class TestMechanicalModel(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.grid = TensorizedPlanarCartesianGrid(0, 0, 4, 1, 4, 2)
+        self.nn = NeuralNetwork(2, [8, 8], 2)
+        dirichlet_bcs = bcond.AggregatedDirichletBoundaryCondition(
+            bcond.FixedDisplacementsOnLeftEdge(self.grid),
+            bcond.FixedDisplacementsOnRightEdge(self.grid),
+        )
+        load = bcond.NeumannBoundaryCondition.from_grid(
+            lambda coords: (0 * coords[:, 0].view(-1, 1), -coords[:, 0].view(-1, 1)),
+            self.grid,
+            "top",
+            dirichlet_bcs.get_constraint_on_top_edge(),
+        )
+        self.model = MechanicalModel(
+            self.nn,
+            self.grid,
+            dirichlet_bcs,
+            PotentialEnergyFunctional(neumann_bcs=load),
+            LinearKinematicLaw(),
+            LinearElasticPlaneStressMaterialModel(100, 0.3, 0.1),
+        )
+
+    def get_energies_and_gradients(self, *args):
+        energies = self.model.get_energies(*self.grid.integration_points_data, *args)
+        self.nn.zero_grad()
+        sum(energies).backward()
+        gradients = [parameter.grad.clone() for parameter in self.nn.parameters()]
+
+        return torch.stack(energies), gradients
+
+    def assert_same_energies_and_gradients(self, expected, computed):
+        self.assertTrue(torch.allclose(expected[0], computed[0]))
+        for e, c in zip(expected[1], computed[1]):
+            self.assertTrue(torch.allclose(e, c))
+
+    def test_derivatives(self):
+        self.assertEqual(self.model.derivatives, "analytic")
+
+        self.model.derivatives = "reverse"
+        expected = self.get_energies_and_gradients()
+        for derivatives in ("forward", "analytic"):
+            self.model.derivatives = derivatives
+            self.assert_same_energies_and_gradients(
+                expected, self.get_energies_and_gradients()
+            )
+
+    def test_derivatives_with_unsupported_activation(self):
+        # Activations without a known derivative fall back to reverse mode
+        model = MechanicalModel(
+            NeuralNetwork(2, [8], 2, torch.nn.SiLU),
+            self.grid,
+            self.model.dirichlet_bcs,
+            self.model.functional,
+            self.model.kinematic_law,
+            self.model.material_model,
+        )
+        self.assertEqual(model.derivatives, "reverse")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.solve(epochs=1, early_stopping=False)
+
+        self.assertEqual(len(model.history), 2)
+
+    def test_unknown_derivatives(self):
+        with self.assertRaises(ValueError):
+            MechanicalModel(self.nn, self.grid, None, None, None, None, "symbolic")
+
+    def test_compiled_domain_energies(self):
+        # Reverse mode strains are compiled in forward mode
+        for derivatives in ("analytic", "reverse"):
+            self.model.derivatives = derivatives
+            self.model._compiled_domain_energies = None
+            expected = self.get_energies_and_gradients()
+            computed = self.get_energies_and_gradients(
+                self.model._get_compiled_domain_energies()
+            )
+            self.assert_same_energies_and_gradients(expected, computed)
+
+    def test_solve_with_lbfgs(self):
+        coords, weights, jacobian_dets = self.grid.integration_points_data
+        energy = sum(self.model.get_energies(coords, weights, jacobian_dets)).item()
+        optimizer = torch.optim.LBFGS(
+            self.nn.parameters(), max_iter=5, line_search_fn="strong_wolfe"
+        )
+
+        # The closure is evaluated several times per step on fresh graphs
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.model.solve(epochs=2, optimizer=optimizer)
+
+        self.assertLess(self.model.total_energy.item(), energy)
+        self.assertGreater(optimizer.state_dict()["state"][0]["func_evals"], 3)
+
+    def test_precision(self):
+        expected = self.get_energies_and_gradients()
+
+        for precision, dtype in (("float32", torch.float32), ("mixed", torch.float64)):
+            self.model.set_precision(precision)
+            self.assertEqual(self.nn.input.weight.dtype, torch.float32)
+            self.assertEqual(self.grid.integration_point_coords.dtype, torch.float32)
+
+            energies, gradients = self.get_energies_and_gradients()
+            self.assertEqual(energies.dtype, dtype)
+            self.assertTrue(torch.allclose(energies.double(), expected[0], rtol=1e-5))
+            for e, c in zip(expected[1], gradients):
+                self.assertTrue(torch.allclose(c.double(), e, rtol=1e-3, atol=1e-5))
+
+        with self.assertRaises(ValueError):
+            self.model.set_precision("float16")
+
+    def make_model_with_given_boundary_data(self):
+        # Neumann condition holding the edge data of the grid as it is now
+        dirichlet_bcs = bcond.FixedDisplacementsOnLeftEdge(self.grid)
+        load = bcond.NeumannBoundaryCondition(
+            lambda coords: (0 * coords[:, 0].view(-1, 1), -coords[:, 0].view(-1, 1)),
+            self.grid.top_edge_integration_points_data,
+            dirichlet_bcs.get_constraint_on_top_edge(),
+        )
+        model = MechanicalModel(
+            self.nn,
+            self.grid,
+            dirichlet_bcs,
+            PotentialEnergyFunctional(neumann_bcs=load),
+            LinearKinematicLaw(),
+            LinearElasticPlaneStressMaterialModel(100, 0.3, 0.1),
+        )
+        return model, load
+
+    def test_refine_with_given_boundary_data(self):
+        model, load = self.make_model_with_given_boundary_data()
+        expected = model.get_energies(*self.grid.integration_points_data)[1]
+
+        # The condition keeps integrating over the edge data it was given
+        self.grid.base_cells[-1].refine()
+        self.assertEqual(len(self.grid.top_edge_integration_point_coords), 10)
+        energy = model.get_energies(*self.grid.integration_points_data)[1]
+        self.assertTrue(torch.allclose(energy, expected))
+
+    def test_precision_with_given_boundary_data(self):
+        model, load = self.make_model_with_given_boundary_data()
+        expected = model.get_energies(*self.grid.integration_points_data)[1]
+
+        # Boundary data handed to the condition follows the precision too
+        model.set_precision("float32")
+        self.assertEqual(load.boundary_coords.dtype, torch.float32)
+        energy = model.get_energies(*self.grid.integration_points_data)[1]
+        self.assertEqual(energy.dtype, torch.float32)
+        self.assertTrue(torch.allclose(energy.double(), expected, rtol=1e-5))
+
+        model.set_precision("float64")
+        self.assertIs(load.boundary_data, load._boundary_data)
+
+    def test_solve_multilevel(self):
+        parameters = list(self.nn.parameters())
+        optimizer = torch.optim.Adam(parameters, lr=1e-2)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.model.solve_multilevel([2, 1, 1], optimizer=optimizer)
+
+        # The grid was refined twice in place and the same network trained on it
+        self.assertEqual(len(self.grid.active_leaf_indices), 8 * 16)
+        self.assertEqual(len(optimizer.state), len(parameters))
+        self.assertEqual(optimizer.state[parameters[0]]["step"].item(), 3 + 2 + 2)
+
+    def test_solve_multilevel_with_given_boundary_data(self):
+        model, _ = self.make_model_with_given_boundary_data()
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.solve_multilevel([1, 1, 1], early_stopping=False, lr=1e-2)
+
+        self.assertEqual(len(self.grid.active_leaf_indices), 8 * 16)
+        self.assertEqual(len(model.history), 2)
+
+    def test_solve_with_early_stopping(self):
+        early_stopping = EarlyStopping(tolerance=1.0, patience=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.model.solve(epochs=50, early_stopping=early_stopping, lr=1e-3)
+
+        self.assertEqual(len(self.model.history), 4)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.model.solve(epochs=5, early_stopping=False, lr=1e-3)
+
+        self.assertEqual(len(self.model.history), 6)
+
+    def test_solve_with_schedule(self):
+        schedule = make_adam_then_lbfgs(2, max_iter=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.model.solve(epochs=4, early_stopping=False, optimizer=schedule)
+
+        self.assertIsInstance(self.model.optimizer, torch.optim.LBFGS)
+        self.assertLess(sum(self.model.history[-1]), sum(self.model.history[0]))
+
+        scheduler = torch.optim.lr_scheduler.StepLR(self.model.optimizer, 1)
+        with self.assertRaises(ValueError):
+            self.model.solve(epochs=4, optimizer=schedule, scheduler=scheduler)
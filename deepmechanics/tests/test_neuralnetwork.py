@@ -0,0 +1,32 @@
+import unittest
+
+import torch
+import torch.nn as nn
+
+from deepmechanics.neuralnetwork import NeuralNetwork
+from deepmechanics.utilities import get_derivative, tensorize_2d
+
+
+class TestNeuralNetwork(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.coords = tensorize_2d([0.0, 0.5, 1.0, 2.0], [1.0, -0.5, 0.0, 3.0])
+
+    def test_forward_with_jacobian(self):
+        for activation in (nn.Tanh, nn.Sigmoid):
+            network = NeuralNetwork(2, [6, 5], 2, activation)
+            outputs, jacobians = network.forward_with_jacobian(self.coords)
+
+            expected = network(self.coords)
+            self.assertTrue(torch.allclose(outputs, expected))
+            self.assertEqual(list(jacobians.size()), [4, 2, 2])
+            for i in range(2):
+                gradient = get_derivative(expected[:, i].view(-1, 1), self.coords, 1)
+                self.assertTrue(torch.allclose(jacobians[:, i], gradient))
+
+    def test_forward_with_jacobian_unsupported_activation(self):
+        network = NeuralNetwork(2, [6], 2, nn.ReLU)
+        self.assertFalse(network.has_analytic_jacobian)
+        self.assertTrue(NeuralNetwork(2, [6], 2).has_analytic_jacobian)
+        with self.assertRaises(TypeError):
+            network.forward_with_jacobian(self.coords)
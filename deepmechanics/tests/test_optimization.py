@@ -0,0 +1,77 @@
+import unittest
+
+import torch
+
+from deepmechanics.optimization import (
+    EarlyStopping,
+    OptimizationStage,
+    OptimizerSchedule,
+    make_adam_then_lbfgs,
+    step_scheduler,
+)
+
+
+class TestEarlyStopping(unittest.TestCase):
+    def test_relative_energy_change(self):
+        early_stopping = EarlyStopping(tolerance=1e-3, patience=2)
+
+        self.assertFalse(early_stopping.update(-100.0, 1.0))
+        self.assertFalse(early_stopping.update(-100.05, 1.0))
+        self.assertFalse(early_stopping.update(-101.0, 1.0))
+        self.assertFalse(early_stopping.update(-101.01, 1.0))
+        self.assertTrue(early_stopping.update(-101.02, 1.0))
+
+        early_stopping.reset()
+        self.assertFalse(early_stopping.update(-101.02, 1.0))
+
+    def test_gradient_norm(self):
+        early_stopping = EarlyStopping(tolerance=0.0, gradient_tolerance=1e-4)
+
+        for _ in range(9):
+            self.assertFalse(early_stopping.update(1.0, 1e-5))
+        self.assertTrue(early_stopping.update(1.0, 1e-5))
+
+
+class TestOptimizerSchedule(unittest.TestCase):
+    def setUp(self):
+        self.parameters = [torch.nn.Parameter(torch.zeros(2))]
+
+    def test_stage_at(self):
+        schedule = OptimizerSchedule(
+            OptimizationStage(torch.optim.Adam, 3, lr=1e-2),
+            OptimizationStage(torch.optim.SGD, 2, lr=1e-3),
+        )
+
+        stages = [schedule.stage_at(epoch) for epoch in range(7)]
+        self.assertEqual(stages, [0, 0, 0, 1, 1, 1, 1])
+
+        with self.assertRaises(ValueError):
+            OptimizerSchedule()
+
+    def test_make(self):
+        schedule = make_adam_then_lbfgs(10, lr=1e-3, max_iter=5)
+        adam, scheduler = schedule.stages[0].make(self.parameters)
+        lbfgs, _ = schedule.stages[1].make(self.parameters)
+
+        self.assertIsInstance(adam, torch.optim.Adam)
+        self.assertIsNone(scheduler)
+        self.assertIsInstance(lbfgs, torch.optim.LBFGS)
+        self.assertEqual(lbfgs.defaults["max_iter"], 5)
+        self.assertEqual(lbfgs.defaults["line_search_fn"], "strong_wolfe")
+        self.assertIsNone(schedule.stages[1].epochs)
+
+    def test_step_scheduler(self):
+        stage = OptimizationStage(
+            torch.optim.SGD,
+            scheduler=lambda optimizer: torch.optim.lr_scheduler.StepLR(optimizer, 1),
+            lr=1.0,
+        )
+        optimizer, scheduler = stage.make(self.parameters)
+        optimizer.step()
+        step_scheduler(scheduler, 0.0)
+        self.assertAlmostEqual(optimizer.param_groups[0]["lr"], 0.1)
+
+        scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, patience=0)
+        for _ in range(2):
+            step_scheduler(scheduler, 1.0)
+        self.assertAlmostEqual(optimizer.param_groups[0]["lr"], 0.01)
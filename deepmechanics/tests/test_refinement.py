@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from deepmechanics.grid import PlanarCartesianGrid
+from deepmechanics.implicitgeometry import make_circle, make_circular_hole
+from deepmechanics.refinement import RefineBoundaries, RefineUniformly
+
+
+class TestRefineBoundaries(unittest.TestCase):
+    def setUp(self):
+        self.domain = make_circle(2.0, 1.0, 0.8)
+
+    def refined_grid(self, processes):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 2.0, 4, 2)
+        grid.get_cell_at_indices(0, 0).refine()
+        grid.refinement_strategy = RefineBoundaries(3, self.domain, processes)
+        grid.refine()
+        return grid
+
+    def test_refine(self):
+        grid = self.refined_grid(None)
+
+        # Only leaves at the maximum depth may still be cut
+        for leaf in grid.leaf_cells:
+            self.assertTrue(leaf.level == 3 or not leaf.is_cut(self.domain))
+
+        self.assertEqual(max(leaf.level for leaf in grid.leaf_cells), 3)
+
+    def test_refine_in_parallel(self):
+        serial = self.refined_grid(None)
+        parallel = self.refined_grid(2)
+
+        self.assertTrue(
+            np.array_equal(
+                parallel.tree.lower[parallel.leaf_indices],
+                serial.tree.lower[serial.leaf_indices],
+            )
+        )
+        self.assertTrue(
+            np.array_equal(
+                parallel.tree.active[parallel.leaf_indices],
+                serial.tree.active[serial.leaf_indices],
+            )
+        )
+
+    def test_refine_recursive(self):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 2.0, 4, 2)
+        strategy = RefineBoundaries(2, self.domain)
+        cell = grid.get_cell_at_indices(1, 0)
+        strategy.refine_recursive(cell, self.domain, 2)
+
+        self.assertEqual({leaf.level for leaf in cell.leaves}, {1, 2})
+        self.assertTrue(grid.get_cell_at_indices(2, 0).is_leaf)
+
+
+class TestRefineUniformly(unittest.TestCase):
+    def test_refine(self):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 2.0, 4, 2)
+        grid.get_cell_at_indices(0, 0).refine()
+        grid.get_cell_at_indices(3, 1).is_active = False
+        grid.refinement_strategy = RefineUniformly(2)
+        grid.refine()
+
+        # Inactive leaves are left as they are
+        self.assertEqual(len(grid.active_leaf_indices), (4 + 6) * 16)
+        self.assertTrue(grid.get_cell_at_indices(3, 1).is_leaf)
+
+    def test_refine_cut_leaves(self):
+        grid = PlanarCartesianGrid(0.0, 0.0, 4.0, 4.0, 4, 4)
+        hole = make_circular_hole(2.0, 2.0, 1.0)
+        grid.set_active_state_with_filter(hole, subcell_depth=2)
+        RefineUniformly(1).refine(grid)
+
+        # Children of cut leaves are classified again, leaving no cut leaf
+        # entirely outside the domain
+        leaves = grid.active_leaf_indices
+        cut = leaves[grid.tree.cut[leaves]]
+        self.assertEqual(len(leaves), 4 * 16 - 4)
+        self.assertTrue(np.all(grid.tree.classify(cut, hole) == 0))
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+import torch
+
+from deepmechanics.sampling import StratifiedBatchSampler, UniformBatchSampler
+
+
+class TestUniformBatchSampler(unittest.TestCase):
+    def setUp(self):
+        self.sampler = UniformBatchSampler(batch_size=4, seed=0)
+
+    def test_epoch_visits_every_point_once(self):
+        batches = list(self.sampler.batches(10))
+        indices = torch.cat([indices for indices, _ in batches])
+
+        self.assertEqual([len(indices) for indices, _ in batches], [4, 4, 2])
+        self.assertEqual(sorted(indices.tolist()), list(range(10)))
+
+        # Batches are reshuffled every epoch
+        other = torch.cat([indices for indices, _ in self.sampler.batches(10)])
+        self.assertFalse(torch.equal(indices, other))
+
+    def test_scaled_batches_are_unbiased(self):
+        values = torch.linspace(0.0, 1.0, 12, dtype=torch.float64).view(-1, 1)
+        estimates = [
+            (values[indices] * scale).sum().item()
+            for _ in range(2000)
+            for indices, scale in self.sampler.batches(12)
+        ]
+        self.assertAlmostEqual(np.mean(estimates), values.sum().item(), delta=0.05)
+
+
+class TestStratifiedBatchSampler(unittest.TestCase):
+    def setUp(self):
+        self.sampler = StratifiedBatchSampler(batch_size=4, seed=0)
+        self.leaf_indices = np.repeat([3, 8, 5, 1], 4)
+
+    def test_batches_sample_every_leaf(self):
+        batches = list(self.sampler.batches(16, self.leaf_indices))
+        indices = torch.cat([indices for indices, _ in batches])
+
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(sorted(indices.tolist()), list(range(16)))
+        for indices, scale in batches:
+            self.assertEqual(sorted(self.leaf_indices[indices.numpy()]), [1, 3, 5, 8])
+            self.assertTrue(torch.all(scale == 4))
+
+    def test_scaled_batches_are_unbiased(self):
+        values = torch.arange(14, dtype=torch.float64).view(-1, 1) ** 2
+        leaf_indices = np.repeat([0, 1, 2], [6, 3, 5])
+        estimates = [
+            (values[indices] * scale).sum().item()
+            for _ in range(2000)
+            for indices, scale in self.sampler.batches(14, leaf_indices)
+        ]
+        self.assertAlmostEqual(np.mean(estimates), values.sum().item(), delta=10.0)
+
+    def test_requires_leaf_indices(self):
+        with self.assertRaises(ValueError):
+            next(self.sampler.batches(16))
@@ -1,5 +1,6 @@
 import unittest
 
+import numpy as np
 import torch
 from torch.autograd import grad
 from torch.functional import unique
@@ -29,6 +30,29 @@ class TestIntegration(unittest.TestCase):
             self.assertAlmostEqual(dy, 3 * x**2)
             self.assertAlmostEqual(ddy, 6 * x)
 
+    def test_get_jacobian(self):
+        xy = torch.tensor([[1.0, 2.0], [3.0, -1.0]], dtype=torch.float64)
+        function = lambda xy: torch.stack(
+            [xy[:, 0] ** 2 * xy[:, 1], xy[:, 0] + 3 * xy[:, 1], xy[:, 1] ** 3], dim=1
+        )
+        values, jacobians = utilities.get_jacobian(function, xy)
+
+        self.assertTrue(torch.equal(values, function(xy)))
+        self.assertEqual(list(jacobians.size()), [2, 3, 2])
+        self.assertEqual(jacobians[0].tolist(), [[4.0, 1.0], [1.0, 3.0], [0.0, 12.0]])
+        self.assertEqual(jacobians[1].tolist(), [[-6.0, 9.0], [1.0, 3.0], [0.0, 3.0]])
+
+    def test_chain_jacobian(self):
+        x = torch.tensor([[1.0, 2.0], [3.0, -1.0]], dtype=torch.float64)
+        y = x[:, 0:1] * x[:, 1:2]
+        dy_dx = torch.stack([x[:, 1:2], x[:, 0:1]], dim=2)
+        function = lambda x, y: x**2 * y
+        values, jacobians = utilities.chain_jacobian(function, x, y, dy_dx)
+
+        self.assertTrue(torch.equal(values, function(x, y)))
+        expected = utilities.get_jacobian(lambda x: x**2 * x[:, 0:1] * x[:, 1:2], x)[1]
+        self.assertTrue(torch.allclose(jacobians, expected))
+
     def test_tensorize_1d(self):
         # scalar
         x = 12
@@ -76,6 +100,17 @@ class TestIntegration(unittest.TestCase):
         self.assertAlmostEqual(xy.detach().numpy()[2][1], y[2])
         self.assertAlmostEqual(xy.detach().numpy()[3][1], y[3])
 
+    def test_tensorize_2d_array(self):
+        x = np.array([1.0, 2.0, 5.0])
+        y = np.array([11.0, 12.0, 15.0])
+        xy = utilities.tensorize_2d(x, y)
+
+        self.assertEqual(list(xy.size()), [3, 2])
+        self.assertEqual(xy.dtype, torch.float64)
+        self.assertTrue(xy.requires_grad)
+        self.assertAlmostEqual(xy.detach().numpy()[2][0], x[2])
+        self.assertAlmostEqual(xy.detach().numpy()[2][1], y[2])
+
     def test_tensorize_3d(self):
         # scalar
         x = 12
@@ -1,7 +1,9 @@
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from torch import device, float64, ones, tensor
+import numpy as np
+from matplotlib.collections import PolyCollection
+from torch import device, eye, float64, ones, tensor
 from torch.autograd import grad
+from torch.func import jvp, vmap
 
 
 def make_array_unique(array):
@@ -22,51 +24,80 @@ def get_derivative(y, x, n, device=device("cpu")):
         return get_derivative(dy_dx, x, n - 1)
 
 
-def tensorize_1d(x):
+def _basis_tangents(x):
+    # One tangent per input coordinate, moving all rows of x at once
+    basis = eye(x.shape[1], dtype=x.dtype, device=x.device)
+    return basis[:, None, :].expand(-1, x.shape[0], -1)
+
+
+def get_jacobian(function, x):
+    # Forward mode, pushing the tangents through the function in a single
+    # vectorized pass. Rows of x must be independent of each other
+    y, dy_dx = vmap(lambda tangent: jvp(function, (x,), (tangent,)))(_basis_tangents(x))
+
+    # Jacobians are returned per row as (rows, outputs, inputs)
+    return y[0], dy_dx.permute(1, 2, 0)
+
+
+def chain_jacobian(function, x, y, dy_dx):
+    # Jacobian of function(x, y) w.r.t. x where y depends on x with the given
+    # Jacobian, so only the function itself is differentiated in forward mode
+    z, dz_dx = vmap(lambda tx, ty: jvp(function, (x, y), (tx, ty)))(
+        _basis_tangents(x), dy_dx.permute(2, 0, 1)
+    )
+    return z[0], dz_dx.permute(1, 2, 0)
+
+
+def tensorize_1d(x, dtype=float64):
     if isinstance(x, (int, float)):
-        return tensor([x], requires_grad=True, dtype=float64)
+        return tensor([x], requires_grad=True, dtype=dtype)
     elif isinstance(x, list):
-        return tensor([x], requires_grad=True, dtype=float64).transpose(0, 1)
+        return tensor([x], requires_grad=True, dtype=dtype).transpose(0, 1)
+    elif isinstance(x, np.ndarray):
+        return tensor(x.reshape(-1, 1), requires_grad=True, dtype=dtype)
     else:
-        raise TypeError("Values must be int, float or list")
+        raise TypeError("Values must be int, float, list or array")
 
 
-def tensorize_2d(x, y):
+def tensorize_2d(x, y, dtype=float64):
     if isinstance(x, (int, float)) and isinstance(y, (int, float)):
-        return tensor([x, y], requires_grad=True, dtype=float64)
+        return tensor([x, y], requires_grad=True, dtype=dtype)
     elif isinstance(x, list) and isinstance(y, list):
-        return tensor([x, y], requires_grad=True, dtype=float64).transpose(0, 1)
+        return tensor([x, y], requires_grad=True, dtype=dtype).transpose(0, 1)
+    elif isinstance(x, np.ndarray) and isinstance(y, np.ndarray):
+        xy = np.stack([x.ravel(), y.ravel()], axis=1)
+        return tensor(xy, requires_grad=True, dtype=dtype)
     else:
-        raise TypeError("Values must be int, float or list")
+        raise TypeError("Values must be int, float, list or array")
 
 
-def tensorize_3d(x, y, z):
+def tensorize_3d(x, y, z, dtype=float64):
     if (
         isinstance(x, (int, float))
         and isinstance(y, (int, float))
         and isinstance(z, (int, float))
     ):
-        return tensor([x, y, z], requires_grad=True, dtype=float64)
+        return tensor([x, y, z], requires_grad=True, dtype=dtype)
     elif isinstance(x, list) and isinstance(y, list) and isinstance(z, list):
-        return tensor([x, y, z], requires_grad=True, dtype=float64).transpose(0, 1)
+        return tensor([x, y, z], requires_grad=True, dtype=dtype).transpose(0, 1)
+    elif (
+        isinstance(x, np.ndarray)
+        and isinstance(y, np.ndarray)
+        and isinstance(z, np.ndarray)
+    ):
+        xyz = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+        return tensor(xyz, requires_grad=True, dtype=dtype)
     else:
-        raise TypeError("Values must be int, float or list")
+        raise TypeError("Values must be int, float, list or array")
 
 
 def plot_grid(grid):
     fig, ax = plt.subplots()
 
-    for cell in grid.leaf_cells:
-        if cell.is_active:
-            rect = Rectangle(
-                (cell.x_start, cell.y_start),
-                cell.length_x,
-                cell.length_y,
-                ec="r",
-                fc="k",
-            )
-
-            ax.add_patch(rect)
+    # One collection for all the active leaves, corners in counterclockwise order
+    vertex_coords, cells = grid.connectivity()
+    polygons = PolyCollection(vertex_coords[cells[:, [0, 1, 3, 2]]], ec="r", fc="k")
+    ax.add_collection(polygons)
 
     ax.set(xlim=(grid.x_start, grid.x_end), ylim=(grid.y_start, grid.y_end))
     plt.gca().set_aspect("equal", adjustable="box")
@@ -0,0 +1,80 @@
+import time
+
+import torch
+
+from deepmechanics.boundarycondition import (
+    AggregatedDirichletBoundaryCondition,
+    FixedDisplacementsOnLeftEdge,
+    FixedDisplacementsOnRightEdge,
+    NeumannBoundaryCondition,
+)
+from deepmechanics.functional import PotentialEnergyFunctional
+from deepmechanics.grid import TensorizedPlanarCartesianGrid
+from deepmechanics.kinematics import LinearKinematicLaw
+from deepmechanics.materialmodel import LinearElasticPlaneStressMaterialModel
+from deepmechanics.model import MechanicalModel
+from deepmechanics.neuralnetwork import NeuralNetwork
+
+# Same setups as the cantilever and double clamped beam examples
+problems = {
+    "cantilever beam": (50, [100], False),
+    "double clamped beam": (20, [50, 50], True),
+}
+
+epochs = 200
+
+
+def make_model(resolution_x, nodes_per_hidden_layer, double_clamped):
+    torch.manual_seed(0)
+    grid = TensorizedPlanarCartesianGrid(0.0, 0.0, 10, 1, resolution_x, 10)
+    nn = NeuralNetwork(
+        grid.spatial_dimensions, nodes_per_hidden_layer, grid.spatial_dimensions
+    )
+
+    if double_clamped:
+        dirichlet_bcs = AggregatedDirichletBoundaryCondition(
+            FixedDisplacementsOnLeftEdge(grid), FixedDisplacementsOnRightEdge(grid)
+        )
+    else:
+        dirichlet_bcs = FixedDisplacementsOnLeftEdge(grid)
+
+    edge_load_on_top_bc = NeumannBoundaryCondition.from_grid(
+        lambda coords: (0, -1), grid, "top", dirichlet_bcs.get_constraint_on_top_edge()
+    )
+    functional = PotentialEnergyFunctional(neumann_bcs=edge_load_on_top_bc)
+    material_model = LinearElasticPlaneStressMaterialModel(100, 0.3, 0.1)
+
+    return MechanicalModel(
+        nn, grid, dirichlet_bcs, functional, LinearKinematicLaw(), material_model
+    )
+
+
+def time_solve(model, epochs, compiled):
+    start = time.perf_counter()
+    model.solve(epochs=epochs, early_stopping=False, lr=1e-2, compiled=compiled)
+    return time.perf_counter() - start
+
+
+results = {}
+for name, setup in problems.items():
+    for compiled in (False, True):
+        model = make_model(*setup)
+
+        # The first solve includes tracing and compiling, the second is steady state
+        warm_up = time_solve(model, 0, compiled)
+        elapsed = time_solve(model, epochs, compiled)
+        results[name, compiled] = (warm_up, elapsed / (epochs + 1))
+
+print("\n\033[1mTime per epoch\033[0m")
+for name in problems:
+    eager_warm_up, eager_epoch = results[name, False]
+    compiled_warm_up, compiled_epoch = results[name, True]
+    print(
+        "{:<22}eager {:>8.2f} ms/epoch   compiled {:>8.2f} ms/epoch {:>6.2f}x  (compilation {:.1f} s)".format(
+            name,
+            1e3 * eager_epoch,
+            1e3 * compiled_epoch,
+            eager_epoch / compiled_epoch,
+            compiled_warm_up - eager_warm_up,
+        )
+    )
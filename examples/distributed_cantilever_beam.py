@@ -0,0 +1,43 @@
+import sys
+
+from deepmechanics.boundarycondition import (
+    FixedDisplacementsOnLeftEdge,
+    NeumannBoundaryCondition,
+)
+from deepmechanics.distributed import initialize, launch
+from deepmechanics.functional import PotentialEnergyFunctional
+from deepmechanics.grid import TensorizedPlanarCartesianGrid
+from deepmechanics.kinematics import LinearKinematicLaw
+from deepmechanics.materialmodel import LinearElasticPlaneStressMaterialModel
+from deepmechanics.model import MechanicalModel
+from deepmechanics.neuralnetwork import NeuralNetwork
+
+# Run with "python distributed_cantilever_beam.py <processes>" on a single machine,
+# or with "torchrun --nnodes ... distributed_cantilever_beam.py" across nodes
+
+
+def train(epochs):
+    # Every rank builds the same grid and trains on its share of the points
+    grid = TensorizedPlanarCartesianGrid(0.0, 0.0, 10, 1, 500, 100)
+    nn = NeuralNetwork(grid.spatial_dimensions, [100], grid.spatial_dimensions)
+
+    dirichlet_bcs = FixedDisplacementsOnLeftEdge(grid)
+    edge_load_on_top_bc = NeumannBoundaryCondition.from_grid(
+        lambda coords: (0, -1), grid, "top", dirichlet_bcs.get_constraint_on_top_edge()
+    )
+    functional = PotentialEnergyFunctional(neumann_bcs=edge_load_on_top_bc)
+    material_model = LinearElasticPlaneStressMaterialModel(100, 0.3, 0.1)
+
+    model = MechanicalModel(
+        nn, grid, dirichlet_bcs, functional, LinearKinematicLaw(), material_model
+    )
+    model.solve(epochs=epochs, distributed=True, lr=1e-2)
+
+
+if __name__ == "__main__":
+    epochs = 100
+    if len(sys.argv) > 1:
+        launch(train, int(sys.argv[1]), epochs)
+    else:
+        initialize()
+        train(epochs)
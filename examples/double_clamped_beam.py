@@ -38,10 +38,9 @@ dirichlet_bcs = AggregatedDirichletBoundaryCondition(dirichlet_bc1, dirichlet_bc
 
 # Neumann boundary conditions
 edge_load = lambda coords: (0, -1)  # [force / length^2]
-edge_data = grid.top_edge_integration_points_data
 edge_displacement_constraint = dirichlet_bcs.get_constraint_on_top_edge()
-edge_load_on_top_bc = NeumannBoundaryCondition(
-    edge_load, edge_data, edge_displacement_constraint
+edge_load_on_top_bc = NeumannBoundaryCondition.from_grid(
+    edge_load, grid, "top", edge_displacement_constraint
 )
 
 # Kinematics